@@ -5,7 +5,7 @@ from src.application.analytics import KeywordChannelRelevanceEstimator
 from src.application.client import ClientPool
 from src.application.client import ClientFactory
 from src.application.search import SnowballChannelSearch, ChannelMessagesSearch, MultiChannelMessagesSearch, KeywordMessageFilter
-from src.infrastructure.storage import TsvStorage, ConsoleStorage, PostgresStorage
+from src.infrastructure.storage import TsvStorage, ConsoleStorage, PostgresStorage, DeduplicatingStorage, PartitionedFileStorage, MultiStorage
 from src.infrastructure.logging import logger
 
 async def main():
@@ -13,6 +13,12 @@ async def main():
     Application entrypoint. 
     """
     # storage = TsvStorage('out')
+    # storage = DeduplicatingStorage(TsvStorage('out'))
+    # storage = PartitionedFileStorage('out', partition_by=('channel', 'date'))
+    # storage = MultiStorage({
+    #     'postgres': PostgresStorage('localhost', 5432, 'tg_miner', 'user', 'password'),
+    #     'archive': PartitionedFileStorage('out')
+    # })
     storage = ConsoleStorage()
 
     client_pool = ClientPool()
@@ -34,13 +40,16 @@ async def main():
         max_message_count=1000000,
         message_batch_size=100,
         min_date='2021-01-01',
-        max_date='2024-10-01'
-        # filter=KeywordMessageFilter(['траснформ', 'цифров', 'устойчив'])
+        max_date='2024-10-01',
+        # adaptive_batch_size=True,
+        # filter=KeywordMessageFilter(['траснформ', 'цифров', 'устойчив'], server_search=True),
+        # server_search=True
     )
     start = timer()
     await search.start()
     end = timer()
     logger.info(f'Search finished. Elapsed time: {timedelta(seconds=end-start)}')
+    storage.close()
 
     # search = SnowballChannelSearch(
     #     client_pool=client_pool, 
@@ -1,2 +1,8 @@
 from .similarity_estimator import SimilarityEstimator
-from .channel_relevance_estimator import ChannelRelevanceEstimator, KeywordChannelRelevanceEstimator
\ No newline at end of file
+from .channel_relevance_estimator import ChannelRelevanceEstimator, KeywordChannelRelevanceEstimator
+from .keyword_matcher import KeywordMatcher
+from .sampling_relevance_estimator import SamplingChannelRelevanceEstimator, RelevanceEstimate, wilson_interval
+from .persistent_relevance_estimator import PersistentChannelRelevanceEstimator
+from .minhash_similarity_estimator import MinHashSimilarityEstimator
+from .near_duplicate_detector import LshIndex, NearDuplicateDetector
+from .tfidf_relevance_estimator import TfidfChannelRelevanceEstimator
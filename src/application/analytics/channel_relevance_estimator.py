@@ -1,44 +1,93 @@
-from src.application.client import ClientPool
+import json
+import hashlib
+from src.application.client import ClientPool, MessageWindowCache
 from src.infrastructure.logging import logger
+from .keyword_matcher import KeywordMatcher
 
 
 class ChannelRelevanceEstimator:
     async def get_relevance(self, channel_id: str):
         return 0
 
+    async def get_scored_relevance(self, channel_id: str) -> tuple[float, int]:
+        """
+        Returns relevance and the number of messages it is based on, None if unknown.
+        Estimators do not raise: errors are logged and give relevance 0 based on 0 messages.
+        """
+        return await self.get_relevance(channel_id), None
+
+    def get_key(self) -> str:
+        """
+        Returns identifier of the estimator and its configuration.
+        Scores of estimators with equal keys are interchangeable.
+        """
+        return type(self).__name__
+
+    @staticmethod
+    def _hash_config(name: str, config: dict) -> str:
+        data = json.dumps(config, sort_keys=True, ensure_ascii=False)
+        return f'{name}:{hashlib.sha1(data.encode()).hexdigest()}'
+
+    def use_message_cache(self, message_cache: MessageWindowCache):
+        """
+        Sets cache of the latest channel messages shared with the search.
+        Estimators which fetch messages should read them through the cache. None disables the cache.
+        """
+        pass
+
 
 class KeywordChannelRelevanceEstimator(ChannelRelevanceEstimator):
 
     _client_pool: ClientPool
     _keywords: dict[str, int]
+    _matcher: KeywordMatcher
+    _costs: list[int]
+    _normalize_yo: bool = False
+    _message_cache: MessageWindowCache = None
 
-    def __init__(self, client_pool: ClientPool, keywords: dict[str, int]):
+    def __init__(self, client_pool: ClientPool, keywords: dict[str, int], normalize_yo: bool = False):
         self._client_pool =client_pool
         self._keywords = keywords
+        self._matcher = KeywordMatcher(list(keywords.keys()), normalize_yo=normalize_yo)
+        self._costs = list(keywords.values())
+        self._normalize_yo = normalize_yo
+
+    def use_message_cache(self, message_cache: MessageWindowCache):
+        self._message_cache = message_cache
+
+    def get_key(self) -> str:
+        return self._hash_config('keyword', {'keywords': self._keywords, 'normalize_yo': self._normalize_yo})
 
     async def get_relevance(self, channel_id: str):
-        try: 
+        return (await self.get_scored_relevance(channel_id))[0]
+
+    async def get_scored_relevance(self, channel_id: str) -> tuple[float, int]:
+        try:
+            return await self._estimate(channel_id)
+        except Exception as e:
+            logger.error('Relevance estimation failed. ' + str(e))
+            return 0, 0
+
+    async def _estimate(self, channel_id: str) -> tuple[float, int]:
+        if self._message_cache is not None:
+            messages = await self._message_cache.get_latest_messages(channel_id, 100)
+        else:
             messages = await self._client_pool.get().get_messages(
                 channel_id, 
                 limit=100, 
                 offset_id=0, 
                 add_offset=0
             )
-            cnt = 0
-            for m in messages:
-                if m.text is None:
-                    continue
-                text = m.text.lower()
-                relevance_msg = 1
-                for kw, cost in self._keywords.items():
-                    if kw in text:
-                        # Multiply keywords inside message.
-                        # Message with lot of keywords will get high relevance.
-                        relevance_msg *= cost 
-                if relevance_msg == 1:
-                    relevance_msg = 0
-                cnt += relevance_msg
-            return cnt
-        except Exception as e:
-            logger.error('Relevance estimation failed. ' + str(e))
-            return 0
\ No newline at end of file
+        cnt = 0
+        for m in messages:
+            if m.text is None:
+                continue
+            relevance_msg = 1
+            for keyword_id in self._matcher.find_all(m.text):
+                # Multiply keywords inside message.
+                # Message with lot of keywords will get high relevance.
+                relevance_msg *= self._costs[keyword_id]
+            if relevance_msg == 1:
+                relevance_msg = 0
+            cnt += relevance_msg
+        return cnt, len(messages)
@@ -0,0 +1,123 @@
+_YO = str.maketrans({'ё': 'е', 'Ё': 'Е'})
+
+
+class KeywordMatcher:
+    """
+    Finds all occurrences of many keywords in a text in a single pass.
+
+    Keywords are compiled once into an Aho-Corasick automaton,
+    so matching time depends on the text length but not on the number of keywords.
+    Keywords are identified by their index in the list given to the constructor.
+    """
+    _keywords: list[str] = None
+    _ignore_case: bool = True
+    _normalize_yo: bool = False
+    # Transitions of the automaton by character. Missing character leads to the root state.
+    _transitions: list[dict[str, int]] = None
+    # Ids of keywords which end in the state.
+    _outputs: list[tuple[int]] = None
+
+    def __init__(self, keywords: list[str], ignore_case: bool = True, normalize_yo: bool = False):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        keywords: list[str]
+            Keywords to be found. Keywords are matched as substrings of the text.
+        ignore_case: bool
+            If True, keywords and texts are compared in lower case.
+        normalize_yo: bool
+            If True, 'ё' is treated as 'е'.
+        """
+        self._keywords = list(keywords)
+        self._ignore_case = ignore_case
+        self._normalize_yo = normalize_yo
+        for keyword in self._keywords:
+            if len(keyword) == 0:
+                raise Exception('Keyword must not be empty.')
+        self._build([self.normalize(x) for x in self._keywords])
+
+    def _build(self, keywords: list[str]):
+        transitions = [{}]
+        outputs = [[]]
+        for keyword_id, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(transitions)
+                    transitions[state][char] = next_state
+                    transitions.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(keyword_id)
+        # Breadth-first pass turns the trie into a complete automaton:
+        # each state inherits transitions and outputs of its failure state.
+        failures = [0] * len(transitions)
+        queue = list(transitions[0].values())
+        for state in queue:
+            outputs[state].extend(outputs[failures[state]])
+            for char, next_state in list(transitions[state].items()):
+                failure = failures[state]
+                while failure != 0 and char not in transitions[failure]:
+                    failure = failures[failure]
+                failures[next_state] = transitions[failure].get(char, 0)
+                queue.append(next_state)
+            for char, next_state in transitions[failures[state]].items():
+                transitions[state].setdefault(char, next_state)
+        self._transitions = transitions
+        self._outputs = [tuple(x) for x in outputs]
+
+    def normalize(self, text: str) -> str:
+        """
+        Returns text in the form which is used for matching.
+        """
+        if self._normalize_yo:
+            text = text.translate(_YO)
+        if self._ignore_case:
+            text = text.lower()
+        return text
+
+    def find_all(self, text: str) -> set[int]:
+        """
+        Returns
+        -------
+        set[int]
+            Returns ids of keywords found in the text.
+        """
+        found = set()
+        if text is None:
+            return found
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        for char in self.normalize(text):
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+    def match_any(self, text: str) -> bool:
+        """
+        Returns True if at least one keyword is found in the text.
+        """
+        if text is None:
+            return False
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        for char in self.normalize(text):
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                return True
+        return False
+
+    def get_keyword(self, keyword_id: int) -> str:
+        """
+        Returns keyword by its id.
+        """
+        return self._keywords[keyword_id]
+
+    def __len__(self):
+        return len(self._keywords)
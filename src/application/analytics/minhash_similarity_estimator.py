@@ -0,0 +1,118 @@
+import re
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .similarity_estimator import SimilarityEstimator
+
+
+class MinHashSimilarityEstimator(SimilarityEstimator):
+    """
+    Estimates Jaccard similarity of character shingles of texts with MinHash.
+
+    Text is lowercased and whitespace is collapsed. Shingles are hashed with a polynomial hash
+    over all windows at once. Signature holds the minimum of each of :num_perm hash functions
+    over the shingles, and the share of equal signature positions estimates the Jaccard similarity.
+    Text without shingles (empty or whitespace only, e.g. media without caption) has no signature
+    and is not similar to any text, including another empty one.
+    Hash functions are splitmix64 finalizers with different seeds, computed for all
+    functions and shingles at once with wrapping 64-bit arithmetic.
+    """
+    _MAX_HASH = np.uint64(0xFFFFFFFFFFFFFFFF)
+    _GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+    _MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+    _MIX_2 = np.uint64(0x94D049BB133111EB)
+    _WHITESPACE = re.compile(r'\s+')
+
+    _shingle_size: int = 5
+    _num_perm: int = 128
+    _powers: np.ndarray = None
+    _seeds: np.ndarray = None
+
+    def __init__(self, shingle_size: int = 5, num_perm: int = 128, seed: int = 1):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        shingle_size: int
+            Number of characters in a shingle.
+        num_perm: int
+            Number of hash functions, i.e. length of a signature.
+            Error of the similarity estimate is about 1 / sqrt(num_perm).
+        seed: int
+            Seed of hash functions. Signatures are comparable only if they are built with the same seed.
+        """
+        self._shingle_size = shingle_size
+        self._num_perm = num_perm
+        base = 1_000_003
+        self._powers = np.array(
+            [pow(base, shingle_size - 1 - i, 1 << 64) for i in range(shingle_size)],
+            dtype=np.uint64
+        )
+        self._seeds = np.random.default_rng(seed).integers(0, self._MAX_HASH, num_perm, dtype=np.uint64, endpoint=True)
+
+    def get_num_perm(self) -> int:
+        return self._num_perm
+
+    def get_shingles(self, text: str) -> np.ndarray:
+        """
+        Returns unique 64-bit hashes of character shingles of the text.
+        Text shorter than a shingle is one shingle.
+        """
+        text = self._WHITESPACE.sub(' ', (text or '').lower()).strip()
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        if len(codes) == 0:
+            return np.zeros(0, dtype=np.uint64)
+        if len(codes) < self._shingle_size:
+            windows = codes[None, :]
+            powers = self._powers[-len(codes):]
+        else:
+            windows = sliding_window_view(codes, self._shingle_size)
+            powers = self._powers
+        return np.unique((windows * powers).sum(axis=1, dtype=np.uint64))
+
+    def get_signature(self, text: str) -> np.ndarray:
+        """
+        Returns MinHash signature of the text or None if text has no shingles.
+        """
+        shingles = self.get_shingles(text)
+        if len(shingles) == 0:
+            return None
+        return self._mix(self._seeds[:, None] ^ shingles[None, :]).min(axis=1)
+
+    @classmethod
+    def _mix(cls, x: np.ndarray) -> np.ndarray:
+        """
+        Applies splitmix64 finalizer. Multiplications wrap modulo 2^64.
+        """
+        x = x + cls._GOLDEN
+        x = (x ^ (x >> np.uint64(30))) * cls._MIX_1
+        x = (x ^ (x >> np.uint64(27))) * cls._MIX_2
+        return x ^ (x >> np.uint64(31))
+
+    def get_signatures(self, texts: list[str]) -> np.ndarray:
+        """
+        Returns signatures of texts as rows of a matrix.
+        Rows of texts without shingles are all maximum values, :compare treats them as no signature.
+        """
+        signatures = np.full((len(texts), self._num_perm), self._MAX_HASH, dtype=np.uint64)
+        for i, text in enumerate(texts):
+            signature = self.get_signature(text)
+            if signature is not None:
+                signatures[i] = signature
+        return signatures
+
+    @classmethod
+    def compare(cls, signature1: np.ndarray, signature2: np.ndarray) -> float:
+        """
+        Returns estimated Jaccard similarity of texts by their signatures.
+        Second signature can be a matrix, then similarity to each row is returned.
+        Similarity to a missing signature is 0.
+        """
+        if signature1 is None or signature2 is None:
+            return 0.0
+        similarity = np.mean(signature1 == signature2, axis=-1)
+        missing = (signature2 == cls._MAX_HASH).all(axis=-1) | (signature1 == cls._MAX_HASH).all()
+        return np.where(missing, 0.0, similarity)
+
+    def get_similarity(self, text1: str, text2: str) -> float:
+        return float(self.compare(self.get_signature(text1), self.get_signature(text2)))
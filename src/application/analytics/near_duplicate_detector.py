@@ -0,0 +1,141 @@
+import numpy as np
+from collections import defaultdict
+from .minhash_similarity_estimator import MinHashSimilarityEstimator
+
+
+class LshIndex:
+    """
+    Finds signatures which are likely similar to the given one without comparing to all of them.
+
+    Signature is split into :bands bands of equal length. Signatures are candidates
+    if they are equal in at least one band, so the pair with Jaccard similarity s
+    becomes candidates with probability 1 - (1 - s^rows)^bands.
+    """
+    _bands: int = 16
+    _rows: int = 8
+    _buckets: list[dict[bytes, list]] = None
+    _size: int = 0
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        num_perm: int
+            Length of signatures.
+        bands: int
+            Number of bands. It must divide :num_perm.
+            More bands find less similar candidates at the cost of more false candidates.
+        """
+        if num_perm % bands != 0:
+            raise Exception(f'Number of bands {bands} does not divide signature length {num_perm}.')
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        self._size = 0
+
+    def get_threshold(self) -> float:
+        """
+        Returns similarity at which the pair becomes candidates with probability about 1/2.
+        """
+        return (1 / self._bands) ** (1 / self._rows)
+
+    def add(self, key, signature: np.ndarray):
+        for band, band_key in zip(self._buckets, self._get_band_keys(signature)):
+            band[band_key].append(key)
+        self._size += 1
+
+    def query(self, signature: np.ndarray) -> set:
+        """
+        Returns keys of candidate signatures.
+        """
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._get_band_keys(signature)):
+            candidates.update(band.get(band_key, ()))
+        return candidates
+
+    def _get_band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [x.tobytes() for x in signature.reshape(self._bands, self._rows)]
+
+    def __len__(self):
+        return self._size
+
+
+class NearDuplicateDetector:
+    """
+    Groups near-duplicate texts into clusters as they arrive.
+
+    New text is compared only to candidates from the LSH index. It joins the cluster
+    of the most similar candidate if the estimated similarity is at least :threshold,
+    otherwise it starts a new cluster. Cluster is identified by the key of its first text.
+    Texts without shingles (empty or media only) are never near-duplicates and are not indexed.
+    """
+    _estimator: MinHashSimilarityEstimator = None
+    _index: LshIndex = None
+    _threshold: float = 0.8
+    _signatures: dict = None
+    _clusters: dict = None
+    _cluster_sizes: dict = None
+
+    def __init__(self,
+                 estimator: MinHashSimilarityEstimator = None,
+                 threshold: float = 0.8,
+                 bands: int = 16
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        estimator: MinHashSimilarityEstimator
+            Builds signatures of texts. Default estimator is used if None.
+        threshold: float
+            Minimum estimated Jaccard similarity of near-duplicates.
+        bands: int
+            Number of LSH bands. Index threshold should be below :threshold,
+            so near-duplicates are rarely missed.
+        """
+        self._estimator = estimator or MinHashSimilarityEstimator()
+        self._index = LshIndex(self._estimator.get_num_perm(), bands)
+        self._threshold = threshold
+        self._signatures = {}
+        self._clusters = {}
+        self._cluster_sizes = {}
+
+    def add(self, key, text: str):
+        """
+        Adds text and returns key of its cluster.
+        Text is a near-duplicate if key of its cluster differs from its own key.
+        """
+        if key in self._clusters:
+            return self._clusters[key]
+        signature = self._estimator.get_signature(text)
+        cluster = key
+        if signature is None:
+            self._clusters[key] = cluster
+            self._cluster_sizes[cluster] = 1
+            return cluster
+        candidates = list(self._index.query(signature))
+        if len(candidates) > 0:
+            similarity = self._estimator.compare(signature, np.stack([self._signatures[x] for x in candidates]))
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self._threshold:
+                cluster = self._clusters[candidates[best]]
+        self._index.add(key, signature)
+        self._signatures[key] = signature
+        self._clusters[key] = cluster
+        self._cluster_sizes[cluster] = self._cluster_sizes.get(cluster, 0) + 1
+        return cluster
+
+    def get_cluster(self, key):
+        """
+        Returns key of the cluster of the text or None if text was not added.
+        """
+        return self._clusters.get(key)
+
+    def get_cluster_size(self, cluster) -> int:
+        return self._cluster_sizes.get(cluster, 0)
+
+    def __len__(self):
+        return len(self._clusters)
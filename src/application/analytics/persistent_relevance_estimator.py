@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+from src.application.client import MessageWindowCache
+from src.infrastructure.logging import logger
+from src.infrastructure.scores import RelevanceScore, RelevanceScoreStore
+from .channel_relevance_estimator import ChannelRelevanceEstimator
+
+
+class PersistentChannelRelevanceEstimator(ChannelRelevanceEstimator):
+    """
+    Reuses relevance scores saved by previous runs.
+
+    Score is taken from the store if it was estimated by an estimator with the same key
+    within :max_age. Otherwise the channel is estimated by the wrapped estimator
+    and the new score is saved. Scores based on no messages (failed estimations and empty channels)
+    are not saved, so they are estimated again by the next runs.
+    Errors of the estimator and the store are logged and do not stop the search.
+    """
+    _estimator: ChannelRelevanceEstimator = None
+    _store: RelevanceScoreStore = None
+    _max_age: timedelta = None
+    _hit_count: int = 0
+    _miss_count: int = 0
+
+    def __init__(self,
+                 estimator: ChannelRelevanceEstimator,
+                 store: RelevanceScoreStore,
+                 max_age: timedelta = timedelta(days=7)
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        estimator: ChannelRelevanceEstimator
+            Estimator of unknown and stale channels.
+        store: RelevanceScoreStore
+            Store of scores shared between runs.
+        max_age: timedelta
+            Scores older than this are estimated again. If None, scores never become stale.
+        """
+        self._estimator = estimator
+        self._store = store
+        self._max_age = max_age
+        self._hit_count = 0
+        self._miss_count = 0
+
+    def use_message_cache(self, message_cache: MessageWindowCache):
+        self._estimator.use_message_cache(message_cache)
+
+    def get_key(self) -> str:
+        return self._estimator.get_key()
+
+    async def get_relevance(self, channel_id: str):
+        return (await self.get_scored_relevance(channel_id))[0]
+
+    async def get_scored_relevance(self, channel_id: str) -> tuple[float, int]:
+        key = self._estimator.get_key()
+        now = datetime.now(timezone.utc)
+        try:
+            score = self._store.get(channel_id, key)
+        except Exception as e:
+            logger.error(f'Failed to read relevance of channel {channel_id}: {e}')
+            score = None
+        if score is not None and (self._max_age is None or now - score.scored_at <= self._max_age):
+            self._hit_count += 1
+            return score.relevance, score.sample_size
+        self._miss_count += 1
+        try:
+            relevance, sample_size = await self._estimator.get_scored_relevance(channel_id)
+        except Exception as e:
+            logger.error(f'Relevance estimation of channel {channel_id} failed. {e}')
+            return 0, 0
+        if sample_size == 0:
+            return relevance, sample_size
+        try:
+            self._store.put(RelevanceScore(
+                channel_id=channel_id,
+                estimator_key=key,
+                relevance=relevance,
+                sample_size=sample_size,
+                scored_at=datetime.now(timezone.utc)
+            ))
+        except Exception as e:
+            logger.error(f'Failed to save relevance of channel {channel_id}: {e}')
+            return relevance, sample_size
+        logger.debug(f'Relevance of channel {channel_id} is estimated and saved: {relevance}')
+        return relevance, sample_size
+
+    def get_hit_count(self) -> int:
+        """
+        Returns the number of channels whose score was taken from the store.
+        """
+        return self._hit_count
+
+    def get_miss_count(self) -> int:
+        """
+        Returns the number of channels which were estimated.
+        """
+        return self._miss_count
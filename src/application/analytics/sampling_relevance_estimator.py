@@ -0,0 +1,198 @@
+import math
+from dataclasses import dataclass
+from src.application.client import ClientPool, MessageWindowCache
+from src.infrastructure.logging import logger
+from src.infrastructure.telegram import MessageResponse
+from .channel_relevance_estimator import ChannelRelevanceEstimator
+from .keyword_matcher import KeywordMatcher
+
+
+@dataclass
+class RelevanceEstimate:
+    # Share of sampled messages with keywords.
+    rate: float
+    # Bounds of the confidence interval of the rate.
+    lower: float
+    upper: float
+    # Number of sampled messages with text.
+    sample_size: int
+    # True or False if the interval is above or below the threshold, None if sampling stopped undecided.
+    is_relevant: bool
+
+
+def wilson_interval(successes: int, total: int, z: float = 1.96) -> tuple[float, float]:
+    """
+    Returns Wilson score interval of a binomial proportion.
+    Interval is (0, 1) if :total is 0.
+    """
+    if total == 0:
+        return 0.0, 1.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class SamplingChannelRelevanceEstimator(ChannelRelevanceEstimator):
+    """
+    Estimates share of channel messages with keywords from a sample of its history.
+
+    Messages are fetched in small pages. The first page is the latest messages, other pages start
+    at message ids spread evenly over the history and are visited in van der Corput order,
+    so a sample stopped early still covers the whole history.
+    Sampling stops when the Wilson interval of the rate is entirely above or below the threshold.
+
+    Relevance is the rate, so channels are comparable regardless of how many messages were sampled.
+    If messages can not be fetched, the error is logged and relevance is 0 based on 0 messages.
+    """
+    _client_pool: ClientPool = None
+    _keywords: list[str] = None
+    _matcher: KeywordMatcher = None
+    _normalize_yo: bool = False
+    _threshold: float = 0.1
+    _z: float = 1.96
+    _page_size: int = 10
+    _min_messages: int = 20
+    _max_messages: int = 100
+    _message_cache: MessageWindowCache = None
+
+    def __init__(self,
+                 client_pool: ClientPool,
+                 keywords: list[str],
+                 threshold: float = 0.1,
+                 z: float = 1.96,
+                 page_size: int = 10,
+                 min_messages: int = 20,
+                 max_messages: int = 100,
+                 normalize_yo: bool = False
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        keywords: list[str]
+            Message is relevant if it contains any keyword.
+        threshold: float
+            Channel is relevant if share of relevant messages is above this value.
+        z: float
+            Quantile of the normal distribution for the confidence interval, 1.96 for 95%.
+        page_size: int
+            Number of messages in one request.
+        min_messages: int
+            Sampling does not stop before this number of messages is fetched.
+        max_messages: int
+            Maximum number of fetched messages per channel.
+        normalize_yo: bool
+            If True, 'ё' is matched as 'е'.
+        """
+        self._client_pool = client_pool
+        self._keywords = keywords
+        self._matcher = KeywordMatcher(keywords, normalize_yo=normalize_yo)
+        self._normalize_yo = normalize_yo
+        self._threshold = threshold
+        self._z = z
+        self._page_size = page_size
+        self._min_messages = min_messages
+        self._max_messages = max_messages
+
+    def use_message_cache(self, message_cache: MessageWindowCache):
+        self._message_cache = message_cache
+
+    async def get_relevance(self, channel_id: str) -> float:
+        return (await self.get_scored_relevance(channel_id))[0]
+
+    async def get_scored_relevance(self, channel_id: str) -> tuple[float, int]:
+        try:
+            estimate = await self.get_estimate(channel_id)
+        except Exception as e:
+            logger.error(f'Relevance estimation of channel {channel_id} failed. {e}')
+            return 0, 0
+        return estimate.rate, estimate.sample_size
+
+    def get_key(self) -> str:
+        return self._hash_config('sampling', {
+            'keywords': sorted(self._keywords),
+            'threshold': self._threshold,
+            'z': self._z,
+            'page_size': self._page_size,
+            'min_messages': self._min_messages,
+            'max_messages': self._max_messages,
+            'normalize_yo': self._normalize_yo,
+        })
+
+    async def get_estimate(self, channel_id: str) -> RelevanceEstimate:
+        """
+        Samples messages of the channel until the relevance is decided or the sample is full.
+        Errors of message requests are raised.
+        """
+        seen = set()
+        fetched = 0
+        relevant = 0
+        total = 0
+        decision = None
+        page = await self._get_latest_page(channel_id)
+        if len(page) == self._page_size:
+            last_id = page[0].message_id
+            strata = math.ceil(self._max_messages / self._page_size)
+            offsets = [last_id + 1 - round(x * last_id / strata) for x in self._get_strata_order(strata)]
+        else:
+            # Channel is shorter than a page, so the whole history is already fetched.
+            offsets = []
+        while True:
+            for m in page:
+                fetched += 1
+                if m.message_id in seen or m.text is None:
+                    continue
+                seen.add(m.message_id)
+                total += 1
+                if self._matcher.match_any(m.text):
+                    relevant += 1
+            lower, upper = wilson_interval(relevant, total, self._z)
+            if fetched >= self._min_messages:
+                if lower > self._threshold:
+                    decision = True
+                elif upper < self._threshold:
+                    decision = False
+            if decision is not None or len(offsets) == 0 or fetched + self._page_size > self._max_messages:
+                break
+            page = await self._client_pool.get().get_messages(
+                channel_id,
+                limit=self._page_size,
+                offset_id=offsets.pop(0),
+                add_offset=0
+            )
+        estimate = RelevanceEstimate(
+            rate=relevant / total if total > 0 else 0,
+            lower=lower,
+            upper=upper,
+            sample_size=total,
+            is_relevant=decision
+        )
+        logger.debug(f'Relevance of channel {channel_id}: {estimate}, fetched {fetched} messages.')
+        return estimate
+
+    async def _get_latest_page(self, channel_id: str) -> list[MessageResponse]:
+        if self._message_cache is not None:
+            return await self._message_cache.get_latest_messages(channel_id, self._page_size)
+        return await self._client_pool.get().get_messages(
+            channel_id,
+            limit=self._page_size,
+            offset_id=0,
+            add_offset=0
+        )
+
+    @staticmethod
+    def _get_strata_order(count: int) -> list[int]:
+        """
+        Returns strata 1..count-1 in van der Corput order, so each prefix is spread over the history.
+        """
+        def van_der_corput(x: int) -> float:
+            result, base = 0, 0.5
+            while x > 0:
+                result += base * (x & 1)
+                x >>= 1
+                base /= 2
+            return result
+        return sorted(range(1, count), key=van_der_corput)
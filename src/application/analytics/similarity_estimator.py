@@ -1,3 +1,6 @@
 class SimilarityEstimator:
-    def get_similarity(text1: str, text2: str):
-        pass
\ No newline at end of file
+    def get_similarity(self, text1: str, text2: str) -> float:
+        """
+        Returns similarity of texts from 0 to 1.
+        """
+        return 0
@@ -0,0 +1,224 @@
+import re
+import asyncio
+import numpy as np
+from array import array
+from src.application.client import ClientPool, MessageWindowCache
+from src.infrastructure.logging import logger
+from .channel_relevance_estimator import ChannelRelevanceEstimator
+
+
+class TfidfChannelRelevanceEstimator(ChannelRelevanceEstimator):
+    """
+    Scores channels by TF-IDF similarity of their latest messages to a query profile.
+
+    Messages of a channel make one document. Tokens are interned to integer ids and documents
+    are kept as sparse term vectors in CSR layout. Each estimated channel is added to the corpus
+    once, before it is scored, so rare terms of the crawled corpus weigh more and scoring
+    a channel again does not change document frequencies. Scores of the first channels are based
+    on a small corpus; call :fit with a sample of channels to make them comparable with later ones.
+
+    Query terms are matched as token prefixes, e.g. 'эконом' matches 'экономика'.
+    Relevance is the sum of weights of query terms multiplied by TF-IDF weights of matching tokens
+    in the L2-normalized document vector. TF is sublinear: 1 + log(count).
+
+    Messages of several channels are fetched concurrently, at most one channel per client at a time.
+    Channels whose messages can not be fetched have relevance 0 and are not added to the corpus.
+    """
+    _TOKEN = re.compile(r'\w+')
+
+    _client_pool: ClientPool = None
+    _query: dict[str, float] = None
+    _message_count: int = 100
+    _normalize_yo: bool = False
+    _message_cache: MessageWindowCache = None
+    # Token ids by token.
+    _vocabulary: dict[str, int] = None
+    # Query weight by token id, 0 if token matches no query term.
+    _token_weights: array = None
+    # Number of documents with the token by token id.
+    _document_frequencies: array = None
+    _document_count: int = 0
+    # Channels added to the corpus.
+    _corpus_channels: set[str] = None
+
+    def __init__(self,
+                 client_pool: ClientPool,
+                 query: dict[str, float],
+                 message_count: int = 100,
+                 normalize_yo: bool = False
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        query: dict[str, float]
+            Weights of query terms. Term is matched as a prefix of lowercased tokens.
+        message_count: int
+            Number of the latest messages of a channel used as its document.
+        normalize_yo: bool
+            If True, 'ё' is treated as 'е'.
+        """
+        self._client_pool = client_pool
+        self._normalize_yo = normalize_yo
+        self._query = {self._normalize(k): v for k, v in query.items()}
+        self._message_count = message_count
+        self._vocabulary = {}
+        self._token_weights = array('d')
+        self._document_frequencies = array('q')
+        self._document_count = 0
+        self._corpus_channels = set()
+
+    def use_message_cache(self, message_cache: MessageWindowCache):
+        self._message_cache = message_cache
+
+    def get_key(self) -> str:
+        return self._hash_config('tfidf', {
+            'query': self._query,
+            'message_count': self._message_count,
+            'normalize_yo': self._normalize_yo,
+        })
+
+    async def get_relevance(self, channel_id: str) -> float:
+        return (await self.get_relevance_many([channel_id]))[0]
+
+    async def get_scored_relevance(self, channel_id: str) -> tuple[float, int]:
+        try:
+            messages = await self._get_messages(channel_id)
+        except Exception as e:
+            logger.error(f'Relevance estimation of channel {channel_id} failed. {e}')
+            return 0, 0
+        document = [x.text for x in messages]
+        self.add_documents({channel_id: document})
+        return self.score_documents([document])[0], len(messages)
+
+    async def get_relevance_many(self, channel_ids: list[str]) -> list[float]:
+        """
+        Fetches messages of channels concurrently, adds them to the corpus and scores them at once.
+        """
+        documents = await self._get_documents(channel_ids)
+        self.add_documents({k: v for k, v in zip(channel_ids, documents) if v is not None})
+        fetched = [i for i, x in enumerate(documents) if x is not None]
+        scores = [0] * len(documents)
+        for i, score in zip(fetched, self.score_documents([documents[i] for i in fetched])):
+            scores[i] = score
+        return scores
+
+    async def fit(self, channel_ids: list[str]):
+        """
+        Adds channels to the corpus without scoring them.
+        """
+        documents = await self._get_documents(channel_ids)
+        self.add_documents({k: v for k, v in zip(channel_ids, documents) if v is not None})
+
+    def add_documents(self, documents: dict[str, list[str]]):
+        """
+        Adds documents of channels to the corpus. Channels which are already in the corpus are skipped.
+        Each document is a list of message texts.
+        """
+        documents = {k: v for k, v in documents.items() if k not in self._corpus_channels}
+        if len(documents) == 0:
+            return
+        indptr, indices, _ = self._vectorize(list(documents.values()))
+        self._add_to_corpus(indptr, indices)
+        self._corpus_channels.update(documents)
+
+    def score_documents(self, documents: list[list[str]]) -> list[float]:
+        """
+        Returns relevance of documents by the current corpus. The corpus is not changed.
+        Each document is a list of message texts.
+        """
+        return self._score(*self._vectorize(documents)).tolist()
+
+    def get_corpus_size(self) -> int:
+        """
+        Returns the number of documents in the corpus.
+        """
+        return self._document_count
+
+    def _vectorize(self, documents: list[list[str]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns documents as CSR matrix of term counts: row starts, token ids and counts.
+        """
+        indptr = [0]
+        indices = []
+        counts = []
+        for texts in documents:
+            tokens = np.array(
+                [self._get_token_id(x) for text in texts if text for x in self._TOKEN.findall(self._normalize(text))],
+                dtype=np.int64
+            )
+            ids, id_counts = np.unique(tokens, return_counts=True)
+            indices.append(ids)
+            counts.append(id_counts)
+            indptr.append(indptr[-1] + len(ids))
+        return (
+            np.array(indptr, dtype=np.int64),
+            np.concatenate(indices) if len(indices) > 0 else np.zeros(0, dtype=np.int64),
+            np.concatenate(counts) if len(counts) > 0 else np.zeros(0, dtype=np.int64),
+        )
+
+    def _add_to_corpus(self, indptr: np.ndarray, indices: np.ndarray):
+        # View is released on return, because the array can not grow while its buffer is exported.
+        frequencies = np.frombuffer(self._document_frequencies, dtype=np.int64)
+        # Token ids are unique inside a row, so each document adds at most 1 to a token.
+        np.add.at(frequencies, indices, 1)
+        self._document_count += len(indptr) - 1
+
+    def _score(self, indptr: np.ndarray, indices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        rows = len(indptr) - 1
+        frequencies = np.frombuffer(self._document_frequencies, dtype=np.int64)
+        idf = np.log((1 + self._document_count) / (1 + frequencies)) + 1
+        weights = (1 + np.log(counts)) * idf[indices]
+        row_ids = np.repeat(np.arange(rows), np.diff(indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=weights * weights, minlength=rows))
+        query_weights = np.frombuffer(self._token_weights, dtype=np.float64)[indices]
+        scores = np.bincount(row_ids, weights=weights * query_weights, minlength=rows)
+        return np.divide(scores, norms, out=np.zeros(rows), where=norms > 0)
+
+    def _get_token_id(self, token: str) -> int:
+        token_id = self._vocabulary.get(token)
+        if token_id is None:
+            token_id = len(self._vocabulary)
+            self._vocabulary[token] = token_id
+            self._token_weights.append(self._get_query_weight(token))
+            self._document_frequencies.append(0)
+        return token_id
+
+    def _get_query_weight(self, token: str) -> float:
+        """
+        Returns weight of the longest query term which is a prefix of the token.
+        """
+        matches = [x for x in self._query if token.startswith(x)]
+        return self._query[max(matches, key=len)] if len(matches) > 0 else 0
+
+    def _normalize(self, text: str) -> str:
+        text = text.lower()
+        return text.replace('ё', 'е') if self._normalize_yo else text
+
+    async def _get_documents(self, channel_ids: list[str]) -> list[list[str]]:
+        """
+        Returns message texts of each channel, None if messages of the channel can not be fetched.
+        """
+        # Number of simultaneous requests is limited by the number of clients.
+        semaphore = asyncio.Semaphore(max(self._client_pool.get_size(), 1))
+
+        async def get_document(channel_id: str) -> list[str]:
+            try:
+                async with semaphore:
+                    return [x.text for x in await self._get_messages(channel_id)]
+            except Exception as e:
+                logger.error(f'Relevance estimation of channel {channel_id} failed. {e}')
+                return None
+
+        return await asyncio.gather(*[get_document(x) for x in channel_ids])
+
+    async def _get_messages(self, channel_id: str):
+        if self._message_cache is not None:
+            return await self._message_cache.get_latest_messages(channel_id, self._message_count)
+        return await self._client_pool.get().get_messages(
+            channel_id,
+            limit=self._message_count,
+            offset_id=0,
+            add_offset=0
+        )
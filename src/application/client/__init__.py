@@ -1,3 +1,5 @@
 from .client import Client
 from .client_pool import ClientPool
-from .client_factory import ClientFactory
\ No newline at end of file
+from .client_factory import ClientFactory
+from .rate_controller import RateController
+from .message_window_cache import MessageWindowCache
\ No newline at end of file
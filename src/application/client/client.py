@@ -1,7 +1,8 @@
 from src.infrastructure.logging import logger
 from src.infrastructure.cache import Cache
 from src.infrastructure.telegram import TelegramApi
-from src.infrastructure.telegram.model import MessageResponse
+from src.infrastructure.telegram.model import MessageResponse, MessageBatch
+from .rate_controller import RateController
 
 
 class Client:
@@ -10,11 +11,14 @@ class Client:
     """
     name: str = None
     is_active: bool = False
+    # Page size and request rate of the client. Shared by all searches which use the client.
+    rate_controller: RateController = None
     _api: TelegramApi = None
 
     def __init__(self, client_name, api):
         self.name = client_name
         self.is_active = False
+        self.rate_controller = RateController()
         self._api = api
 
     async def activate(self):
@@ -36,8 +40,15 @@ class Client:
         return await self._api.get_channel(channel_id)
     
     async def get_messages(self, channel_id, *, limit=3, offset_id=None, add_offset=None,
-        offset_date=None) -> list[MessageResponse]:
+        offset_date=None, min_id=None, search=None) -> list[MessageResponse]:
         """
         Get most recent messages from channel.
         """
-        return await self._api.get_messages(channel_id, limit, offset_id, add_offset, offset_date)
\ No newline at end of file
+        return await self._api.get_messages(channel_id, limit, offset_id, add_offset, offset_date, min_id, search)
+
+    async def get_message_batch(self, channel_id, *, limit=3, offset_id=None, add_offset=None,
+        offset_date=None, min_id=None, search=None) -> MessageBatch:
+        """
+        Get most recent messages from channel by columns.
+        """
+        return await self._api.get_message_batch(channel_id, limit, offset_id, add_offset, offset_date, min_id, search)
\ No newline at end of file
@@ -9,6 +9,10 @@ class ClientPool:
     _clients = [] # All registered clients
     _next_client_index = 0 # Id of client which will be used for API call next time
 
+    def __init__(self):
+        self._clients = []
+        self._next_client_index = 0
+
     def add_client(self, client: Client):
         self._clients.append(client)
 
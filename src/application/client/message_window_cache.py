@@ -0,0 +1,100 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from src.infrastructure.telegram import MessageResponse
+from .client_pool import ClientPool
+
+
+@dataclass
+class _Window:
+    # The latest messages of the channel from the newest to the oldest.
+    messages: list[MessageResponse] = field(default_factory=list)
+    # True if channel has no messages older than the window.
+    is_complete: bool = False
+    # Serializes fetches of the channel, so concurrent callers do not request the same messages.
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class MessageWindowCache:
+    """
+    Keeps the latest messages of channels during one run.
+
+    When a larger window of the channel is requested, only messages older
+    than the cached ones are fetched.
+    The total number of cached messages is bounded, least recently used channels are evicted first.
+    """
+    _client_pool: ClientPool = None
+    _max_messages: int = 0
+    _windows: OrderedDict[str, _Window] = None
+    _message_count: int = 0
+    _hit_count: int = 0
+
+    def __init__(self, client_pool: ClientPool, max_messages: int = 100000):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        client_pool: ClientPool
+            Clients which are used to fetch messages.
+        max_messages: int
+            Maximum number of cached messages of all channels.
+        """
+        self._client_pool = client_pool
+        self._max_messages = max_messages
+        self._windows = OrderedDict()
+        self._message_count = 0
+        self._hit_count = 0
+
+    async def get_latest_messages(self, channel_id: str, count: int) -> list[MessageResponse]:
+        """
+        Returns up to :count latest messages of the channel from the newest to the oldest.
+        """
+        window = self._windows.get(channel_id)
+        if window is None:
+            window = _Window()
+            self._windows[channel_id] = window
+        self._windows.move_to_end(channel_id)
+        async with window.lock:
+            missing = count - len(window.messages)
+            if missing <= 0 or window.is_complete:
+                self._hit_count += 1
+                return window.messages[:count]
+            offset_id = window.messages[-1].message_id if len(window.messages) > 0 else 0
+            messages = await self._client_pool.get().get_messages(
+                channel_id,
+                limit=missing,
+                offset_id=offset_id,
+                add_offset=0
+            )
+            window.messages.extend(messages)
+            window.is_complete = len(messages) < missing
+            if self._windows.get(channel_id) is window:
+                self._message_count += len(messages)
+                self._evict()
+            return window.messages[:count]
+
+    def discard(self, channel_id: str):
+        """
+        Removes messages of the channel from the cache.
+        """
+        window = self._windows.pop(channel_id, None)
+        if window is not None:
+            self._message_count -= len(window.messages)
+
+    def _evict(self):
+        while self._message_count > self._max_messages and len(self._windows) > 1:
+            channel_id = next(iter(self._windows))
+            self.discard(channel_id)
+
+    def get_message_count(self) -> int:
+        """
+        Returns the number of cached messages.
+        """
+        return self._message_count
+
+    def get_hit_count(self) -> int:
+        """
+        Returns the number of requests which were served without fetching messages.
+        """
+        return self._hit_count
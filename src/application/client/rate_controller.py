@@ -0,0 +1,116 @@
+import time
+import asyncio
+
+
+class RateController:
+    """
+    Adapts page size and interval between requests of one client (AIMD).
+
+    While requests are fast, page size grows additively up to the Telegram limit,
+    then the interval between requests shrinks additively.
+    Slow requests cut page size and flood waits cut page size and grow the interval multiplicatively.
+    Requests are not sent until a flood wait is over.
+    """
+    # Telegram returns at most 100 messages per history request.
+    MAX_PAGE_SIZE = 100
+
+    _page_size: float = 0
+    _min_page_size: int = 10
+    _increase: int = 10
+    _decrease: float = 0.5
+    _interval: float = 0
+    _interval_step: float = 0.1
+    _max_interval: float = 30
+    _target_latency: float = 5
+    _next_request_time: float = 0
+
+    def __init__(self,
+                 initial_page_size: int = 50,
+                 min_page_size: int = 10,
+                 increase: int = 10,
+                 decrease: float = 0.5,
+                 interval_step: float = 0.1,
+                 max_interval: float = 30,
+                 target_latency: float = 5
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        initial_page_size: int
+            Page size of the first request.
+        min_page_size: int
+            Page size is never decreased below this value.
+        increase: int
+            Page size is increased by this value after a fast request.
+        decrease: float
+            Page size is multiplied by this value after a slow request or a flood wait.
+        interval_step: float
+            Interval between requests in seconds is decreased by this value after a fast request
+            of the maximum size and is at least this value after a flood wait.
+        max_interval: float
+            Maximum interval between requests in seconds.
+        target_latency: float
+            Request which takes longer in seconds is treated as a sign of overload.
+        """
+        self._page_size = min(max(initial_page_size, min_page_size), self.MAX_PAGE_SIZE)
+        self._min_page_size = min_page_size
+        self._increase = increase
+        self._decrease = decrease
+        self._interval = 0
+        self._interval_step = interval_step
+        self._max_interval = max_interval
+        self._target_latency = target_latency
+        self._next_request_time = 0
+
+    def get_page_size(self) -> int:
+        """
+        Returns the number of messages to be requested next time.
+        """
+        return int(self._page_size)
+
+    def get_interval(self) -> float:
+        """
+        Returns the minimum interval between requests in seconds.
+        """
+        return self._interval
+
+    async def wait(self):
+        """
+        Waits until the next request is allowed and reserves the time slot for it.
+        """
+        now = time.monotonic()
+        start = max(now, self._next_request_time)
+        self._next_request_time = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def on_success(self, latency: float):
+        """
+        Adapts to a completed request.
+
+        Parameters
+        ----------
+        latency: float
+            Duration of the request in seconds.
+        """
+        if latency > self._target_latency:
+            self._page_size = max(self._min_page_size, self._page_size * self._decrease)
+        elif self._page_size < self.MAX_PAGE_SIZE:
+            self._page_size = min(self.MAX_PAGE_SIZE, self._page_size + self._increase)
+        else:
+            self._interval = max(0, self._interval - self._interval_step)
+
+    def on_flood_wait(self, seconds: float):
+        """
+        Adapts to a request refused because requests are too frequent.
+
+        Parameters
+        ----------
+        seconds: float
+            Number of seconds to wait before the next request.
+        """
+        self._page_size = max(self._min_page_size, self._page_size * self._decrease)
+        self._interval = min(self._max_interval, max(self._interval_step, self._interval * 2))
+        self._next_request_time = max(self._next_request_time, time.monotonic() + seconds)
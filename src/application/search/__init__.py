@@ -1,4 +1,8 @@
 from .search import Search
 from .snowball_channel_search import SnowballChannelSearch
-from .channel_messages_search import ChannelMessagesSearch, KeywordMessageFilter
+from .distributed_snowball_channel_search import DistributedSnowballChannelSearch
+from .channel_prioritizer import ChannelPrioritizer, PageRankChannelPrioritizer
+from .message_filter import MessageFilter, BatchMessageFilter, AllMessageFilter, KeywordMessageFilter, \
+    DateRangeMessageFilter, NumericMessageFilter, ForwardedMessageFilter, AndMessageFilter
+from .channel_messages_search import ChannelMessagesSearch
 from .multi_channel_messages_search import MultiChannelMessagesSearch
\ No newline at end of file
@@ -0,0 +1,61 @@
+import heapq
+
+
+class ChannelFrontier:
+    """
+    Channels waiting for ancestor search ordered by relevance.
+
+    Channels are identified by their indexes in ChannelGraph.
+    Channels are kept in a binary heap, so push and pop take O(log n).
+    Among channels with equal relevance the latest pushed one is popped first.
+    Removed and re-pushed channels are skipped lazily when they reach the top.
+    """
+    _heap: list[tuple[float, int, int]] = None
+    _relevance: dict[int, float] = None
+    _counter: int = 0
+
+    def __init__(self):
+        self._heap = []
+        self._relevance = {}
+        self._counter = 0
+
+    def push(self, channel: int, relevance: float):
+        """
+        Adds channel or updates its relevance.
+        """
+        relevance = relevance or 0
+        self._relevance[channel] = relevance
+        self._counter += 1
+        heapq.heappush(self._heap, (-relevance, -self._counter, channel))
+
+    def pop(self) -> int:
+        """
+        Removes and returns the most relevant channel. Returns None if frontier is empty.
+        """
+        while len(self._heap) > 0:
+            relevance, _, channel = heapq.heappop(self._heap)
+            if self._relevance.get(channel) == -relevance:
+                del self._relevance[channel]
+                return channel
+        return None
+
+    def pop_many(self, count: int) -> list[int]:
+        """
+        Removes and returns up to :count most relevant channels.
+        """
+        channels = []
+        while len(channels) < count:
+            channel = self.pop()
+            if channel is None:
+                break
+            channels.append(channel)
+        return channels
+
+    def remove(self, channel: int):
+        self._relevance.pop(channel, None)
+
+    def __contains__(self, channel: int):
+        return channel in self._relevance
+
+    def __len__(self):
+        return len(self._relevance)
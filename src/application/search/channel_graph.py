@@ -0,0 +1,180 @@
+import math
+import numpy as np
+from array import array
+from dataclasses import dataclass
+from enum import Enum
+
+
+class ChannelItemStatus(Enum):
+    QUEUED_FOR_LOADING = 0
+    RELEVANCE_UNKNOWN = 1
+    QUEUED_FOR_ANCESTORS_SEARCH = 2
+    FINISHED = 3
+    ERROR = 4
+
+
+@dataclass
+class ChannelItem:
+    channel_id: str
+    relevance: int
+    status: ChannelItemStatus
+
+
+class ChannelGraph:
+    """
+    Channels found by the snowball search and forward links between them.
+
+    Channel ids are interned to consecutive integer indexes.
+    Status and relevance are kept in typed arrays.
+    Links are kept in CSR layout: links of a channel are added at once
+    when the channel is searched, so they occupy a contiguous range of the target arrays.
+    Each link stores the number of messages forwarded from the target channel.
+    """
+    _ids: list[str] = None
+    _indexes: dict[str, int] = None
+    _statuses: array = None
+    # NaN if relevance is unknown.
+    _relevance: array = None
+    # Start and length of the link range of each channel. Start is -1 if links are not added.
+    _link_starts: array = None
+    _link_lengths: array = None
+    _link_targets: array = None
+    _link_counts: array = None
+    # Channels by status. Dicts keep the order in which channels got the status.
+    _by_status: dict[ChannelItemStatus, dict[int, None]] = None
+
+    def __init__(self):
+        self._ids = []
+        self._indexes = {}
+        self._statuses = array('b')
+        self._relevance = array('d')
+        self._link_starts = array('q')
+        self._link_lengths = array('l')
+        self._link_targets = array('l')
+        self._link_counts = array('l')
+        self._by_status = {x: {} for x in ChannelItemStatus}
+
+    def add_channel(self, channel_id: str, status: ChannelItemStatus = ChannelItemStatus.QUEUED_FOR_LOADING) -> int:
+        """
+        Adds channel if it is unknown. Returns index of the channel.
+        """
+        index = self._indexes.get(channel_id)
+        if index is not None:
+            return index
+        index = len(self._ids)
+        self._ids.append(channel_id)
+        self._indexes[channel_id] = index
+        self._statuses.append(status.value)
+        self._relevance.append(math.nan)
+        self._link_starts.append(-1)
+        self._link_lengths.append(0)
+        self._by_status[status][index] = None
+        return index
+
+    def get_index(self, channel_id: str) -> int:
+        """
+        Returns index of the channel or None if channel is unknown.
+        """
+        return self._indexes.get(channel_id)
+
+    def get_channel_id(self, index: int) -> str:
+        return self._ids[index]
+
+    def get_status(self, index: int) -> ChannelItemStatus:
+        return ChannelItemStatus(self._statuses[index])
+
+    def set_status(self, index: int, status: ChannelItemStatus):
+        del self._by_status[self.get_status(index)][index]
+        self._statuses[index] = status.value
+        self._by_status[status][index] = None
+
+    def get_relevance(self, index: int) -> float:
+        """
+        Returns relevance of the channel or None if it is unknown.
+        """
+        relevance = self._relevance[index]
+        return None if math.isnan(relevance) else relevance
+
+    def set_relevance(self, index: int, relevance: float):
+        self._relevance[index] = math.nan if relevance is None else relevance
+
+    def get_relevance_array(self) -> np.ndarray:
+        """
+        Returns copy of relevance by channel index, NaN if unknown.
+        """
+        return self._to_numpy(self._relevance)
+
+    def get_channels(self, status: ChannelItemStatus) -> list[int]:
+        """
+        Returns indexes of channels with the status in order they got it.
+        """
+        return list(self._by_status[status])
+
+    def count(self, status: ChannelItemStatus) -> int:
+        """
+        Returns the number of channels with the status.
+        """
+        return len(self._by_status[status])
+
+    def set_links(self, index: int, forward_counts: dict[int, int]):
+        """
+        Sets links of the channel.
+
+        Parameters
+        ----------
+        index: int
+            Index of the channel.
+        forward_counts: dict[int, int]
+            Number of forwarded messages by index of the channel they were forwarded from.
+        """
+        if self._link_starts[index] != -1:
+            raise Exception(f'Links of channel {self._ids[index]} are already set.')
+        self._link_starts[index] = len(self._link_targets)
+        self._link_lengths[index] = len(forward_counts)
+        for target, count in forward_counts.items():
+            self._link_targets.append(target)
+            self._link_counts.append(count)
+
+    def get_links(self, index: int) -> list[tuple[int, int]]:
+        """
+        Returns pairs of target channel index and number of forwarded messages.
+        """
+        start = self._link_starts[index]
+        if start == -1:
+            return []
+        end = start + self._link_lengths[index]
+        return list(zip(self._link_targets[start:end], self._link_counts[start:end]))
+
+    def get_link_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns copies of link starts and lengths by channel index, link targets and forward counts.
+        """
+        return (
+            self._to_numpy(self._link_starts),
+            self._to_numpy(self._link_lengths),
+            self._to_numpy(self._link_targets),
+            self._to_numpy(self._link_counts),
+        )
+
+    def get_link_count(self) -> int:
+        return len(self._link_targets)
+
+    def get_item(self, index: int) -> ChannelItem:
+        return ChannelItem(self._ids[index], self.get_relevance(index), self.get_status(index))
+
+    def to_items(self) -> dict[str, ChannelItem]:
+        """
+        Returns all channels by id.
+        """
+        return {x: self.get_item(i) for i, x in enumerate(self._ids)}
+
+    @staticmethod
+    def _to_numpy(values: array) -> np.ndarray:
+        # Copy is returned, because arrays can not grow while their buffer is exported.
+        return np.frombuffer(values, dtype=np.dtype(values.typecode)).copy()
+
+    def __contains__(self, channel_id: str):
+        return channel_id in self._indexes
+
+    def __len__(self):
+        return len(self._ids)
@@ -1,55 +1,67 @@
+import time
 import asyncio
 import pytz
+import numpy as np
 from datetime import datetime
-from abc import ABC, abstractmethod
-from src.application.client import ClientPool
-from src.infrastructure.storage import Storage, StoredItem
-from src.infrastructure.telegram import MessageResponse
+from src.application.client import ClientPool, Client
+from src.infrastructure.storage import Storage, StoredItem, StoredBatch, RecordSchema, ColumnType
+from src.infrastructure.telegram import MessageResponse, MessageBatch, FloodWaitError
 from src.infrastructure.logging import logger
 from .search import Search
+from .history_pages import HistoryPage, HistoryPageTracker
+from .message_filter import MessageFilter, AllMessageFilter, KeywordMessageFilter, DateRangeMessageFilter, AndMessageFilter
 
 
-class MessageFilter(ABC):
-    @abstractmethod
-    def match(self, message: MessageResponse) -> bool:
-        pass
-
-
-class AllMessageFilter(MessageFilter):
-    def match(self, message: MessageResponse) -> bool:
-        return True
-
-
-class KeywordMessageFilter(MessageFilter):
+class ChannelMessagesSearch(Search):
+    """
+    Downloads messages from Telegram channel.
 
-    _keywords = []
+    History is split into pages which are downloaded by all active clients in parallel.
+    A failed page is retried by the next free client.
 
-    def __init__(self, keywords: list[str]):
-        self._keywords = [x.lower() for x in keywords]
+    If :partitions is set, the message id range between :min_date and :max_date 
+    is found with two single-message requests and split into equal id segments.
+    Each segment is paged with its own cursor, so clients walk different parts
+    of the history at the same time.
 
-    def match(self, message: MessageResponse) -> bool:
-        if message.text is None:
-            return False
-        text_lower = message.text.lower()
-        for kw in self._keywords:
-            if kw in text_lower:
-                return True
-        return False
+    If :server_search is set and the filter provides search queries,
+    only messages found by Telegram search are downloaded: one cursor per query,
+    results are merged and deduplicated by message id.
+    The filter is still applied to the found messages.
+    Keyword filters provide queries only if they are created with server_search,
+    because Telegram search misses keywords inside words, see KeywordMessageFilter.
 
+    Progress of each segment is saved as 'message_search_cursor' rows: the oldest message id
+    of the completed part of the segment. A resumed search continues each unfinished segment
+    from its cursor, so partitions and queries of the first run are kept. Searches saved without
+    cursors resume from the oldest saved message.
 
-class ChannelMessagesSearch(Search):
-    """
-    Downloads messages from Telegram channel.
+    If :adaptive_batch_size is set, :message_batch_size is not used.
+    Page size and request rate of each client are adapted to request latency and flood waits,
+    see RateController.
     """
+    _MAX_PAGE_ATTEMPTS = 3
+
     _client_pool: ClientPool = None
     _storage: Storage = None
     _channel_id: str = None
     _max_message_count: int = None
     _message_batch_size: int = 0
     _filter: MessageFilter = None
+    # Filter of downloaded pages: :filter and :max_date.
+    _page_filter: MessageFilter = None
     _min_date: datetime = None
     _max_date: datetime = None
     _start_message_id: int = None
+    # Saved cursors of segments by query and min_id: offset_id and whether the segment is finished.
+    _saved_cursors: dict[tuple[str, int], tuple[int, bool]] = None
+    _total_messages: int = 0
+    _partitions: int = None
+    _segments: list[HistoryPageTracker] = None
+    _next_segment: int = 0
+    _server_search: bool = False
+    _adaptive_batch_size: bool = False
+    _seen_message_ids: set[int] = None
 
     def __init__(self, 
                  client_pool: ClientPool, 
@@ -60,6 +72,9 @@ class ChannelMessagesSearch(Search):
                  min_date: str,
                  max_date: str,
                  filter: MessageFilter = AllMessageFilter(),
+                 partitions: int = None,
+                 server_search: bool = False,
+                 adaptive_batch_size: bool = False
                 ):
         self._client_pool = client_pool
         self._storage = storage
@@ -67,162 +82,354 @@ class ChannelMessagesSearch(Search):
         self._max_message_count = max_message_count
         self._message_batch_size = message_batch_size
         self._filter = filter
+        self._partitions = partitions
+        self._server_search = server_search
+        self._adaptive_batch_size = adaptive_batch_size
         self._min_date = datetime.strptime(min_date, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
         self._max_date = datetime.strptime(max_date, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
-        self._start_message_id = self._read_state()['offset_id']
-        logger.info(f'Resume from message with id {self._start_message_id}')
+        self._page_filter = AndMessageFilter([DateRangeMessageFilter(max_date=self._max_date), filter])
+        state = self._read_state()
+        self._start_message_id = state['offset_id']
+        self._saved_cursors = state['cursors']
+        if len(self._saved_cursors) > 0:
+            logger.info(f'Resume {len(self._saved_cursors)} segments of {self._channel_id} from saved cursors')
+        else:
+            logger.info(f'Resume from message with id {self._start_message_id}')
 
     def _read_state(self):
-        messages = self._storage.read('message')
-        if messages is None:
-            return {
-                'offset_id': 0
-            }
-        messages = messages.split('\n')
-        message_ids = [v.split('\t')[0] for v in messages][1:-1]
-        message_ids = [int(x) for x in message_ids]
-        min_message_id = message_ids[0]
-        for id in message_ids:
-            min_message_id = min(min_message_id, id)
+        cursors = {}
+        batches = self._storage.scan(
+            'message_search_cursor',
+            where={'channel_id': self._channel_id},
+            schema=StoredSearchCursor.SCHEMA
+        )
+        for batch in batches:
+            for row in batch.to_dicts():
+                # The last saved cursor of a segment is the latest one.
+                cursors[(row['query'], int(row['min_id']))] = (int(row['offset_id']), bool(row['is_finished']))
+        offset_id = 0
+        if len(cursors) == 0:
+            batches = self._storage.scan(
+                'message',
+                columns=['message_id'],
+                where={'channel_id': self._channel_id}
+            )
+            for batch in batches:
+                for message_id in batch.column('message_id'):
+                    message_id = int(message_id)
+                    offset_id = message_id if offset_id == 0 else min(offset_id, message_id)
         return {
-            'offset_id': min_message_id
+            'offset_id': offset_id,
+            'cursors': cursors
         }
 
     async def start(self):
         if self._client_pool.get_size() == 0:
             raise Exception('Pool has no active clients. Unable to run search.')
-        offset_id=self._start_message_id
-        total_messages=0
+        self._total_messages = 0
+        self._seen_message_ids = set()
+        self._segments = await self._create_segments()
+        self._next_segment = 0
+        # Each worker takes the next page as soon as its previous page is done,
+        # so one slow client does not hold the others.
+        await asyncio.gather(
+            *[self._run_worker() for _ in range(self._client_pool.get_size())]
+        )
+        logger.info(f'Total messages: {self._total_messages}')
+
+    def get_message_count(self) -> int:
+        """
+        Returns the number of messages downloaded by the search.
+        """
+        return self._total_messages
+
+    async def _create_segments(self) -> list[HistoryPageTracker]:
+        if len(self._saved_cursors) > 0:
+            return [
+                HistoryPageTracker(offset_id, min_id, query)
+                for (query, min_id), (offset_id, is_finished) in self._saved_cursors.items()
+                if not is_finished
+            ]
+        ranges = await self._get_id_ranges()
+        queries = self._filter.get_search_queries() if self._server_search else None
+        if queries is None:
+            return [HistoryPageTracker(offset_id, min_id) for offset_id, min_id in ranges]
+        logger.info(f'Messages of {self._channel_id} are searched by {len(queries)} queries.')
+        return [
+            HistoryPageTracker(offset_id, min_id, query)
+            for query in queries
+            for offset_id, min_id in ranges
+        ]
+
+    async def _get_id_ranges(self) -> list[tuple[int, int]]:
+        """
+        Returns pairs of offset_id and min_id of history segments.
+        """
+        if self._partitions is None:
+            return [(self._start_message_id, 0)]
+        upper_id = self._start_message_id
+        if upper_id == 0:
+            upper_id = await self._probe_message_id(self._max_date) + 1
+        lower_id = await self._probe_message_id(self._min_date)
+        count = max(min(self._partitions, upper_id - lower_id - 1), 1)
+        bounds = [upper_id - (upper_id - lower_id) * i // count for i in range(count + 1)]
+        logger.info(f'Message ids ({lower_id}, {upper_id}) of {self._channel_id} are split into {count} segments.')
+        # Segment contains ids from bounds[i + 1] exclusive to bounds[i] inclusive,
+        # but offset_id is exclusive too, so it is shifted by one.
+        return [
+            (upper_id if i == 0 else bounds[i] + 1, bounds[i + 1])
+            for i in range(count)
+        ]
+
+    async def _probe_message_id(self, date: datetime) -> int:
+        """
+        Returns id of the latest message published before the date or 0 if there is no such message.
+        """
+        messages = await self._client_pool.get().get_messages(
+            self._channel_id, 
+            limit=1, 
+            offset_id=0, 
+            add_offset=0, 
+            offset_date=date
+        )
+        return messages[0].message_id if len(messages) > 0 else 0
+
+    def _claim_page(self, size: int) -> tuple[HistoryPageTracker, HistoryPage]:
+        """
+        Claims a page from segments in turn, so workers spread over segments.
+        """
+        count = len(self._segments)
+        for i in range(count):
+            index = (self._next_segment + i) % count
+            page = self._segments[index].claim(size)
+            if page is not None:
+                self._next_segment = (index + 1) % count
+                return self._segments[index], page
+        return None, None
+
+    def _stop(self):
+        for segment in self._segments:
+            segment.stop()
+
+    async def _run_worker(self):
         while True:
-            logger.info(f'Total messages: {total_messages}')
-            try:
-                results = await asyncio.gather(
-                    *[
-                        self._download_batch(self._message_batch_size, offset_id, i*self._message_batch_size)
-                        for i in range(self._client_pool.get_size())
-                    ]
-                )
-            except Exception as e:
-                logger.error(e)
-            results = [x for x in results if x is not None]
-            if len(results) == 0: 
-                # TODO
-                # If all results are ERROR than they probably could be retried
-                # But currently it leads to finishing the search
-                logger.info('No results found.')
+            client = self._client_pool.get()
+            size = self._message_batch_size
+            if self._adaptive_batch_size:
+                await client.rate_controller.wait()
+                size = client.rate_controller.get_page_size()
+            segment, page = self._claim_page(size)
+            if page is None:
                 return
-            should_finish = False
-            for result in results: 
-                logger.info('Result size is ' + str(result['size']))
-                total_messages += result['size']
-                if result['size'] != 0:
-                    if offset_id == 0:
-                        offset_id = result['last_message_id']
-                    offset_id = min(offset_id, result['last_message_id'])
-                if result['size'] == 0 or total_messages>=self._max_message_count:
-                    should_finish = True
-            if should_finish:
-                return
-    
-    async def _download_batch(self, batch_size, offset_id, add_offset):
-        if offset_id == 0 and add_offset != 0:
-            # We don't want to get the first batch multiple times
-            return None
+            await self._download_page(client, segment, page)
+
+    async def _download_page(self, client: Client, segment: HistoryPageTracker, page: HistoryPage):
+        start_time = time.monotonic()
         try:
-            messages = await self._client_pool.get().get_messages(
+            batch = await client.get_message_batch(
                 self._channel_id, 
-                limit=batch_size,
-                offset_id=offset_id,
-                add_offset=add_offset,
-                offset_date=self._max_date
+                limit=page.size,
+                offset_id=page.offset_id,
+                add_offset=page.add_offset,
+                offset_date=self._max_date,
+                min_id=page.min_id,
+                search=page.query
             )
-            messages = [m for m in messages if m.datetime >= self._min_date]
-            if len(messages) == 0:
-                return {
-                    'last_message_id': None,
-                    'size': len(messages)
-                }
-            stats = {
-                'last_message_id': messages[-1].message_id,
-                'size': len(messages)
-            }
-            messages = [m for m in messages if self._filter.match(m)]
-            messages = [m for m in messages if m.text is not None]
-            messages = [m for m in messages if m.datetime <= self._max_date]
-            for message in messages:
-                message.text = message.text.replace('\n', r'\n')
-                self._storage.save(StoredMessage(message))
-            return stats
         except Exception as e:
+            if isinstance(e, FloodWaitError) and self._adaptive_batch_size:
+                # Page is not broken, the client is just too fast.
+                logger.warning(f'Client {client.name} has to wait {e.seconds} seconds.')
+                client.rate_controller.on_flood_wait(e.seconds)
+                segment.fail(page, is_attempt=False, max_size=client.rate_controller.get_page_size())
+                return
             logger.error(e)
             self._storage.save(StoredGetMessageError(
                 self._channel_id,
-                batch_size, 
-                offset_id,
-                add_offset,
+                page.size, 
+                page.offset_id,
+                page.add_offset,
                 e
             ))
-            return None
+            if page.attempts + 1 < self._MAX_PAGE_ATTEMPTS:
+                segment.fail(page)
+            else:
+                logger.error(f'Page at position {page.start} of {self._channel_id} is skipped.')
+                segment.skip(page)
+            return
+        if self._adaptive_batch_size:
+            # Controller adapts to the server, so waiting for a client shared by several workers is not counted
+            # if the API measures the request itself.
+            latency = batch.request_seconds
+            if latency is None:
+                latency = time.monotonic() - start_time
+            client.rate_controller.on_success(latency)
+        in_range = batch.datetimes >= np.datetime64(self._min_date.replace(tzinfo=None), 'us')
+        offset_id = segment.get_offset_id()
+        segment.complete(
+            page,
+            count=len(batch),
+            last_message_id=int(batch.message_ids[-1]) if len(batch) > 0 else None,
+            is_last=not in_range.all()
+        )
+        if page.query is not None:
+            # Several queries may find the same message.
+            ids = batch.message_ids.tolist()
+            in_range &= np.fromiter((x not in self._seen_message_ids for x in ids), dtype=bool, count=len(ids))
+            self._seen_message_ids.update(batch.message_ids[in_range].tolist())
+        self._total_messages += int(in_range.sum())
+        logger.info(f'Total messages: {self._total_messages}')
+        if self._total_messages >= self._max_message_count:
+            self._stop()
+        has_text = np.fromiter((x is not None for x in batch.texts), dtype=bool, count=len(batch))
+        candidates = np.flatnonzero(in_range & has_text)
+        matched = candidates[self._page_filter.match_batch(batch.take(candidates))]
+        if len(matched) > 0:
+            self._storage.save_batch(StoredMessage.create_batch(batch.take(matched)))
+        # Cursor is saved after the messages, so a resumed search does not skip unsaved ones.
+        if segment.get_offset_id() != offset_id or segment.is_finished():
+            self._storage.save(StoredSearchCursor(self._channel_id, segment))
 
 
 class StoredMessage(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('message_id', ColumnType.INT),
+        ('channel_id', ColumnType.STR),
+        ('channel_from_id', ColumnType.STR),
+        ('publish_datetime', ColumnType.DATETIME),
+        ('views_count', ColumnType.INT),
+        ('forwards_count', ColumnType.INT),
+        ('reactions', ColumnType.JSON),
+        ('replies_count', ColumnType.INT),
+        ('text', ColumnType.STR),
+    ])
     
     def __init__(self, message: MessageResponse|dict[str,str]):
         if isinstance(message, MessageResponse):
-            self._value = {
-                'message_id': message.message_id,
-                'channel_id': message.channel_id,
-                'channel_from_id': message.channel_fwd_from_id,
-                'publish_datetime': message.datetime,
-                'views_count': message.views,
-                'forwards_count': message.forwards,
-                'reactions': message.reactions,
-                'replies_count': message.replies_count,
-                'text': message.text,
-            }
+            self._row = (
+                message.message_id,
+                message.channel_id,
+                message.channel_fwd_from_id,
+                message.datetime,
+                message.views,
+                message.forwards,
+                message.reactions,
+                message.replies_count,
+                message.text,
+            )
         elif isinstance(message, dict):
-            self._value = {
-                'message_id': message.get('id', None),
-                'channel_id': message.get('channel_id', None),
-                'text': message.get('text', None)
-            }
+            self._row = (
+                message.get('id', None),
+                message.get('channel_id', None),
+                None,
+                None,
+                None,
+                None,
+                None,
+                None,
+                message.get('text', None),
+            )
+
+    @staticmethod
+    def create_batch(batch: MessageBatch) -> StoredBatch:
+        """
+        Creates stored batch of messages without creating an item for each message.
+        """
+        columns = batch.to_columns()
+        return StoredBatch('message', StoredMessage._SCHEMA, [
+            columns['message_ids'],
+            columns['channel_ids'],
+            columns['channel_fwd_from_ids'],
+            columns['datetimes'],
+            columns['views'],
+            columns['forwards'],
+            columns['reactions'],
+            columns['replies_counts'],
+            columns['texts'],
+        ])
 
     def get_type(self) -> str:
         return 'message'
-        
-    def get_value(self) -> dict[str, str]:
-        return self._value
+
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
     
     def __eq__(self, other):
         if isinstance(other, StoredMessage):
-            return self._value == other._value
+            return self._row == other._row
         return False
     
     def __str__(self):
-        return self.get_type() + '=' + str(self._value)
+        return self.get_type() + '=' + str(self.get_value())
+
+
+class StoredSearchCursor(StoredItem):
+    """
+    Progress of one history segment of a channel search.
+    """
+
+    SCHEMA = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('query', ColumnType.STR),
+        ('min_id', ColumnType.INT),
+        ('offset_id', ColumnType.INT),
+        ('is_finished', ColumnType.INT),
+    ])
+
+    def __init__(self, channel_id: str, segment: HistoryPageTracker):
+        self._row = (
+            channel_id,
+            segment.get_query(),
+            segment.get_min_id(),
+            segment.get_offset_id(),
+            int(segment.is_finished())
+        )
+
+    def get_type(self) -> str:
+        return 'message_search_cursor'
+
+    def get_schema(self) -> RecordSchema:
+        return self.SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
 
 
 class StoredGetMessageError(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('max_count', ColumnType.INT),
+        ('offset_id', ColumnType.INT),
+        ('add_offset', ColumnType.INT),
+        ('exception', ColumnType.STR),
+    ])
     
     def __init__(self, channel_id, limit, offset_id, add_offset, ex):
-        self._value = {
-            'channel_id': str(channel_id),
-            'max_count': str(limit),
-            'offset_id': str(offset_id),
-            'add_offset': str(add_offset),
-            'exception': str(ex)
-        }
+        self._row = (
+            str(channel_id),
+            limit,
+            offset_id,
+            add_offset,
+            str(ex)
+        )
 
     def get_type(self) -> str:
         return 'save_message_error'
-        
-    def get_value(self) -> dict[str, str]:
-        return self._value
+
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
     
     def __eq__(self, other):
         if isinstance(other, StoredGetMessageError):
-            return self._value == other._value
+            return self._row == other._row
         return False
     
     def __str__(self):
-        return self.get_type() + '=' + str(self._value)
\ No newline at end of file
+        return self.get_type() + '=' + str(self.get_value())
\ No newline at end of file
@@ -0,0 +1,169 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from .channel_graph import ChannelGraph
+
+
+class ChannelPrioritizer(ABC):
+    """
+    Orders channels waiting for ancestor search using the graph found so far.
+    """
+
+    @abstractmethod
+    def update(self, graph: ChannelGraph) -> list[int]:
+        """
+        Updates scores after the graph has changed.
+        Returns channels whose priority has changed, they have to be queued again with the new priority.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_priority(self, graph: ChannelGraph, channel: int) -> float:
+        """
+        Returns priority of the channel. Channels with higher priority are searched first.
+        """
+        raise NotImplementedError()
+
+
+class PageRankChannelPrioritizer(ChannelPrioritizer):
+    """
+    Blends relevance of a channel with its PageRank in the forward graph.
+
+    Link from a channel to the channel its messages were forwarded from is weighted
+    by the number of forwarded messages, so channels forwarded by many searched channels
+    get high rank. Both relevance and rank are divided by their maximum over all channels.
+
+    Ranks are recalculated in batches: only after enough links were added since the last update,
+    both in absolute numbers and as a share of all links, so the total cost of updates
+    stays proportional to the final number of links. Iterations start from the ranks
+    of the previous update, so only a few of them are needed.
+    Between updates priorities do not change, and after an update only channels
+    whose priority moved by more than :priority_tolerance are reported.
+    """
+    _weight: float = 0.5
+    _damping: float = 0.85
+    _tolerance: float = 1e-6
+    _max_iterations: int = 100
+    _update_every: int = 64
+    _update_share: float = 0.1
+    _priority_tolerance: float = 1e-3
+    _ranks: np.ndarray = None
+    _max_rank: float = 0
+    _max_relevance: float = 0
+    _link_count: int = -1
+
+    def __init__(self,
+                 weight: float = 0.5,
+                 damping: float = 0.85,
+                 tolerance: float = 1e-6,
+                 max_iterations: int = 100,
+                 update_every: int = 64,
+                 update_share: float = 0.1,
+                 priority_tolerance: float = 1e-3
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        weight: float
+            Weight of PageRank in priority from 0 to 1. The rest is weight of relevance.
+        damping: float
+            Probability to follow a link in PageRank.
+        tolerance: float
+            Iterations stop when the sum of rank changes is below this value.
+        max_iterations: int
+            Maximum number of iterations per update.
+        update_every: int
+            Ranks are recalculated when at least this number of links was added since the last update.
+        update_share: float
+            Ranks are recalculated when links added since the last update are at least
+            this share of links known at the last update.
+        priority_tolerance: float
+            Channels whose priority changed less than this value keep their place in the queue.
+        """
+        if not 0 <= weight <= 1:
+            raise Exception(f'Weight must be between 0 and 1, got {weight}.')
+        self._weight = weight
+        self._damping = damping
+        self._tolerance = tolerance
+        self._max_iterations = max_iterations
+        self._update_every = update_every
+        self._update_share = update_share
+        self._priority_tolerance = priority_tolerance
+        self._ranks = np.zeros(0)
+        self._max_rank = 0
+        self._max_relevance = 0
+        self._link_count = -1
+
+    def update(self, graph: ChannelGraph) -> list[int]:
+        link_count = graph.get_link_count()
+        if self._link_count >= 0:
+            added = link_count - self._link_count
+            if added < self._update_every or added < self._update_share * self._link_count:
+                return []
+        relevance = np.nan_to_num(graph.get_relevance_array(), nan=0)
+        old_priorities = self._get_priorities(relevance)
+        self._link_count = link_count
+        self._ranks = self._get_ranks(graph)
+        self._max_rank = float(self._ranks.max()) if len(self._ranks) > 0 else 0
+        self._max_relevance = float(relevance.max()) if len(relevance) > 0 else 0
+        changed = np.abs(self._get_priorities(relevance) - old_priorities) > self._priority_tolerance
+        return np.flatnonzero(changed).tolist()
+
+    def _get_priorities(self, relevance: np.ndarray) -> np.ndarray:
+        """
+        Returns priorities of all channels by the current ranks.
+        """
+        ranks = np.zeros(len(relevance))
+        ranks[:len(self._ranks)] = self._ranks
+        relevance = relevance / self._max_relevance if self._max_relevance > 0 else np.zeros(len(relevance))
+        if self._max_rank > 0:
+            ranks /= self._max_rank
+        return (1 - self._weight) * relevance + self._weight * ranks
+
+    def get_priority(self, graph: ChannelGraph, channel: int) -> float:
+        relevance = graph.get_relevance(channel) or 0
+        relevance = relevance / self._max_relevance if self._max_relevance > 0 else 0
+        # Channels found after the last update have no rank yet.
+        rank = self._ranks[channel] if channel < len(self._ranks) else 0
+        rank = rank / self._max_rank if self._max_rank > 0 else 0
+        return (1 - self._weight) * relevance + self._weight * rank
+
+    def get_rank(self, channel: int) -> float:
+        """
+        Returns PageRank of the channel calculated by the last update.
+        """
+        return float(self._ranks[channel]) if channel < len(self._ranks) else 0
+
+    def _get_ranks(self, graph: ChannelGraph) -> np.ndarray:
+        n = len(graph)
+        if n == 0:
+            return np.zeros(0)
+        sources, targets, weights = self._get_weighted_links(graph)
+        out_weights = np.bincount(sources, weights=weights, minlength=n)
+        dangling = out_weights == 0
+        link_weights = weights / out_weights[sources]
+        ranks = np.full(n, 1 / n)
+        # Ranks of the previous update are the starting point, new channels get the uniform rank.
+        ranks[:len(self._ranks)] = self._ranks
+        ranks /= ranks.sum()
+        for _ in range(self._max_iterations):
+            flow = np.bincount(targets, weights=ranks[sources] * link_weights, minlength=n)
+            new_ranks = (1 - self._damping) / n + self._damping * (flow + ranks[dangling].sum() / n)
+            change = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if change < self._tolerance:
+                break
+        return ranks
+
+    @staticmethod
+    def _get_weighted_links(graph: ChannelGraph) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns source, target and weight of each link.
+        """
+        starts, lengths, targets, counts = graph.get_link_arrays()
+        channels = np.flatnonzero(starts >= 0)
+        # Link ranges are appended one after another, so ordered by start they cover all links.
+        channels = channels[np.argsort(starts[channels])]
+        sources = np.repeat(channels, lengths[channels])
+        return sources, targets.astype(np.int64), counts.astype(np.float64)
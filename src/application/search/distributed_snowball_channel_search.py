@@ -0,0 +1,225 @@
+import uuid
+import asyncio
+from src.application.client import ClientPool, MessageWindowCache
+from src.application.analytics import ChannelRelevanceEstimator
+from src.infrastructure.frontier import SharedFrontier, FrontierTask, FrontierStatus
+from src.infrastructure.logging import logger
+from src.infrastructure.storage import Storage
+from .search import Search
+from .channel_graph import ChannelItem, ChannelItemStatus
+from .snowball_channel_search import StoredChannelItem, StoredChannelLink, StoredMessage
+
+
+class DistributedSnowballChannelSearch(Search):
+    """
+    Snowball search run by several workers which share a frontier.
+
+    Each worker process creates its own instance with its own clients and storage
+    and the same SharedFrontier, e.g. SqliteSharedFrontier for one host
+    or PostgresSharedFrontier for several hosts.
+    Workers claim channels with leases: a NEW channel is claimed to estimate its relevance,
+    a QUEUED channel is claimed to search its ancestors. Both are claimed from one queue,
+    the most relevant first; a NEW channel takes the relevance of the channel where it was found.
+    Leases of channels in progress are renewed in background. If a worker crashes,
+    its channels are claimed by other workers after the lease expires.
+
+    Frontier calls are blocking database queries, so they run in threads of the default executor
+    and the event loop keeps serving downloads. The size of the frontier is cached: it is counted again
+    when a claim returns nothing and on every lease renewal, so workers may add a few channels
+    over :max_channels_count.
+
+    Storage entities are the same as in SnowballChannelSearch. Links of a channel whose lease
+    was lost in the middle of a search can be saved twice.
+    """
+    _client_pool: ClientPool = None
+    _storage: Storage = None
+    _relevance_estimator: ChannelRelevanceEstimator = None
+    _frontier: SharedFrontier = None
+    _start_channels: list[str] = None
+    _max_channels_count: int = None
+    _number_of_messages_for_ancestor_search: int = None
+    _save_messages: bool = False
+    _worker_id: str = None
+    _lease_seconds: float = 300
+    _poll_interval: float = 1
+    # Channels claimed by this worker and not completed yet.
+    _held: set[str] = None
+    # Channels completed by this worker.
+    _channels: dict[str, ChannelItem] = None
+    _message_cache: MessageWindowCache = None
+    _message_cache_size: int = 100000
+    _forwarded_messages_count: int = 0
+    # Number of channels in the frontier when it was counted, plus channels added by this worker since.
+    _size: int = 0
+
+    def __init__(self,
+                 client_pool: ClientPool,
+                 storage: Storage,
+                 relevance_estimator: ChannelRelevanceEstimator,
+                 frontier: SharedFrontier,
+                 start_channels: list[str],
+                 max_channels_count: int,
+                 number_of_messages_for_ancestor_search: int,
+                 save_messages=False,
+                 worker_id: str = None,
+                 lease_seconds: float = 300,
+                 poll_interval: float = 1,
+                 message_cache_size: int = 100000
+                 ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        frontier: SharedFrontier
+            Frontier shared by all workers of the search.
+        start_channels: list[str]
+            Channels added to the frontier if they are unknown.
+            Workers which join a running search can pass an empty list.
+        max_channels_count: int
+            Workers stop when the frontier has this number of channels.
+        worker_id: str
+            Identifier of the worker in the frontier. Random if None.
+        lease_seconds: float
+            Duration of a claim. Leases are renewed every third of it while the channel is processed.
+        poll_interval: float
+            Seconds to wait for new channels when all pending channels are claimed by other workers.
+        message_cache_size: int
+            Maximum number of messages kept in memory during the run,
+            so messages fetched by the relevance estimator are reused by ancestor search.
+        """
+        self._client_pool = client_pool
+        self._storage = storage
+        self._relevance_estimator = relevance_estimator
+        self._frontier = frontier
+        self._start_channels = start_channels
+        self._max_channels_count = max_channels_count
+        self._number_of_messages_for_ancestor_search = number_of_messages_for_ancestor_search
+        self._save_messages = save_messages
+        self._worker_id = worker_id or uuid.uuid4().hex
+        self._lease_seconds = lease_seconds
+        self._poll_interval = poll_interval
+        self._message_cache_size = message_cache_size
+        self._held = set()
+        self._channels = {}
+        self._size = 0
+
+    async def start(self) -> dict[str, ChannelItem]:
+        """
+        Processes channels until the frontier is done or full.
+        Returns channels completed by this worker.
+        """
+        if self._client_pool.get_size() == 0:
+            raise Exception('Pool has no active clients. Unable to run search.')
+        await self._add_channels(self._start_channels)
+        self._size = await asyncio.to_thread(self._frontier.get_size)
+        self._message_cache = MessageWindowCache(self._client_pool, self._message_cache_size)
+        self._relevance_estimator.use_message_cache(self._message_cache)
+        renewal = asyncio.create_task(self._renew_leases())
+        try:
+            await asyncio.gather(
+                *[self._run_worker() for _ in range(self._client_pool.get_size())]
+            )
+        finally:
+            renewal.cancel()
+            self._relevance_estimator.use_message_cache(None)
+            self._message_cache = None
+        counts = await asyncio.to_thread(self._frontier.get_counts)
+        logger.info(
+            f'Worker {self._worker_id} finished. Processed {len(self._channels)} channels, '
+            f'frontier: ' + ', '.join(f'{x.name}={y}' for x, y in counts.items())
+        )
+        return self._channels
+
+    async def _add_channels(self, channel_ids: list[str], priority: float = None):
+        added = await asyncio.to_thread(self._frontier.add, channel_ids, priority)
+        self._size += len(added)
+        for channel_id in added:
+            logger.info(f'Found new channel: {channel_id}')
+            self._storage.save(StoredChannelItem(
+                ChannelItem(channel_id, None, ChannelItemStatus.RELEVANCE_UNKNOWN)
+            ))
+
+    async def _run_worker(self):
+        while self._size < self._max_channels_count:
+            tasks = await asyncio.to_thread(self._frontier.claim, self._worker_id, 1, self._lease_seconds)
+            if len(tasks) == 0:
+                if await asyncio.to_thread(self._frontier.is_done):
+                    return
+                self._size = await asyncio.to_thread(self._frontier.get_size)
+                # Pending channels are claimed by other workers which can find new channels.
+                await asyncio.sleep(self._poll_interval)
+                continue
+            task = tasks[0]
+            self._held.add(task.channel_id)
+            try:
+                if task.status == FrontierStatus.NEW:
+                    await self._estimate_relevance(task)
+                else:
+                    await self._search_ancestors_in_channel(task)
+            finally:
+                self._held.discard(task.channel_id)
+
+    async def _renew_leases(self):
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            held = list(self._held)
+            try:
+                renewed = await asyncio.to_thread(self._frontier.renew, self._worker_id, held, self._lease_seconds)
+                self._size = await asyncio.to_thread(self._frontier.get_size)
+            except Exception as e:
+                # Leases are still valid until they expire, so renewal is retried on the next round.
+                logger.error(f'Worker {self._worker_id} failed to renew leases: {e}')
+                continue
+            for channel_id in set(held) - set(renewed):
+                logger.warning(f'Worker {self._worker_id} lost lease of channel {channel_id}.')
+
+    async def _complete(self, task: FrontierTask, status: ChannelItemStatus, relevance: float = None):
+        frontier_status = {
+            ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH: FrontierStatus.QUEUED,
+            ChannelItemStatus.FINISHED: FrontierStatus.FINISHED,
+            ChannelItemStatus.ERROR: FrontierStatus.ERROR,
+        }[status]
+        completed = await asyncio.to_thread(
+            self._frontier.complete, self._worker_id, task.channel_id, frontier_status, relevance
+        )
+        if not completed:
+            logger.warning(f'Result for channel {task.channel_id} is rejected, because its lease was lost.')
+            return
+        channel = ChannelItem(task.channel_id, relevance if relevance is not None else task.relevance, status)
+        self._channels[task.channel_id] = channel
+        self._storage.save(StoredChannelItem(channel))
+
+    async def _estimate_relevance(self, task: FrontierTask):
+        try:
+            relevance = await self._relevance_estimator.get_relevance(task.channel_id)
+        except Exception as e:
+            logger.error(f'Failed to estimate relevance of channel {task.channel_id}: {e}')
+            await self._complete(task, ChannelItemStatus.ERROR)
+            return
+        await self._complete(task, ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH, relevance)
+
+    async def _search_ancestors_in_channel(self, task: FrontierTask):
+        try:
+            messages = await self._message_cache.get_latest_messages(
+                task.channel_id,
+                self._number_of_messages_for_ancestor_search
+            )
+            self._message_cache.discard(task.channel_id)
+            found = []
+            for m in messages:
+                child_channel_id = m.channel_fwd_from_id
+                if child_channel_id is None:
+                    continue
+                self._storage.save(StoredChannelLink(task.channel_id, child_channel_id, m))
+                self._forwarded_messages_count += 1
+                if self._save_messages:
+                    self._storage.save(StoredMessage(m, self._forwarded_messages_count))
+                found.append(child_channel_id)
+            if self._size < self._max_channels_count:
+                await self._add_channels(list(dict.fromkeys(found)), task.relevance)
+        except Exception as e:
+            logger.error(f'Failed to load channel {task.channel_id}: {e}')
+            await self._complete(task, ChannelItemStatus.ERROR)
+            return
+        await self._complete(task, ChannelItemStatus.FINISHED)
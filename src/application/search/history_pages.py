@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class HistoryPage:
+    # Position of the first message of the page counted from the start of the history range.
+    start: int
+    # Number of messages requested.
+    size: int
+    # Request parameters. Messages older than :offset_id are skipped by :add_offset.
+    offset_id: int
+    add_offset: int
+    # Only messages with greater id belong to the history range.
+    min_id: int = 0
+    # Telegram search query. The whole history is paged if None.
+    query: str = None
+    # Number of failed attempts to download the page.
+    attempts: int = 0
+
+
+class HistoryPageTracker:
+    """
+    Splits the channel history into pages which can be downloaded independently.
+
+    Position of a message is the number of newer messages in the history range.
+    Pages are claimed in order of positions, failed pages are returned to be claimed again.
+    Each page is requested relative to the oldest message of the completed prefix,
+    so add_offset stays small and ranges are neither skipped nor downloaded twice.
+    """
+    _min_id: int = 0
+    _query: str = None
+    _anchor_id: int = 0
+    _anchor_position: int = 0
+    _prefix_end: int = 0
+    _next_position: int = 0
+    _end_position: int = None
+    _is_exhausted: bool = False
+    _completed: dict[int, tuple[int, int]] = None
+    _failed: list[HistoryPage] = None
+
+    def __init__(self, offset_id: int, min_id: int = 0, query: str = None):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        offset_id: int
+            History range starts right before this message. 0 means the newest message.
+        min_id: int
+            History range ends right after this message. 0 means the oldest message.
+        query: str
+            If given, pages contain only messages found by Telegram search for this query.
+        """
+        self._min_id = min_id
+        self._query = query
+        self._anchor_id = offset_id
+        self._anchor_position = 0
+        self._prefix_end = 0
+        self._next_position = 0
+        self._end_position = None
+        self._is_exhausted = False
+        self._completed = {}
+        self._failed = []
+
+    def claim(self, size: int) -> HistoryPage:
+        """
+        Returns the next page to be downloaded or None if there is nothing to download.
+        Previously failed pages are returned first.
+        """
+        if len(self._failed) > 0:
+            page = self._failed.pop(0)
+            page.offset_id, page.add_offset = self._get_offset(page.start)
+        else:
+            if self._end_position is not None and self._next_position >= self._end_position:
+                return None
+            offset_id, add_offset = self._get_offset(self._next_position)
+            page = HistoryPage(self._next_position, size, offset_id, add_offset, self._min_id, self._query)
+            self._next_position += size
+        return page
+
+    def _get_offset(self, position: int) -> tuple[int, int]:
+        return self._anchor_id, position - self._anchor_position
+
+    def complete(self, page: HistoryPage, count: int, last_message_id: int, is_last: bool):
+        """
+        Marks page as downloaded.
+
+        Parameters
+        ----------
+        page: HistoryPage
+            Downloaded page.
+        count: int
+            Number of received messages.
+        last_message_id: int
+            Id of the oldest received message. None if page is empty.
+        is_last: bool
+            True if history range ends inside this page.
+        """
+        end = page.start + count
+        if is_last or count < page.size:
+            self._is_exhausted = True
+            self.stop(end)
+        self._completed[page.start] = (end, last_message_id)
+        self._advance_prefix()
+
+    def fail(self, page: HistoryPage, is_attempt: bool = True, max_size: int = None):
+        """
+        Returns page to be claimed again.
+        If :is_attempt is False, the failure is not counted in page attempts.
+        If :max_size is less than the page size, the page is split into pages of at most this size.
+        Pages after the position where claiming stopped are dropped, see :stop.
+        """
+        if is_attempt:
+            page.attempts += 1
+        if max_size is None or max_size >= page.size:
+            pages = [page]
+        else:
+            pages = [
+                HistoryPage(
+                    start,
+                    min(max_size, page.start + page.size - start),
+                    page.offset_id,
+                    page.add_offset,
+                    page.min_id,
+                    page.query,
+                    page.attempts
+                )
+                for start in range(page.start, page.start + page.size, max_size)
+            ]
+        if self._end_position is not None:
+            pages = [x for x in pages if x.start < self._end_position]
+        self._failed.extend(pages)
+        # Failed pages are retried in order of positions, so the completed prefix keeps advancing.
+        self._failed.sort(key=lambda x: x.start)
+
+    def skip(self, page: HistoryPage):
+        """
+        Gives up on the page. Page is treated as a gap in the history.
+        """
+        self._completed[page.start] = (page.start + page.size, None)
+        self._advance_prefix()
+
+    def stop(self, position: int = None):
+        """
+        Stops claiming pages after the position. Current position is used if None.
+        """
+        if position is None:
+            position = self._next_position
+        if self._end_position is None or position < self._end_position:
+            self._end_position = position
+        self._failed = [x for x in self._failed if x.start < self._end_position]
+
+    def _advance_prefix(self):
+        while self._prefix_end in self._completed:
+            end, last_message_id = self._completed.pop(self._prefix_end)
+            if end == self._prefix_end:
+                break
+            self._prefix_end = end
+            if last_message_id is not None:
+                self._anchor_id = last_message_id
+                self._anchor_position = end
+
+    def get_offset_id(self) -> int:
+        """
+        Returns the oldest message id of the completed prefix of the history range.
+        """
+        return self._anchor_id
+
+    def get_min_id(self) -> int:
+        return self._min_id
+
+    def get_query(self) -> str:
+        return self._query
+
+    def is_finished(self) -> bool:
+        """
+        Returns True if the end of the history range is found and all pages before it are completed.
+        Stopping by :stop does not finish the range.
+        """
+        return self._is_exhausted and self._prefix_end >= self._end_position
@@ -0,0 +1,233 @@
+import numpy as np
+from datetime import datetime
+from abc import ABC, abstractmethod
+from src.application.analytics import KeywordMatcher
+from src.infrastructure.telegram import MessageResponse, MessageBatch
+from src.infrastructure.telegram.model import MISSING, to_datetime64
+
+
+class MessageFilter(ABC):
+    """
+    Selects messages to be saved.
+
+    Search evaluates filters on whole pages with :match_batch.
+    When filters are combined, cheaper filters are evaluated first, see :get_cost.
+    """
+    _COST = 100
+
+    @abstractmethod
+    def match(self, message: MessageResponse) -> bool:
+        pass
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        """
+        Returns
+        -------
+        np.ndarray
+            Returns boolean mask of messages matched by the filter.
+        """
+        return np.array([self.match(m) for m in batch.to_messages()], dtype=bool)
+
+    def get_cost(self) -> int:
+        """
+        Returns relative cost of matching one message.
+        """
+        return self._COST
+
+    def get_search_queries(self) -> list[str]:
+        """
+        Returns Telegram search queries which together find every message matched by the filter.
+        Returns None if the filter can not be evaluated by Telegram search.
+        """
+        return None
+
+
+class BatchMessageFilter(MessageFilter):
+    """
+    Filter which is defined on pages. Single message is matched as a page of one message.
+    """
+
+    def match(self, message: MessageResponse) -> bool:
+        return bool(self.match_batch(MessageBatch.from_messages([message]))[0])
+
+    @abstractmethod
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        pass
+
+
+class AllMessageFilter(BatchMessageFilter):
+    _COST = 0
+
+    def match(self, message: MessageResponse) -> bool:
+        return True
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        return np.ones(len(batch), dtype=bool)
+
+
+class KeywordMessageFilter(BatchMessageFilter):
+    _COST = 10
+
+    _keywords = []
+    _matcher: KeywordMatcher = None
+    _server_search: bool = False
+
+    def __init__(self, keywords: list[str], normalize_yo: bool = False, server_search: bool = False):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        keywords: list[str]
+            Message matches if its text contains any of keywords. Case is ignored.
+        normalize_yo: bool
+            If True, 'ё' is treated as 'е'.
+        server_search: bool
+            If True, keywords are given as Telegram search queries, see :get_search_queries.
+            Telegram search matches words from their beginning, while the filter matches any substring,
+            so messages where a keyword starts in the middle of a word (e.g. 'форм' in 'трансформация')
+            are not found. Set it only if all keywords are word prefixes.
+        """
+        self._keywords = [x.lower() for x in keywords]
+        self._server_search = server_search
+        self._matcher = KeywordMatcher(self._keywords, normalize_yo=normalize_yo)
+
+    def match(self, message: MessageResponse) -> bool:
+        return self._matcher.match_any(message.text)
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        return np.fromiter((self._matcher.match_any(x) for x in batch.texts), dtype=bool, count=len(batch))
+
+    def get_search_queries(self) -> list[str]:
+        if not self._server_search:
+            return None
+        return list(self._keywords)
+
+
+class DateRangeMessageFilter(BatchMessageFilter):
+    """
+    Matches messages published between the dates inclusive.
+    """
+    _COST = 1
+
+    _min_date: np.datetime64 = None
+    _max_date: np.datetime64 = None
+
+    def __init__(self, min_date: datetime = None, max_date: datetime = None):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        min_date: datetime
+            Messages published earlier are not matched. No limit if None.
+        max_date: datetime
+            Messages published later are not matched. No limit if None.
+        """
+        self._min_date, self._max_date = to_datetime64([min_date, max_date])
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        # NaT is not equal to itself, so messages without date are not matched.
+        mask = batch.datetimes == batch.datetimes
+        if not np.isnat(self._min_date):
+            mask &= batch.datetimes >= self._min_date
+        if not np.isnat(self._max_date):
+            mask &= batch.datetimes <= self._max_date
+        return mask
+
+
+class NumericMessageFilter(BatchMessageFilter):
+    """
+    Matches messages where numeric column is between the values inclusive.
+    Messages where the value is unknown are not matched.
+    """
+    _COST = 1
+    _COLUMNS = ('views', 'forwards', 'replies_counts')
+
+    _column: str = None
+    _min_value: int = None
+    _max_value: int = None
+
+    def __init__(self, column: str, min_value: int = None, max_value: int = None):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        column: str
+            One of 'views', 'forwards', 'replies_counts'.
+        min_value: int
+            Minimum value. No limit if None.
+        max_value: int
+            Maximum value. No limit if None.
+        """
+        if column not in self._COLUMNS:
+            raise Exception(f'Unknown numeric column: {column}')
+        self._column = column
+        self._min_value = min_value
+        self._max_value = max_value
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        values = getattr(batch, self._column)
+        mask = values != MISSING
+        if self._min_value is not None:
+            mask &= values >= self._min_value
+        if self._max_value is not None:
+            mask &= values <= self._max_value
+        return mask
+
+
+class ForwardedMessageFilter(BatchMessageFilter):
+    """
+    Matches forwarded messages or, if :forwarded is False, messages which are not forwarded.
+    """
+    _COST = 2
+
+    _forwarded: bool = True
+
+    def __init__(self, forwarded: bool = True):
+        self._forwarded = forwarded
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        mask = np.fromiter((x is not None for x in batch.channel_fwd_from_ids), dtype=bool, count=len(batch))
+        return mask if self._forwarded else ~mask
+
+
+class AndMessageFilter(MessageFilter):
+    """
+    Matches messages matched by all filters.
+
+    Filters are evaluated from the cheapest one,
+    each next filter is evaluated only on messages matched so far.
+    """
+    _filters: list[MessageFilter] = None
+
+    def __init__(self, filters: list[MessageFilter]):
+        self._filters = sorted(filters, key=lambda x: x.get_cost())
+
+    def match(self, message: MessageResponse) -> bool:
+        return all(x.match(message) for x in self._filters)
+
+    def match_batch(self, batch: MessageBatch) -> np.ndarray:
+        mask = np.ones(len(batch), dtype=bool)
+        for filter in self._filters:
+            indexes = np.flatnonzero(mask)
+            if len(indexes) == 0:
+                break
+            if len(indexes) == len(batch):
+                mask = filter.match_batch(batch)
+            else:
+                mask[indexes] = filter.match_batch(batch.take(indexes))
+        return mask
+
+    def get_cost(self) -> int:
+        return sum(x.get_cost() for x in self._filters)
+
+    def get_search_queries(self) -> list[str]:
+        # Every matched message is matched by each filter,
+        # so queries of any filter are enough.
+        for filter in self._filters:
+            queries = filter.get_search_queries()
+            if queries is not None:
+                return queries
+        return None
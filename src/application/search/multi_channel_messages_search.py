@@ -1,10 +1,23 @@
-import os
+import asyncio
+from datetime import datetime
 from src.application.client import ClientPool
-from src.infrastructure.storage import Storage
+from src.infrastructure.logging import logger
+from src.infrastructure.storage import Storage, StoredItem, RecordSchema, ColumnType
 from .search import Search
-from .channel_messages_search import ChannelMessagesSearch, MessageFilter, AllMessageFilter
+from .channel_messages_search import ChannelMessagesSearch
+from .message_filter import MessageFilter, AllMessageFilter
+
 
 class MultiChannelMessagesSearch(Search):
+    """
+    Downloads messages from several Telegram channels.
+
+    Channels are downloaded concurrently.
+    By default the number of channels in progress is equal to the number of active clients,
+    so clients are not idle while some channel is finishing.
+    Channels are taken in order of priority, then by size if :largest_first is set,
+    then in the given order. The progress of each channel is saved as channel_progress.
+    """
 
     _client_pool: ClientPool = None
     _storage: Storage = None
@@ -14,17 +27,53 @@ class MultiChannelMessagesSearch(Search):
     _filter: MessageFilter = None
     _min_date: str = None
     _max_date: str = None
+    _max_concurrent_channels: int = None
+    _priorities: dict[str, int] = None
+    _largest_first: bool = False
+    _partitions: int = None
+    _server_search: bool = False
+    _adaptive_batch_size: bool = False
 
-    def __init__(self, 
-                 client_pool: ClientPool, 
-                 storage: Storage, 
-                 channel_ids: list[str], 
+    def __init__(self,
+                 client_pool: ClientPool,
+                 storage: Storage,
+                 channel_ids: list[str],
                  max_message_count: int,
                  message_batch_size: int,
                  min_date: str,
                  max_date: str,
                  filter: MessageFilter = AllMessageFilter(),
+                 max_concurrent_channels: int = None,
+                 priorities: dict[str, int] = None,
+                 largest_first: bool = False,
+                 partitions: int = None,
+                 server_search: bool = False,
+                 adaptive_batch_size: bool = False
                 ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        max_concurrent_channels: int
+            Maximum number of channels downloaded at the same time.
+            Equals to the number of active clients if None.
+        priorities: dict[str, int]
+            Channels with higher priority are downloaded first. Default priority is 0.
+        largest_first: bool
+            If True, the latest message id of each channel is requested before the search
+            and channels with more messages are downloaded first.
+            It shortens the tail of the search when channel sizes differ a lot.
+        partitions: int
+            Number of message id segments each channel is split into.
+            See ChannelMessagesSearch.
+        server_search: bool
+            If True, messages are found by Telegram search for the filter queries.
+            See ChannelMessagesSearch.
+        adaptive_batch_size: bool
+            If True, page size and request rate are adapted for each client.
+            See ChannelMessagesSearch.
+        """
         self._client_pool = client_pool
         self._storage = storage
         self._channel_ids = channel_ids
@@ -33,9 +82,54 @@ class MultiChannelMessagesSearch(Search):
         self._min_date = min_date
         self._max_date = max_date
         self._filter = filter
+        self._max_concurrent_channels = max_concurrent_channels
+        self._priorities = priorities or {}
+        self._largest_first = largest_first
+        self._partitions = partitions
+        self._server_search = server_search
+        self._adaptive_batch_size = adaptive_batch_size
 
     async def start(self):
-        for channel_id in self._channel_ids:
+        if self._client_pool.get_size() == 0:
+            raise Exception('Pool has no active clients. Unable to run search.')
+        queue = await self._order_channels()
+        concurrency = self._max_concurrent_channels or self._client_pool.get_size()
+        concurrency = min(concurrency, len(queue))
+        logger.info(f'Downloading {len(queue)} channels, {concurrency} at a time.')
+        await asyncio.gather(*[self._run_worker(queue) for _ in range(concurrency)])
+
+    async def _order_channels(self) -> list[str]:
+        sizes = {}
+        if self._largest_first:
+            results = await asyncio.gather(*[self._get_size(x) for x in self._channel_ids])
+            sizes = dict(zip(self._channel_ids, results))
+        order = {x: i for i, x in enumerate(self._channel_ids)}
+        return sorted(
+            self._channel_ids,
+            key=lambda x: (-self._priorities.get(x, 0), -sizes.get(x, 0), order[x])
+        )
+
+    async def _get_size(self, channel_id: str) -> int:
+        """
+        Returns the latest message id of the channel which approximates the number of messages.
+        """
+        try:
+            messages = await self._client_pool.get().get_messages(channel_id, limit=1, offset_id=0, add_offset=0)
+            return messages[0].message_id if len(messages) > 0 else 0
+        except Exception as e:
+            logger.error(f'Failed to get size of channel {channel_id}: {e}')
+            return 0
+
+    async def _run_worker(self, queue: list[str]):
+        while len(queue) > 0:
+            channel_id = queue.pop(0)
+            await self._download_channel(channel_id)
+            logger.info(f'Channels left: {len(queue)}')
+
+    async def _download_channel(self, channel_id: str):
+        self._storage.save(StoredChannelProgress(channel_id, 'STARTED', 0))
+        search = None
+        try:
             search = ChannelMessagesSearch(
                 client_pool=self._client_pool,
                 storage=self._storage,
@@ -44,6 +138,45 @@ class MultiChannelMessagesSearch(Search):
                 message_batch_size=self._message_batch_size,
                 min_date=self._min_date,
                 max_date=self._max_date,
-                filter=self._filter
+                filter=self._filter,
+                partitions=self._partitions,
+                server_search=self._server_search,
+                adaptive_batch_size=self._adaptive_batch_size
             )
-            await search.start()
\ No newline at end of file
+            await search.start()
+            logger.info(f'Channel {channel_id} is downloaded: {search.get_message_count()} messages.')
+            self._storage.save(StoredChannelProgress(channel_id, 'FINISHED', search.get_message_count()))
+        except Exception as e:
+            logger.error(f'Failed to download channel {channel_id}: {e}')
+            count = 0 if search is None else search.get_message_count()
+            self._storage.save(StoredChannelProgress(channel_id, 'ERROR', count))
+
+
+class StoredChannelProgress(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('status', ColumnType.STR),
+        ('message_count', ColumnType.INT),
+        ('datetime', ColumnType.DATETIME),
+    ])
+
+    def __init__(self, channel_id: str, status: str, message_count: int):
+        self._row = (
+            channel_id,
+            status,
+            message_count,
+            datetime.now()
+        )
+
+    def get_type(self) -> str:
+        return 'channel_progress'
+
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
+
+    def __str__(self):
+        return self.get_type() + '=' + str(self.get_value())
@@ -1,28 +1,14 @@
 import asyncio
-from dataclasses import dataclass
-from enum import Enum
 from datetime import datetime
-from src.application.client import ClientPool
+from src.application.client import ClientPool, MessageWindowCache
 from src.application.analytics import ChannelRelevanceEstimator
 from src.infrastructure.logging import logger
-from src.infrastructure.storage import Storage, StoredItem
+from src.infrastructure.storage import Storage, StoredItem, RecordSchema, ColumnType
 from src.infrastructure.telegram import MessageResponse, ChannelResponse
 from .search import Search
-
-
-class ChannelItemStatus(Enum):
-    QUEUED_FOR_LOADING = 0
-    RELEVANCE_UNKNOWN = 1
-    QUEUED_FOR_ANCESTORS_SEARCH = 2
-    FINISHED = 3
-    ERROR = 4
-
-
-@dataclass
-class ChannelItem:
-    channel_id: str
-    relevance: int
-    status: ChannelItemStatus
+from .channel_frontier import ChannelFrontier
+from .channel_graph import ChannelGraph, ChannelItem, ChannelItemStatus
+from .channel_prioritizer import ChannelPrioritizer
 
 
 class SnowballChannelSearch(Search):
@@ -36,11 +22,43 @@ class SnowballChannelSearch(Search):
     3. Extract top-k messages from picked channel. 
        If message is forwarded from another channel, enqueue this channel. 
     4. Go to step 2 or finish, if job is done.
+
+    Each status change is saved as channel_<STATUS> entity and each found link as channel_link,
+    so the search can be resumed after a crash with :resume.
+
+    Channels and links between them are kept in a compact ChannelGraph.
+    Channels are referred to by their indexes in the graph. Channels waiting for ancestor search
+    are kept in a heap by relevance, so a step does not scan all known channels.
+
+    Steps are not run in lockstep. Relevance of a new channel is estimated in background
+    as soon as the channel is found, while free workers search ancestors
+    of the most relevant channels estimated so far.
     """
+    _FINAL_STATUSES = (ChannelItemStatus.FINISHED, ChannelItemStatus.ERROR)
+    # Order of statuses. Channel is restored with the latest status it reached.
+    _STATUS_RANKS = {
+        ChannelItemStatus.QUEUED_FOR_LOADING: 0,
+        ChannelItemStatus.RELEVANCE_UNKNOWN: 1,
+        ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH: 2,
+        ChannelItemStatus.FINISHED: 3,
+        ChannelItemStatus.ERROR: 3,
+    }
+
     _client_pool = None
     _storage: Storage = None
     _relevance_estimator = None
-    _channels: dict[str, ChannelItem] = {}
+    _graph: ChannelGraph = None
+    _frontier: ChannelFrontier = None
+    # Orders the frontier by the graph. If None, the frontier is ordered by relevance.
+    _prioritizer: ChannelPrioritizer = None
+    # Background relevance estimations. None if search is not running.
+    _relevance_tasks: set[asyncio.Task] = None
+    _relevance_semaphore: asyncio.Semaphore = None
+    # Is set when a channel is queued for ancestor search or a worker finishes.
+    _changed: asyncio.Event = None
+    _message_cache_size: int = 100000
+    # The latest messages of channels shared with the relevance estimator during the run.
+    _message_cache: MessageWindowCache = None
     _max_channels_count = None
     _number_of_messages_for_ancestor_search = None
     _save_messages = False
@@ -53,110 +71,242 @@ class SnowballChannelSearch(Search):
                  start_channels: list[str],
                  max_channels_count: int,
                  number_of_messages_for_ancestor_search: int,
-                 save_messages=False
+                 save_messages=False,
+                 message_cache_size: int = 100000,
+                 resume: bool = False,
+                 prioritizer: ChannelPrioritizer = None
                  ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        message_cache_size: int
+            Maximum number of messages kept in memory during the run,
+            so messages fetched by the relevance estimator are reused by ancestor search.
+        resume: bool
+            If True, channels, their statuses and links are restored from the storage
+            and the search continues from where the previous run stopped.
+            Channels which were being searched for ancestors are searched again.
+        prioritizer: ChannelPrioritizer
+            If set, channels are searched for ancestors in order of its priorities
+            instead of relevance, e.g. PageRankChannelPrioritizer prefers channels
+            which are forwarded by many found channels.
+        """
         self._client_pool = client_pool
         self._storage = storage
         self._relevance_estimator = relevance_estimator
         self._max_channels_count = max_channels_count
         self._number_of_messages_for_ancestor_search = number_of_messages_for_ancestor_search
         self._save_messages = save_messages
+        self._message_cache_size = message_cache_size
+        self._graph = ChannelGraph()
+        self._frontier = ChannelFrontier()
+        self._prioritizer = prioritizer
+        if resume:
+            self._read_state()
         for x in start_channels:
-            self._enqueue_channel(x)
+            if x not in self._graph:
+                self._enqueue_channel(x)
+
+    def get_graph(self) -> ChannelGraph:
+        """
+        Returns channels and links found so far.
+        """
+        return self._graph
+
+    def _read_state(self):
+        """
+        Restores channels from channel_<STATUS> and channel_link entities saved by previous runs.
+        """
+        restored = {}
+        for status in ChannelItemStatus:
+            batches = self._storage.scan(
+                f'channel_{status.name}',
+                schema=StoredChannelItem.get_status_schema(status)
+            )
+            for batch in batches:
+                for row in batch.to_dicts():
+                    channel_id = row['channel_id']
+                    relevance = row.get('relevance')
+                    previous = restored.get(channel_id)
+                    if previous is not None:
+                        if self._STATUS_RANKS[status] < self._STATUS_RANKS[previous.status]:
+                            continue
+                        if relevance is None:
+                            relevance = previous.relevance
+                    restored[channel_id] = ChannelItem(channel_id, relevance, status)
+        for channel in restored.values():
+            index = self._graph.add_channel(channel.channel_id, channel.status)
+            self._graph.set_relevance(index, channel.relevance)
+        self._read_links()
+        for index in self._graph.get_channels(ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH):
+            self._frontier.push(index, self._get_priority(index))
+        logger.info(
+            f'Resumed {len(restored)} channels and {self._graph.get_link_count()} links: '
+            + ', '.join(f'{x.name}={self._graph.count(x)}' for x in ChannelItemStatus)
+        )
+
+    def _read_links(self):
+        """
+        Restores links of finished channels.
+        Links of other channels may be incomplete, they are found again when the channel is searched.
+        """
+        forward_counts: dict[int, dict[int, int]] = {}
+        self._forwarded_messages_count = 0
+        for batch in self._storage.scan('channel_link', columns=['channel_id', 'channel_fwd_from_id']):
+            # Saved messages are numbered by links to continue filling the same buckets.
+            self._forwarded_messages_count += len(batch)
+            for channel_id, channel_fwd_from_id in zip(batch.column('channel_id'), batch.column('channel_fwd_from_id')):
+                index = self._graph.get_index(channel_id)
+                if index is None or self._graph.get_status(index) != ChannelItemStatus.FINISHED:
+                    continue
+                target = self._graph.add_channel(channel_fwd_from_id)
+                counts = forward_counts.setdefault(index, {})
+                counts[target] = counts.get(target, 0) + 1
+        for index, counts in forward_counts.items():
+            self._graph.set_links(index, counts)
 
-    def _enqueue_channel(self, channel_id: str):
+    def _enqueue_channel(self, channel_id: str) -> int:
         logger.info(f'Found new channel: {channel_id}')
-        channel = ChannelItem(channel_id, None, ChannelItemStatus.QUEUED_FOR_LOADING)
-        self._channels[channel_id] = channel
+        channel = self._graph.add_channel(channel_id)
         self._change_status(channel, ChannelItemStatus.RELEVANCE_UNKNOWN)
+        if self._relevance_tasks is not None:
+            self._schedule_relevance(channel)
+        return channel
 
-    def _change_status(self, channel_item: ChannelItem, status: ChannelItemStatus):
-        channel_item.status = status
-        self._storage.save(StoredChannelItem(channel_item))
+    def _change_status(self, channel: int, status: ChannelItemStatus):
+        self._graph.set_status(channel, status)
+        if status == ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH:
+            self._frontier.push(channel, self._get_priority(channel))
+        self._storage.save(StoredChannelItem(self._graph.get_item(channel)))
 
     async def start(self):
         if self._client_pool.get_size() == 0:
             raise Exception('Pool has no active clients. Unable to run search.')
-        i = 0
-        while not self._is_finished():
-            logger.info(f'Step {i}. Total number of chanels: {len(self._channels)}')
-            await self._load_channels()
-            await self._update_relevance()
-            await self._search_ancestors()
-            i += 1
+        self._relevance_tasks = set()
+        self._relevance_semaphore = asyncio.Semaphore(self._client_pool.get_size())
+        self._changed = asyncio.Event()
+        self._message_cache = MessageWindowCache(self._client_pool, self._message_cache_size)
+        self._relevance_estimator.use_message_cache(self._message_cache)
         await self._load_channels()
-        await self._update_relevance()
-        logger.info(f'Step {i}. Total number of chanels: {len(self._channels)}')
-        return self._channels 
+        for channel in self._graph.get_channels(ChannelItemStatus.RELEVANCE_UNKNOWN):
+            self._schedule_relevance(channel)
+        await asyncio.gather(
+            *[self._run_worker() for _ in range(self._client_pool.get_size())]
+        )
+        # Channels found by the last searches are estimated too.
+        await asyncio.gather(*list(self._relevance_tasks))
+        self._relevance_tasks = None
+        self._relevance_estimator.use_message_cache(None)
+        logger.info(f'Message cache served {self._message_cache.get_hit_count()} requests without fetching.')
+        self._message_cache = None
+        logger.info(
+            f'Search finished. Total number of chanels: {len(self._graph)}, '
+            f'links: {self._graph.get_link_count()}'
+        )
+        return self._graph.to_items()
 
     async def _load_channels(self):
         logger.info('Loading titles...')
-        channels = [x for x in self._channels.values() if x.status==ChannelItemStatus.QUEUED_FOR_LOADING]
+        channels = self._graph.get_channels(ChannelItemStatus.QUEUED_FOR_LOADING)
         for channel in channels:
             # Commented because of the bag in MemoryCache
             # try:
-            #     channel_response = await self._client_pool.get().get_channel(channel.channel_id)
+            #     channel_response = await self._client_pool.get().get_channel(channel_id)
             # except:
             channel_response = ChannelResponse(
-                channel_id=channel.channel_id,
+                channel_id=self._graph.get_channel_id(channel),
                 title=None
             )
             # then I wanted to save channel title into file but currently I do not
             self._change_status(channel, ChannelItemStatus.RELEVANCE_UNKNOWN)
 
-    async def _update_relevance(self):
-        logger.info('Updating relevance...')
-        channels = [x for x in self._channels.values() if x.status==ChannelItemStatus.RELEVANCE_UNKNOWN]
-        for channel in channels:
-            channel.relevance = await self._relevance_estimator.get_relevance(channel.channel_id)
-            self._change_status(channel, ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH)
-
-    async def _search_ancestors(self):
-        logger.info('Searching ancestors...')
-        next_channels = self._choose_channels_to_search_ancestors(self._client_pool.get_size())
-        next_channels = [x for x in next_channels if x is not None]
-        await asyncio.gather(
-            *[
-                self._search_ancestors_in_channel(x) 
-                    for x in next_channels if x is not None
-            ]
-        )
+    def _schedule_relevance(self, channel: int):
+        self._relevance_tasks.add(asyncio.create_task(self._update_relevance(channel)))
 
-    def _choose_channels_to_search_ancestors(self, count) -> ChannelItem:
-        queue = [x for x in self._channels.values() if x.status == ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH]
-        queue = sorted(queue, key=lambda x: x.relevance)
-        return queue[-count:]
+    async def _update_relevance(self, channel: int):
+        channel_id = self._graph.get_channel_id(channel)
+        try:
+            # Number of simultaneous estimations is limited by the number of clients.
+            async with self._relevance_semaphore:
+                relevance = await self._relevance_estimator.get_relevance(channel_id)
+            self._graph.set_relevance(channel, relevance)
+            self._change_status(channel, ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH)
+        except Exception as e:
+            logger.error(f'Failed to estimate relevance of channel {channel_id}: {e}')
+            self._change_status(channel, ChannelItemStatus.ERROR)
+        finally:
+            # Task is removed before workers are woken up, so they see it is done.
+            self._relevance_tasks.discard(asyncio.current_task())
+            self._changed.set()
 
-    async def _search_ancestors_in_channel(self, channel: ChannelItem):
+    async def _run_worker(self):
+        while not self._is_finished():
+            next_channels = self._choose_channels_to_search_ancestors(1)
+            if len(next_channels) == 0:
+                if len(self._relevance_tasks) == 0 and self._is_idle():
+                    return
+                # Wait for estimations or other workers which can queue new channels.
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+            try:
+                await self._search_ancestors_in_channel(next_channels[0])
+            finally:
+                self._changed.set()
+
+    def _is_idle(self) -> bool:
+        """
+        Returns True if no channel is being searched for ancestors.
+        """
+        return self._graph.count(ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH) == 0
+
+    def _choose_channels_to_search_ancestors(self, count) -> list[int]:
+        if self._prioritizer is not None:
+            for channel in self._prioritizer.update(self._graph):
+                if channel in self._frontier:
+                    self._frontier.push(channel, self._get_priority(channel))
+        return self._frontier.pop_many(count)
+
+    def _get_priority(self, channel: int) -> float:
+        if self._prioritizer is None:
+            return self._graph.get_relevance(channel)
+        return self._prioritizer.get_priority(self._graph, channel)
+
+    async def _search_ancestors_in_channel(self, channel: int):
+        channel_id = self._graph.get_channel_id(channel)
         try:
-            messages = await self._client_pool.get().get_messages(
-                channel.channel_id, 
-                limit=self._number_of_messages_for_ancestor_search,
-                offset_id=0,
-                add_offset=0
+            messages = await self._message_cache.get_latest_messages(
+                channel_id,
+                self._number_of_messages_for_ancestor_search
             )
+            # Messages of the channel are not needed anymore.
+            self._message_cache.discard(channel_id)
+            forward_counts: dict[int, int] = {}
             for m in messages:
                 child_channel_id = m.channel_fwd_from_id
                 if child_channel_id is None:
                     continue
-                self._storage.save(StoredChannelLink(channel.channel_id, child_channel_id, m))
+                self._storage.save(StoredChannelLink(channel_id, child_channel_id, m))
                 self._forwarded_messages_count += 1
                 if self._save_messages:
                     self._storage.save(StoredMessage(m, self._forwarded_messages_count))
-                if child_channel_id not in self._channels:
-                    self._enqueue_channel(child_channel_id)
+                child = self._graph.get_index(child_channel_id)
+                if child is None:
+                    child = self._enqueue_channel(child_channel_id)
+                forward_counts[child] = forward_counts.get(child, 0) + 1
+            self._graph.set_links(channel, forward_counts)
             self._change_status(channel, ChannelItemStatus.FINISHED)
         except Exception as e:
-            logger.error(f'Failed to load channel {channel.channel_id}: {e}')
+            logger.error(f'Failed to load channel {channel_id}: {e}')
             self._change_status(channel, ChannelItemStatus.ERROR)
 
     def _is_finished(self):
-        if len(self._channels) >= self._max_channels_count:
+        if len(self._graph) >= self._max_channels_count:
             return True
-        if len([
-            x for x in self._channels.values() 
-            if x.status!=ChannelItemStatus.FINISHED and x.status!=ChannelItemStatus.ERROR
-        ]) == 0:
+        final_count = sum(self._graph.count(x) for x in self._FINAL_STATUSES)
+        if final_count == len(self._graph):
             return True
         return False
 
@@ -164,14 +314,20 @@ class SnowballChannelSearch(Search):
 class StoredMessage(StoredItem):
     
     _MESSAGES_IN_BUCKET = 50000 # max number of messages saved into one file
+    _SCHEMA = RecordSchema([
+        ('message_id', ColumnType.INT),
+        ('channel_id', ColumnType.STR),
+        ('text', ColumnType.STR),
+        ('message_datetime', ColumnType.DATETIME),
+    ])
 
     def __init__(self, message: MessageResponse, total_messages: int):
-        self._value = {
-            'message_id': message.message_id,
-            'channel_id': message.channel_id,
-            'text': message.text,
-            'message_datetime': message.datetime
-        }
+        self._row = (
+            message.message_id,
+            message.channel_id,
+            message.text,
+            message.datetime
+        )
         self._bucket = total_messages // self._MESSAGES_IN_BUCKET
 
     def get_type(self) -> str:
@@ -180,69 +336,109 @@ class StoredMessage(StoredItem):
     def get_key(self) -> str:
         return 'id'
 
-    def get_value(self) -> dict[str, str]:
-        return self._value
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
 
     def __str__(self):
-        return self.get_type() + '=' + str(self._value)
+        return self.get_type() + '=' + str(self.get_value())
 
 
 class StoredChannelLink(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('channel_fwd_from_id', ColumnType.STR),
+        ('message_id', ColumnType.INT),
+        ('message_datetime', ColumnType.DATETIME),
+    ])
     
     def __init__(self, channel_id: str, channel_fwd_from_id: str, message: MessageResponse):
-        self._value = {
-            'channel_id': channel_id,
-            'channel_fwd_from_id': channel_fwd_from_id,
-            'message_id': message.message_id,
-            'message_datetime': message.datetime
-        }
+        self._row = (
+            channel_id,
+            channel_fwd_from_id,
+            message.message_id,
+            message.datetime
+        )
     
     def get_type(self) -> str:
         return 'channel_link'
 
-    def get_value(self) -> dict[str, str]:
-        return self._value
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
 
     def __str__(self):
-        return self.get_type() + '=' + str(self._value)
+        return self.get_type() + '=' + str(self.get_value())
 
 
 class StoredChannelItem(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('datetime', ColumnType.DATETIME),
+    ])
+    _SCHEMA_WITH_RELEVANCE = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('datetime', ColumnType.DATETIME),
+        ('relevance', ColumnType.FLOAT),
+    ])
     
     def __init__(self, channel: ChannelItem):
-        self._value = {
-            'channel_id': channel.channel_id,
-            'datetime': datetime.now()
-        }
         self._channel_status = channel.status
-        if channel.status == ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH:
-            self._value['relevance'] = channel.relevance
-        if channel.status == ChannelItemStatus.FINISHED:
-            self._value['relevance'] = channel.relevance
+        self._schema = self.get_status_schema(channel.status)
+        if self._schema is self._SCHEMA_WITH_RELEVANCE:
+            self._row = (channel.channel_id, datetime.now(), channel.relevance)
+        else:
+            self._row = (channel.channel_id, datetime.now())
+
+    @staticmethod
+    def get_status_schema(status: ChannelItemStatus) -> RecordSchema:
+        """
+        Returns schema of channel_<STATUS> entity.
+        """
+        if status in (ChannelItemStatus.QUEUED_FOR_ANCESTORS_SEARCH, ChannelItemStatus.FINISHED):
+            return StoredChannelItem._SCHEMA_WITH_RELEVANCE
+        return StoredChannelItem._SCHEMA
 
     def get_type(self) -> str:
         return f'channel_{self._channel_status.name}'
 
-    def get_value(self) -> dict[str, str]:
-        return self._value
+    def get_schema(self) -> RecordSchema:
+        return self._schema
+
+    def get_row(self) -> tuple:
+        return self._row
 
     def __str__(self):
-        return self.get_type() + '=' + str(self._value)
+        return self.get_type() + '=' + str(self.get_value())
 
 
 class StoredChannel(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('channel_id', ColumnType.STR),
+        ('title', ColumnType.STR),
+    ])
     
     def __init__(self, channel: ChannelResponse):
-        self._value = {
-            'channel_id': channel.channel_id,
-            'title': channel.title
-        }    
+        self._row = (
+            channel.channel_id,
+            channel.title
+        )
 
     def get_type(self) -> str:
         return 'channel'
 
-    def get_value(self) -> dict[str, str]:
-        return self._value
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
 
     def __str__(self):
-        return self.get_type() + '=' + str(self._value)
\ No newline at end of file
+        return self.get_type() + '=' + str(self.get_value())
\ No newline at end of file
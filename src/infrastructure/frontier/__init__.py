@@ -0,0 +1,3 @@
+from .shared_frontier import SharedFrontier, FrontierTask, FrontierStatus
+from .sqlite_frontier import SqliteSharedFrontier
+from .postgres_frontier import PostgresSharedFrontier
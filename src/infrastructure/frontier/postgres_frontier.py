@@ -0,0 +1,98 @@
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from .shared_frontier import SharedFrontier, FrontierTask, FrontierStatus
+
+
+class PostgresSharedFrontier(SharedFrontier):
+    """
+    Shared frontier in Postgres table for workers on several hosts.
+
+    Channels are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent claims
+    do not block each other and never return the same channel.
+    Leases are measured by the clock of the database server, so clocks of workers may differ.
+    """
+    _conn = None
+    _table: sql.Identifier = None
+
+    def __init__(self, host: str, port: int, database: str, user: str, password: str,
+                 table: str = 'snowball_frontier'):
+        self._conn = psycopg2.connect(host=host, port=port, database=database, user=user, password=password)
+        self._conn.autocommit = True
+        self._table = sql.Identifier(table.lower())
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql.SQL(
+                'create table if not exists {} ('
+                'channel_id text primary key, '
+                'status smallint not null, '
+                'relevance double precision, '
+                'priority double precision, '
+                'owner text, '
+                'lease_until timestamptz, '
+                'seq bigserial)'
+            ).format(self._table))
+            cursor.execute(sql.SQL('create index if not exists {} on {} (status, priority)').format(
+                sql.Identifier(f'{table.lower()}_status_idx'),
+                self._table
+            ))
+
+    def add(self, channel_ids: list[str], priority: float = None) -> list[str]:
+        if len(channel_ids) == 0:
+            return []
+        with self._conn.cursor() as cursor:
+            rows = execute_values(
+                cursor,
+                sql.SQL(
+                    'insert into {} (channel_id, status, priority) values %s '
+                    'on conflict do nothing returning channel_id'
+                ).format(self._table).as_string(self._conn),
+                [(x, FrontierStatus.NEW.value, priority) for x in channel_ids],
+                fetch=True
+            )
+        return [x[0] for x in rows]
+
+    def claim(self, worker_id: str, count: int, lease_seconds: float) -> list[FrontierTask]:
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql.SQL(
+                'with claimed as ('
+                '  select channel_id from {table}'
+                '  where status in (%s, %s) and (owner is null or lease_until < now())'
+                '  order by priority desc nulls first, seq limit %s'
+                '  for update skip locked'
+                ') '
+                'update {table} f set owner = %s, lease_until = now() + %s * interval \'1 second\' '
+                'from claimed where f.channel_id = claimed.channel_id '
+                'returning f.channel_id, f.status, f.relevance, f.priority, f.seq'
+            ).format(table=self._table), (
+                FrontierStatus.NEW.value, FrontierStatus.QUEUED.value, count, worker_id, lease_seconds
+            ))
+            rows = cursor.fetchall()
+        # Order of returned rows is not defined.
+        rows.sort(key=lambda x: (x[3] is not None, -(x[3] or 0), x[4]))
+        return [FrontierTask(x[0], FrontierStatus(x[1]), x[2]) for x in rows]
+
+    def renew(self, worker_id: str, channel_ids: list[str], lease_seconds: float) -> list[str]:
+        if len(channel_ids) == 0:
+            return []
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql.SQL(
+                'update {} set lease_until = now() + %s * interval \'1 second\' '
+                'where channel_id = any(%s) and owner = %s returning channel_id'
+            ).format(self._table), (lease_seconds, list(channel_ids), worker_id))
+            return [x[0] for x in cursor.fetchall()]
+
+    def complete(self, worker_id: str, channel_id: str, status: FrontierStatus, relevance: float = None) -> bool:
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql.SQL(
+                'update {} set status = %s, relevance = coalesce(%s, relevance), priority = coalesce(%s, priority), '
+                'owner = null, lease_until = null where channel_id = %s and owner = %s'
+            ).format(self._table), (status.value, relevance, relevance, channel_id, worker_id))
+            return cursor.rowcount == 1
+
+    def get_counts(self) -> dict[FrontierStatus, int]:
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql.SQL('select status, count(*) from {} group by status').format(self._table))
+            return {FrontierStatus(x): y for x, y in cursor.fetchall()}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,98 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+
+
+class FrontierStatus(Enum):
+    # Channel is found, its relevance is unknown.
+    NEW = 0
+    # Relevance is estimated, channel waits for ancestor search.
+    QUEUED = 1
+    FINISHED = 2
+    ERROR = 3
+
+
+@dataclass
+class FrontierTask:
+    channel_id: str
+    # NEW tasks are relevance estimations, QUEUED tasks are ancestor searches.
+    status: FrontierStatus
+    # None for NEW tasks.
+    relevance: float
+
+
+class SharedFrontier(ABC):
+    """
+    Channels of a snowball search shared by workers in several processes or hosts.
+
+    Worker claims a channel with a lease. Channel is not given to other workers
+    until the lease expires, so work of a crashed worker is reclaimed by others.
+    Worker must renew leases of long tasks. If a lease expires, the channel can be claimed
+    by another worker and the result of the first worker is rejected.
+    Methods are blocking and may be called from several threads of one worker.
+    """
+
+    @abstractmethod
+    def add(self, channel_ids: list[str], priority: float = None) -> list[str]:
+        """
+        Adds unknown channels with NEW status. Returns channels which were added.
+        Priority is the relevance of the channel where they were found, None for start channels.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def claim(self, worker_id: str, count: int, lease_seconds: float) -> list[FrontierTask]:
+        """
+        Claims up to :count channels for the worker.
+        NEW and QUEUED channels make one queue ordered by priority: relevance of the channel where
+        a NEW channel was found and own relevance of a QUEUED channel. Channels without priority
+        are claimed first, equal priorities are claimed in the order of adding.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def renew(self, worker_id: str, channel_ids: list[str], lease_seconds: float) -> list[str]:
+        """
+        Extends leases of the worker. Returns channels which are still held by the worker.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def complete(self, worker_id: str, channel_id: str, status: FrontierStatus, relevance: float = None) -> bool:
+        """
+        Sets status of the claimed channel and releases the lease.
+        Returns False if the lease was lost and the channel is not changed.
+
+        Parameters
+        ----------
+        worker_id: str
+            Worker which claimed the channel.
+        channel_id: str
+            Claimed channel.
+        status: FrontierStatus
+            QUEUED after relevance estimation, FINISHED after ancestor search or ERROR.
+        relevance: float
+            Estimated relevance, it becomes the priority of the channel. Not changed if None.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_counts(self) -> dict[FrontierStatus, int]:
+        """
+        Returns the number of channels by status.
+        """
+        raise NotImplementedError()
+
+    def get_size(self) -> int:
+        """
+        Returns the number of known channels.
+        """
+        return sum(self.get_counts().values())
+
+    def is_done(self) -> bool:
+        """
+        Returns True if all channels are finished or failed, so no worker can find new ones.
+        Claimed channels keep their status until completion, so they are pending too.
+        """
+        counts = self.get_counts()
+        return counts.get(FrontierStatus.NEW, 0) + counts.get(FrontierStatus.QUEUED, 0) == 0
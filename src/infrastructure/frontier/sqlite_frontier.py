@@ -0,0 +1,120 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from .shared_frontier import SharedFrontier, FrontierTask, FrontierStatus
+
+
+class SqliteSharedFrontier(SharedFrontier):
+    """
+    Shared frontier in SQLite database file for workers on one host.
+
+    Claims are made in IMMEDIATE transactions, so two processes never claim the same channel.
+    Leases are measured by the clock of the host.
+    Connection is shared by threads, so its transactions are serialized by a lock.
+    """
+    _conn: sqlite3.Connection = None
+    _lock: threading.Lock = None
+    _table: str = None
+
+    def __init__(self, path: str, table: str = 'snowball_frontier', timeout: float = 30):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        path: str
+            Path to the database file. It is created if it does not exist.
+        table: str
+            Name of the table. Several searches can share one file using different tables.
+        timeout: float
+            Seconds to wait for a lock held by another process.
+        """
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._table = self._quote(table)
+        self._conn.execute(
+            f'create table if not exists {self._table} ('
+            'channel_id text primary key, '
+            'status integer not null, '
+            'relevance real, '
+            'priority real, '
+            'owner text, '
+            'lease_until real)'
+        )
+        self._conn.execute(
+            f'create index if not exists {self._quote(table + "_status_idx")} on {self._table} (status, priority)'
+        )
+
+    @staticmethod
+    def _quote(identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute('begin immediate')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('rollback')
+                raise
+            self._conn.execute('commit')
+
+    def add(self, channel_ids: list[str], priority: float = None) -> list[str]:
+        added = []
+        with self._transaction() as conn:
+            for channel_id in channel_ids:
+                cursor = conn.execute(
+                    f'insert or ignore into {self._table} (channel_id, status, priority) values (?, ?, ?)',
+                    (channel_id, FrontierStatus.NEW.value, priority)
+                )
+                if cursor.rowcount == 1:
+                    added.append(channel_id)
+        return added
+
+    def claim(self, worker_id: str, count: int, lease_seconds: float) -> list[FrontierTask]:
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f'select channel_id, status, relevance from {self._table} '
+                'where status in (?, ?) and (owner is null or lease_until < ?) '
+                'order by priority is not null, priority desc, rowid limit ?',
+                (FrontierStatus.NEW.value, FrontierStatus.QUEUED.value, now, count)
+            ).fetchall()
+            conn.executemany(
+                f'update {self._table} set owner = ?, lease_until = ? where channel_id = ?',
+                [(worker_id, now + lease_seconds, x[0]) for x in rows]
+            )
+        return [FrontierTask(x[0], FrontierStatus(x[1]), x[2]) for x in rows]
+
+    def renew(self, worker_id: str, channel_ids: list[str], lease_seconds: float) -> list[str]:
+        lease_until = time.time() + lease_seconds
+        held = []
+        with self._transaction() as conn:
+            for channel_id in channel_ids:
+                cursor = conn.execute(
+                    f'update {self._table} set lease_until = ? where channel_id = ? and owner = ?',
+                    (lease_until, channel_id, worker_id)
+                )
+                if cursor.rowcount == 1:
+                    held.append(channel_id)
+        return held
+
+    def complete(self, worker_id: str, channel_id: str, status: FrontierStatus, relevance: float = None) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f'update {self._table} set status = ?, relevance = coalesce(?, relevance), '
+                'priority = coalesce(?, priority), owner = null, lease_until = null '
+                'where channel_id = ? and owner = ?',
+                (status.value, relevance, relevance, channel_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def get_counts(self) -> dict[FrontierStatus, int]:
+        with self._lock:
+            rows = self._conn.execute(f'select status, count(*) from {self._table} group by status').fetchall()
+        return {FrontierStatus(x): y for x, y in rows}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,2 @@
+from .score_store import RelevanceScore, RelevanceScoreStore
+from .sqlite_score_store import SqliteRelevanceScoreStore
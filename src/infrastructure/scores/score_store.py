@@ -0,0 +1,35 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class RelevanceScore:
+    channel_id: str
+    # Identifies estimator and its configuration, e.g. hash of keywords.
+    estimator_key: str
+    relevance: float
+    # Number of messages the score is based on. None if unknown.
+    sample_size: int
+    # Time of estimation in UTC.
+    scored_at: datetime
+
+
+class RelevanceScoreStore(ABC):
+    """
+    Keeps relevance scores of channels between runs.
+    """
+
+    @abstractmethod
+    def get(self, channel_id: str, estimator_key: str) -> RelevanceScore:
+        """
+        Returns the latest score of the channel by the estimator or None if channel was not scored.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def put(self, score: RelevanceScore):
+        """
+        Saves score replacing the previous score of the channel by the same estimator.
+        """
+        raise NotImplementedError()
@@ -0,0 +1,58 @@
+import sqlite3
+from datetime import datetime, timezone
+from .score_store import RelevanceScore, RelevanceScoreStore
+
+
+class SqliteRelevanceScoreStore(RelevanceScoreStore):
+    """
+    Keeps relevance scores in SQLite database file.
+    """
+    _conn: sqlite3.Connection = None
+
+    def __init__(self, path: str, timeout: float = 30):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        path: str
+            Path to the database file. It is created if it does not exist.
+        timeout: float
+            Seconds to wait for a lock held by another process.
+        """
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            'create table if not exists relevance_score ('
+            'channel_id text not null, '
+            'estimator_key text not null, '
+            'relevance real, '
+            'sample_size integer, '
+            'scored_at real not null, '
+            'primary key (channel_id, estimator_key))'
+        )
+
+    def get(self, channel_id: str, estimator_key: str) -> RelevanceScore:
+        row = self._conn.execute(
+            'select relevance, sample_size, scored_at from relevance_score '
+            'where channel_id = ? and estimator_key = ?',
+            (channel_id, estimator_key)
+        ).fetchone()
+        if row is None:
+            return None
+        return RelevanceScore(
+            channel_id=channel_id,
+            estimator_key=estimator_key,
+            relevance=row[0],
+            sample_size=row[1],
+            scored_at=datetime.fromtimestamp(row[2], timezone.utc)
+        )
+
+    def put(self, score: RelevanceScore):
+        self._conn.execute(
+            'insert or replace into relevance_score '
+            '(channel_id, estimator_key, relevance, sample_size, scored_at) values (?, ?, ?, ?, ?)',
+            (score.channel_id, score.estimator_key, score.relevance, score.sample_size, score.scored_at.timestamp())
+        )
+
+    def close(self):
+        self._conn.close()
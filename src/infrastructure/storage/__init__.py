@@ -1,4 +1,10 @@
-from .storage import Storage, StoredItem
+from .storage import Storage, StoredItem, StoredBatch, RecordBatch
+from .schema import RecordSchema, ColumnType
 from .tsv_storage import TsvStorage
 from .console_storage import ConsoleStorage
-from .postgres_storage import PostgresStorage
\ No newline at end of file
+from .postgres_storage import PostgresStorage
+from .deduplicating_storage import DeduplicatingStorage
+from .partitioned_file_storage import PartitionedFileStorage
+from .multi_storage import MultiStorage, SinkStats
+from .rollup_storage import EngagementRollupStorage
+from .quantile_sketch import QuantileSketchArray
\ No newline at end of file
@@ -0,0 +1,175 @@
+from typing import Iterator
+from src.infrastructure.logging import logger
+from .storage import StoredItem, StoredBatch, Storage, RecordBatch
+from .schema import RecordSchema
+from .id_range_set import IdRangeSet
+
+
+class DeduplicatingStorage(Storage):
+    """
+    Skips items which were already saved into the wrapped storage.
+
+    Items are identified by (channel_id, message_id).
+    Seen identifiers are kept in memory as id ranges per channel
+    and are rebuilt by scanning the wrapped storage on creation.
+    Stored entities without these columns (e.g. files of an older format) are not indexed.
+    An item is remembered only after the wrapped storage saved it, so a failed save can be retried.
+    """
+    _storage: Storage = None
+    _entity_types: tuple[str] = None
+    _channel_column: str = None
+    _message_column: str = None
+    _seen: dict[str, dict[str, IdRangeSet]] = None
+    _skipped_count: int = 0
+    _key_indexes: dict[RecordSchema, tuple[int, int]] = None
+
+    def __init__(self,
+                 storage: Storage,
+                 entity_types: tuple[str] = ('message',),
+                 channel_column: str = 'channel_id',
+                 message_column: str = 'message_id'
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        storage: Storage
+            Storage which receives unique items.
+        entity_types: tuple[str]
+            Types of entities to be deduplicated.
+            Items of other types are passed through as is.
+        channel_column: str
+            Name of the column with channel identifier.
+        message_column: str
+            Name of the column with message identifier.
+        """
+        self._storage = storage
+        self._entity_types = tuple(entity_types)
+        self._channel_column = channel_column
+        self._message_column = message_column
+        self._seen = {x: {} for x in self._entity_types}
+        self._skipped_count = 0
+        self._key_indexes = {}
+        for entity_type in self._entity_types:
+            self._load_seen(entity_type)
+
+    def _load_seen(self, entity_type: str):
+        count = 0
+        try:
+            batches = self._storage.scan(
+                entity_type,
+                columns=[self._channel_column, self._message_column]
+            )
+            for batch in batches:
+                for channel_id, message_id in batch.rows:
+                    if channel_id is None or message_id is None:
+                        continue
+                    if self._add(entity_type, str(channel_id), message_id):
+                        count += 1
+        except Exception as e:
+            # Storage raises if stored entities have no key columns, so they can not be duplicated.
+            logger.warning(f'Stored {entity_type} items are not indexed for deduplication: {e}')
+        logger.info(f'Deduplication index for {entity_type} is loaded: {count} items.')
+
+    def _contains(self, entity_type: str, channel_id, message_id) -> bool:
+        ids = self._seen[entity_type].get(channel_id)
+        return ids is not None and int(message_id) in ids
+
+    def _add(self, entity_type: str, channel_id, message_id) -> bool:
+        """
+        Remembers the item key. Returns False if key was already seen.
+        """
+        channels = self._seen[entity_type]
+        ids = channels.get(channel_id)
+        if ids is None:
+            ids = IdRangeSet()
+            channels[channel_id] = ids
+        return ids.add(int(message_id))
+
+    def save(self, item: StoredItem):
+        entity_type = item.get_type()
+        key = None
+        if entity_type in self._seen:
+            channel_id, message_id = self._get_key(item)
+            if channel_id is not None and message_id is not None:
+                key = (str(channel_id), message_id)
+                if self._contains(entity_type, *key):
+                    self._skipped_count += 1
+                    return
+        self._storage.save(item)
+        if key is not None:
+            self._add(entity_type, *key)
+
+    def save_batch(self, batch: StoredBatch):
+        entity_type = batch.get_type()
+        indexes = self._get_key_indexes(batch.get_schema())
+        keys = []
+        if entity_type in self._seen and len(indexes) > 0:
+            channel_ids = batch.get_column(self._channel_column)
+            message_ids = batch.get_column(self._message_column)
+            # Keys of the batch itself are collected separately, so they are remembered only after saving.
+            batch_keys = set()
+            unique = []
+            for i, (channel_id, message_id) in enumerate(zip(channel_ids, message_ids)):
+                if channel_id is None or message_id is None:
+                    unique.append(i)
+                    continue
+                key = (str(channel_id), int(message_id))
+                if key in batch_keys or self._contains(entity_type, *key):
+                    continue
+                batch_keys.add(key)
+                keys.append(key)
+                unique.append(i)
+            if len(unique) < len(batch):
+                self._skipped_count += len(batch) - len(unique)
+                batch = batch.take(unique)
+        if len(batch) > 0:
+            self._storage.save_batch(batch)
+        for key in keys:
+            self._add(entity_type, *key)
+
+    def _get_key(self, item: StoredItem) -> tuple:
+        schema = item.get_schema()
+        if schema is None:
+            value = item.get_value()
+            return value.get(self._channel_column), value.get(self._message_column)
+        indexes = self._get_key_indexes(schema)
+        if len(indexes) == 0:
+            return None, None
+        row = item.get_row()
+        return row[indexes[0]], row[indexes[1]]
+
+    def _get_key_indexes(self, schema: RecordSchema) -> tuple:
+        """
+        Returns positions of channel and message columns or empty tuple if schema has no such columns.
+        """
+        indexes = self._key_indexes.get(schema)
+        if indexes is None:
+            if self._channel_column in schema.names and self._message_column in schema.names:
+                indexes = (schema.names.index(self._channel_column), schema.names.index(self._message_column))
+            else:
+                indexes = ()
+            self._key_indexes[schema] = indexes
+        return indexes
+
+    def read(self, entity_type: str) -> str:
+        return self._storage.read(entity_type)
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        return self._storage.scan(entity_type, columns, where, batch_size, schema)
+
+    def close(self):
+        self._storage.close()
+
+    def get_skipped_count(self) -> int:
+        """
+        Returns the number of duplicates which were not saved.
+        """
+        return self._skipped_count
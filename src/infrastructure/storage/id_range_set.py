@@ -0,0 +1,67 @@
+from array import array
+from bisect import bisect_right
+
+
+class IdRangeSet:
+    """
+    Compact set of integer identifiers.
+
+    Identifiers are kept as sorted disjoint ranges [start, end].
+    Telegram message ids inside a channel are mostly consecutive,
+    so the whole history of a channel usually takes a few ranges.
+    """
+    _starts: array = None
+    _ends: array = None
+    _count: int = 0
+
+    def __init__(self):
+        self._starts = array('q')
+        self._ends = array('q')
+        self._count = 0
+
+    def add(self, value: int) -> bool:
+        """
+        Adds identifier to the set.
+
+        Parameters
+        ----------
+        value: int
+            Identifier to be added.
+
+        Returns
+        -------
+        bool
+            Returns True if identifier was added.
+            Returns False if identifier was already present.
+        """
+        i = bisect_right(self._starts, value) - 1
+        if i >= 0 and value <= self._ends[i]:
+            return False
+        join_left = i >= 0 and self._ends[i] == value - 1
+        join_right = i + 1 < len(self._starts) and self._starts[i + 1] == value + 1
+        if join_left and join_right:
+            self._ends[i] = self._ends[i + 1]
+            del self._starts[i + 1]
+            del self._ends[i + 1]
+        elif join_left:
+            self._ends[i] = value
+        elif join_right:
+            self._starts[i + 1] = value
+        else:
+            self._starts.insert(i + 1, value)
+            self._ends.insert(i + 1, value)
+        self._count += 1
+        return True
+
+    def get_range_count(self) -> int:
+        """
+        Returns the number of disjoint ranges used to store identifiers.
+        """
+        return len(self._starts)
+
+    def __contains__(self, value: int) -> bool:
+        i = bisect_right(self._starts, value) - 1
+        return i >= 0 and value <= self._ends[i]
+
+    def __len__(self) -> int:
+        return self._count
@@ -0,0 +1,235 @@
+import os
+import queue
+import pickle
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Iterator
+from src.infrastructure.logging import logger
+from .storage import StoredItem, StoredBatch, Storage, RecordBatch
+from .schema import RecordSchema
+
+
+@dataclass
+class SinkStats:
+    # Name of the sink.
+    name: str
+    # Number of items saved by the sink.
+    saved: int
+    # Number of items which the sink failed to save.
+    failed: int
+    # Number of items written to the spill file because the sink queue was full.
+    spilled: int
+    # Number of items waiting in the sink queue and in the spill file.
+    queued: int
+    # Text of the last error.
+    last_error: str
+
+
+class _Sink:
+    """
+    Storage with its own queue and writer thread.
+
+    When the queue is full, items are pickled into a spill file and moved back into the queue
+    by the writer thread in the same order, so save never waits and never drops items.
+    """
+
+    def __init__(self, name: str, storage: Storage, queue_size: int, spill_dir: str = None):
+        self.name = name
+        self.storage = storage
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.saved = 0
+        self.failed = 0
+        self.spilled = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self._run, name=f'storage-{name}', daemon=True)
+        self._spill_dir = spill_dir
+        self._spill_file = None
+        self._spill_read_position = 0
+        # Number of items in the spill file which are not moved into the queue yet.
+        self._spill_size = 0
+        self._lock = threading.Lock()
+
+    def put(self, item: StoredItem|StoredBatch):
+        """
+        Adds item to the queue or to the spill file if the queue is full. Never waits for the writer.
+        """
+        with self._lock:
+            if self._spill_size == 0:
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    pass
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile(dir=self._spill_dir)
+                logger.warning(f'Storage {self.name} is too slow. Items are spilled to disk.')
+            self._spill_file.seek(0, os.SEEK_END)
+            pickle.dump(item, self._spill_file)
+            self._spill_size += 1
+            if item is not None:
+                self.spilled += len(item) if isinstance(item, StoredBatch) else 1
+
+    def _unspill(self):
+        """
+        Moves spilled items into the free places of the queue.
+        """
+        with self._lock:
+            while self._spill_size > 0 and not self.queue.full():
+                self._spill_file.seek(self._spill_read_position)
+                item = pickle.load(self._spill_file)
+                self._spill_read_position = self._spill_file.tell()
+                self._spill_size -= 1
+                self.queue.put_nowait(item)
+            if self._spill_size == 0 and self._spill_file is not None and self._spill_read_position > 0:
+                self._spill_file.seek(0)
+                self._spill_file.truncate()
+                self._spill_read_position = 0
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            # Spilled items take the freed place before the item is marked as done,
+            # so joining the queue waits for them too.
+            self._unspill()
+            if item is None:
+                self._close()
+                return
+            count = len(item) if isinstance(item, StoredBatch) else 1
+            try:
+                if isinstance(item, StoredBatch):
+                    self.storage.save_batch(item)
+                else:
+                    self.storage.save(item)
+                self.saved += count
+            except Exception as e:
+                self.failed += count
+                self.last_error = str(e)
+                logger.error(f'Storage {self.name} failed to save item: {e}')
+            finally:
+                self.queue.task_done()
+
+    def _close(self):
+        try:
+            self.storage.close()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f'Storage {self.name} failed to close: {e}')
+        finally:
+            if self._spill_file is not None:
+                self._spill_file.close()
+            self.queue.task_done()
+
+    def get_stats(self) -> SinkStats:
+        return SinkStats(
+            self.name,
+            self.saved,
+            self.failed,
+            self.spilled,
+            self.queue.qsize() + self._spill_size,
+            self.last_error
+        )
+
+
+class MultiStorage(Storage):
+    """
+    Saves each item into several storages.
+
+    Each storage has its own bounded queue and writer thread,
+    so a slow or failing storage does not delay the others.
+    Save never waits: when the queue of a storage is full, items are spilled to a temporary file
+    and saved by this storage later in the same order. Items must be picklable.
+    Errors and spilled items are counted per storage, see :get_sink_stats.
+    Storage must be closed to write the queued items.
+
+    Reading (read and scan) uses a single storage, see :read_from.
+    Reading does not wait for the queue, so items saved shortly before may be missing.
+    Call :flush first to see them.
+    """
+    _sinks: list[_Sink] = None
+    _read_sink: _Sink = None
+    _is_closed: bool = False
+
+    def __init__(self,
+                 storages: dict[str, Storage],
+                 queue_size: int = 10000,
+                 read_from: str = None,
+                 spill_dir: str = None
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        storages: dict[str, Storage]
+            Storages by name. Name is used in logging and statistics.
+        queue_size: int
+            Maximum number of items or batches kept in memory for one storage.
+        read_from: str
+            Name of the storage used by read and scan. The first storage if None.
+        spill_dir: str
+            Directory of spill files. The system temporary directory if None.
+        """
+        if len(storages) == 0:
+            raise Exception('At least one storage is required.')
+        if read_from is not None and read_from not in storages:
+            raise Exception(f'Unknown storage {read_from}.')
+        self._sinks = [_Sink(name, storage, queue_size, spill_dir) for name, storage in storages.items()]
+        self._read_sink = self._sinks[list(storages).index(read_from) if read_from is not None else 0]
+        self._is_closed = False
+        for sink in self._sinks:
+            sink.thread.start()
+
+    def save(self, item: StoredItem):
+        self._put(item)
+
+    def save_batch(self, batch: StoredBatch):
+        """
+        Batch takes one place in the storage queues.
+        """
+        if len(batch) > 0:
+            self._put(batch)
+
+    def _put(self, item: StoredItem|StoredBatch):
+        if self._is_closed:
+            raise Exception('Storage is closed.')
+        for sink in self._sinks:
+            sink.put(item)
+
+    def flush(self):
+        """
+        Waits until the storage used for reading saves all queued items. The other storages are not awaited.
+        It blocks the calling thread, so async callers should run it in a thread.
+        """
+        self._read_sink.queue.join()
+
+    def read(self, entity_type: str) -> str:
+        return self._read_sink.storage.read(entity_type)
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        return self._read_sink.storage.scan(entity_type, columns, where, batch_size, schema)
+
+    def get_sink_stats(self) -> list[SinkStats]:
+        """
+        Returns
+        -------
+        list[SinkStats]
+            Returns statistics of each storage.
+        """
+        return [x.get_stats() for x in self._sinks]
+
+    def close(self):
+        if self._is_closed:
+            return
+        self._is_closed = True
+        for sink in self._sinks:
+            sink.put(None)
+        for sink in self._sinks:
+            sink.thread.join()
+            logger.info(f'Storage {sink.name} is closed: {sink.get_stats()}')
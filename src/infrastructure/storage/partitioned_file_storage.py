@@ -0,0 +1,514 @@
+import os
+import io
+import gzip
+import json
+import shutil
+import numpy as np
+from collections import OrderedDict
+from typing import Callable, Iterator
+from src.infrastructure.logging import logger
+from .storage import StoredItem, StoredBatch, Storage, RecordBatch
+from .schema import RecordSchema
+from .tsv_format import TsvSerializer, read_lines, read_batches
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _Segment:
+    """
+    Single output file of one partition.
+    """
+
+    def __init__(self, entity_type: str, partition: dict[str, str], path: str, compression: str):
+        self.entity_type = entity_type
+        self.partition = partition
+        self.path = path
+        self.compression = compression
+        # Position in the list of segments, identifies the segment in the journal.
+        self.index = None
+        self.rows = 0
+        self.bytes = 0
+        self.finished = False
+        self.file = None
+
+    def to_dict(self) -> dict:
+        return {
+            'entity_type': self.entity_type,
+            'partition': self.partition,
+            'path': self.path,
+            'compression': self.compression,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'finished': self.finished
+        }
+
+    @staticmethod
+    def from_dict(value: dict):
+        segment = _Segment(value['entity_type'], value['partition'], value['path'], value['compression'])
+        segment.rows = value['rows']
+        segment.bytes = value['bytes']
+        segment.finished = value['finished']
+        return segment
+
+
+class PartitionedFileStorage(Storage):
+    """
+    Stores result into partitioned, rotated and compressed TSV files.
+
+    Files are laid out as
+    <out_dir>/<entity_type>/channel=<channel_id>/date=<YYYY-MM-DD>/part-00000.tsv.gz
+    Each segment has its own header, so segments can be read independently.
+    The active segment of a partition is written uncompressed.
+    It is compressed when it reaches the row or size limit,
+    when too many segments are open or when storage is closed.
+    All segments are listed in <out_dir>/manifest.json.
+
+    Manifest is rewritten only on close. While storage is open, each opened and finished
+    segment is appended to <out_dir>/manifest.log, so a crashed run is recovered
+    from the manifest and the log on the next start. Segments are reconciled with the files
+    on recovery: a segment compressed before the crash keeps its compressed file
+    and a segment whose file is missing is dropped from the manifest.
+    """
+    _MANIFEST_FILENAME = 'manifest.json'
+    _JOURNAL_FILENAME = 'manifest.log'
+    _EXTENSIONS = {
+        None: '',
+        'gzip': '.gz',
+        'zstd': '.zst'
+    }
+
+    _out_dir: str = None
+    _partition_by: tuple[str] = None
+    _partitioned_types: tuple[str] = None
+    _date_columns: tuple[str] = None
+    _max_rows_per_file: int = None
+    _max_bytes_per_file: int = None
+    _max_open_files: int = None
+    _compression: str = None
+    _segments: list[_Segment] = None
+    # Number of segments by entity type and partition.
+    _segment_counts: dict[tuple, int] = None
+    _journal = None
+    _active: OrderedDict = None
+    _serializer: TsvSerializer = None
+    _partition_indexes: dict[RecordSchema, tuple] = None
+
+    def __init__(self,
+                 out_dir: str,
+                 partition_by: tuple[str] = ('channel', 'date'),
+                 partitioned_types: tuple[str] = ('message',),
+                 max_rows_per_file: int = 100000,
+                 max_bytes_per_file: int = None,
+                 compression: str = 'auto',
+                 max_open_files: int = 64,
+                 date_columns: tuple[str] = ('publish_datetime', 'message_datetime', 'datetime')
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        out_dir: str
+            Directory where files will be stored.
+        partition_by: tuple[str]
+            Partitioning levels. Supported values are 'channel' and 'date'.
+        partitioned_types: tuple[str]
+            Types of entities which are partitioned.
+            Other entities are only rotated.
+        max_rows_per_file: int
+            Segment is finished when it has this number of rows.
+        max_bytes_per_file: int
+            Segment is finished when its uncompressed size exceeds this number of bytes.
+            None means no limit.
+        compression: str
+            One of 'gzip', 'zstd', 'auto' or None.
+            'auto' uses zstd if zstandard package is installed and gzip otherwise.
+        max_open_files: int
+            Maximum number of simultaneously active segments.
+            The least recently used segment is finished when limit is exceeded.
+        date_columns: tuple[str]
+            Columns which are looked up (in order) to get the date partition.
+        """
+        if compression == 'auto':
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        if compression not in self._EXTENSIONS:
+            raise Exception(f'Unknown compression: {compression}')
+        if compression == 'zstd' and zstandard is None:
+            raise Exception('zstd compression requires zstandard package.')
+        self._out_dir = out_dir
+        self._partition_by = tuple(partition_by)
+        self._partitioned_types = tuple(partitioned_types)
+        self._date_columns = tuple(date_columns)
+        self._max_rows_per_file = max_rows_per_file
+        self._max_bytes_per_file = max_bytes_per_file
+        self._max_open_files = max_open_files
+        self._compression = compression
+        self._segments = []
+        self._segment_counts = {}
+        self._journal = None
+        self._active = OrderedDict()
+        self._serializer = TsvSerializer()
+        self._partition_indexes = {}
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        self._load_manifest()
+
+    def _load_manifest(self):
+        filename = os.path.join(self._out_dir, self._MANIFEST_FILENAME)
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                segments = [_Segment.from_dict(x) for x in json.load(f)['segments']]
+        else:
+            segments = []
+        journal_filename = os.path.join(self._out_dir, self._JOURNAL_FILENAME)
+        has_journal = os.path.exists(journal_filename)
+        if has_journal:
+            with open(journal_filename, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last entry may be cut by the crash.
+                        break
+                    index = entry.pop('index')
+                    if index < len(segments):
+                        segments[index] = _Segment.from_dict(entry)
+                    else:
+                        segments.append(_Segment.from_dict(entry))
+        unfinished = [x for x in segments if not x.finished]
+        missing = [x for x in segments if not self._reconcile(x)]
+        for segment in segments:
+            if segment not in missing:
+                self._add_segment(segment)
+        if len(unfinished) > 0:
+            logger.info(f'Finished {len(unfinished)} segments left by the previous run.')
+        for segment in missing:
+            logger.warning(f'Segment {segment.path} is removed from the manifest, because its file is missing.')
+        if has_journal or len(unfinished) > 0 or len(missing) > 0:
+            self._write_manifest()
+
+    def _reconcile(self, segment: _Segment) -> bool:
+        """
+        Finishes the segment left active by the previous run as is.
+        Returns False if the segment has no file.
+        """
+        source = os.path.join(self._out_dir, segment.path)
+        if segment.finished:
+            return os.path.exists(source)
+        target = source + self._EXTENSIONS[segment.compression]
+        if os.path.exists(source):
+            segment.rows = self._count_rows(segment)
+            self._compress(segment)
+            return True
+        if not os.path.exists(target):
+            return False
+        # Segment was compressed, but the crash happened before it was journaled.
+        segment.path = os.path.relpath(target, self._out_dir)
+        segment.finished = True
+        segment.rows = self._count_rows(segment)
+        return True
+
+    def _count_rows(self, segment: _Segment) -> int:
+        # Header is not a row.
+        return max(sum(1 for x in self._read_segment_lines(segment) if x != '') - 1, 0)
+
+    def _add_segment(self, segment: _Segment):
+        segment.index = len(self._segments)
+        self._segments.append(segment)
+        key = (segment.entity_type, tuple(segment.partition.items()))
+        self._segment_counts[key] = self._segment_counts.get(key, 0) + 1
+
+    def _write_manifest(self):
+        """
+        Writes all segments into the manifest and clears the journal.
+        """
+        filename = os.path.join(self._out_dir, self._MANIFEST_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump({'segments': [x.to_dict() for x in self._segments]}, f, indent=1)
+        os.replace(filename + '.tmp', filename)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        journal_filename = os.path.join(self._out_dir, self._JOURNAL_FILENAME)
+        if os.path.exists(journal_filename):
+            os.remove(journal_filename)
+
+    def _write_journal(self, segment: _Segment):
+        """
+        Appends the current state of the segment to the journal.
+        """
+        if self._journal is None:
+            self._journal = open(os.path.join(self._out_dir, self._JOURNAL_FILENAME), 'a')
+        entry = {'index': segment.index, **segment.to_dict()}
+        self._journal.write(json.dumps(entry) + '\n')
+        self._journal.flush()
+
+    def save(self, item: StoredItem):
+        entity_type = item.get_type()
+        self._append(
+            entity_type,
+            self._get_partition(entity_type, item),
+            lambda: self._serializer.get_header(item),
+            self._serializer.get_line(item)
+        )
+
+    def save_batch(self, batch: StoredBatch):
+        """
+        Rows are grouped by partition using the channel and date columns,
+        so no per-row items are created.
+        """
+        if len(batch) == 0:
+            return
+        entity_type = batch.get_type()
+        header = self._serializer.get_batch_header(batch)
+        lines = self._serializer.get_batch_lines(batch)
+        for partition, indexes in self._get_batch_partitions(batch):
+            for i in indexes:
+                self._append(entity_type, partition, lambda: header, lines[i])
+
+    def _get_batch_partitions(self, batch: StoredBatch) -> list[tuple[dict[str, str], list[int]]]:
+        """
+        Returns partitions of the batch rows with positions of their rows in original order.
+        """
+        if batch.get_type() not in self._partitioned_types or len(self._partition_by) == 0:
+            return [({}, range(len(batch)))]
+        names = batch.get_schema().names
+        levels = []
+        for level in self._partition_by:
+            if level == 'channel':
+                values = batch.get_column('channel_id') if 'channel_id' in names else [None] * len(batch)
+            elif level == 'date':
+                values = self._get_batch_dates(batch)
+            else:
+                raise Exception(f'Unknown partition level: {level}')
+            levels.append(np.array([self._sanitize(x) for x in values], dtype=str))
+        keys, inverse = np.unique(np.stack(levels, axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+        return [
+            (dict(zip(self._partition_by, key.tolist())), group.tolist())
+            for key, group in zip(keys, np.split(order, bounds))
+        ]
+
+    def _get_batch_dates(self, batch: StoredBatch) -> list:
+        """
+        Returns date of each row from the first date column where it is known.
+        """
+        names = batch.get_schema().names
+        dates = [None] * len(batch)
+        for column in [batch.get_column(x) for x in self._date_columns if x in names]:
+            dates = [y if x is None else x for x, y in zip(dates, column)]
+        return [None if x is None else str(x)[:10] for x in dates]
+
+    def _append(self, entity_type: str, partition: dict[str, str], get_header: Callable[[], str], line: str):
+        """
+        Writes line into the active segment of the partition.
+        Header is requested only when a new segment is opened.
+        """
+        key = (entity_type, tuple(partition.items()))
+        segment = self._active.get(key)
+        if segment is None:
+            segment = self._open_segment(entity_type, partition, get_header())
+            self._active[key] = segment
+            if len(self._active) > self._max_open_files:
+                self._finish(self._active.popitem(last=False)[1])
+        else:
+            self._active.move_to_end(key)
+        self._write_line(segment, line)
+        segment.rows += 1
+        if self._is_full(segment):
+            del self._active[key]
+            self._finish(segment)
+
+    def _get_partition(self, entity_type: str, item: StoredItem) -> dict[str, str]:
+        partition = {}
+        if entity_type not in self._partitioned_types:
+            return partition
+        channel_id, date = self._get_partition_values(item)
+        for level in self._partition_by:
+            if level == 'channel':
+                partition['channel'] = self._sanitize(channel_id)
+            elif level == 'date':
+                partition['date'] = self._sanitize(None if date is None else str(date)[:10])
+            else:
+                raise Exception(f'Unknown partition level: {level}')
+        return partition
+
+    def _get_partition_values(self, item: StoredItem) -> tuple:
+        """
+        Returns channel_id and date of the item.
+        """
+        schema = item.get_schema()
+        if schema is None:
+            value = item.get_value()
+            date = next((value[x] for x in self._date_columns if value.get(x) is not None), None)
+            return value.get('channel_id'), date
+        indexes = self._partition_indexes.get(schema)
+        if indexes is None:
+            channel_index = schema.names.index('channel_id') if 'channel_id' in schema.names else None
+            date_indexes = [schema.names.index(x) for x in self._date_columns if x in schema.names]
+            indexes = (channel_index, date_indexes)
+            self._partition_indexes[schema] = indexes
+        row = item.get_row()
+        channel_index, date_indexes = indexes
+        date = next((row[i] for i in date_indexes if row[i] is not None), None)
+        return None if channel_index is None else row[channel_index], date
+
+    def _sanitize(self, value) -> str:
+        if value is None:
+            return 'unknown'
+        return str(value).replace(os.sep, '_')
+
+    def _open_segment(self, entity_type: str, partition: dict[str, str], header: str) -> _Segment:
+        directory = os.path.join(
+            entity_type,
+            *[f'{k}={v}' for k, v in partition.items()]
+        )
+        os.makedirs(os.path.join(self._out_dir, directory), exist_ok=True)
+        number = self._segment_counts.get((entity_type, tuple(partition.items())), 0)
+        # Files of segments dropped on recovery are missing, so numbers of later segments are taken.
+        while any(
+            os.path.exists(os.path.join(self._out_dir, directory, f'part-{number:05d}.tsv{x}'))
+            for x in self._EXTENSIONS.values()
+        ):
+            number += 1
+        segment = _Segment(
+            entity_type,
+            partition,
+            os.path.join(directory, f'part-{number:05d}.tsv'),
+            self._compression
+        )
+        self._add_segment(segment)
+        self._write_journal(segment)
+        self._write_line(segment, header)
+        return segment
+
+    def _write_line(self, segment: _Segment, line: str):
+        if segment.file is None:
+            segment.file = open(os.path.join(self._out_dir, segment.path), 'ab')
+        data = (line + '\r\n').encode('utf-8')
+        segment.file.write(data)
+        segment.bytes += len(data)
+
+    def _is_full(self, segment: _Segment) -> bool:
+        if self._max_rows_per_file is not None and segment.rows >= self._max_rows_per_file:
+            return True
+        if self._max_bytes_per_file is not None and segment.bytes >= self._max_bytes_per_file:
+            return True
+        return False
+
+    def _finish(self, segment: _Segment):
+        if segment.file is not None:
+            segment.file.close()
+            segment.file = None
+        self._compress(segment)
+        self._write_journal(segment)
+
+    def _compress(self, segment: _Segment):
+        """
+        Compresses the segment file with streaming compression and marks segment as finished.
+        """
+        source = os.path.join(self._out_dir, segment.path)
+        target = source + self._EXTENSIONS[segment.compression]
+        if os.path.exists(source) and source != target:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                if segment.compression == 'gzip':
+                    with gzip.GzipFile(fileobj=dst, mode='wb') as gz:
+                        shutil.copyfileobj(src, gz)
+                elif segment.compression == 'zstd':
+                    zstandard.ZstdCompressor().copy_stream(src, dst)
+            os.remove(source)
+        segment.path = os.path.relpath(target, self._out_dir)
+        segment.finished = True
+
+    def _open_for_reading(self, segment: _Segment):
+        filename = os.path.join(self._out_dir, segment.path)
+        if not segment.finished or segment.compression is None:
+            return open(filename, 'r', encoding='utf-8')
+        if segment.compression == 'gzip':
+            return gzip.open(filename, 'rt', encoding='utf-8')
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+
+    def read(self, entity_type: str):
+        segments = [x for x in self._segments if x.entity_type == entity_type]
+        if len(segments) == 0:
+            return None
+        for segment in segments:
+            if segment.file is not None:
+                segment.file.flush()
+        parts = []
+        for i, segment in enumerate(segments):
+            with self._open_for_reading(segment) as f:
+                header = f.readline()
+                if i == 0:
+                    parts.append(header)
+                parts.append(f.read())
+        return ''.join(parts)
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        """
+        Reads segments one by one.
+        Segments of other channels are skipped without reading 
+        if :where has a condition on channel_id.
+        """
+        channel_id = None if where is None else where.get('channel_id')
+        segments = [
+            x for x in self._segments
+            if x.entity_type == entity_type and (
+                channel_id is None
+                or 'channel' not in x.partition
+                or x.partition['channel'] == self._sanitize(channel_id)
+            )
+        ]
+        for segment in segments:
+            if segment.file is not None:
+                segment.file.flush()
+            yield from read_batches(self._read_segment_lines(segment), columns, where, batch_size, schema)
+
+    def _read_segment_lines(self, segment: _Segment) -> Iterator[str]:
+        if not segment.finished or segment.compression is None:
+            yield from read_lines(os.path.join(self._out_dir, segment.path))
+            return
+        with self._open_for_reading(segment) as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
+    def get_segments(self, entity_type: str = None) -> list[dict]:
+        """
+        Returns the manifest entries.
+
+        Parameters
+        ----------
+        entity_type: str
+            If specified, only segments of this entity type are returned.
+
+        Returns
+        -------
+        list[dict]
+            Returns segment descriptions with relative path, partition,
+            compression, number of rows and uncompressed size.
+        """
+        return [
+            x.to_dict() for x in self._segments
+            if entity_type is None or x.entity_type == entity_type
+        ]
+
+    def close(self):
+        for segment in self._active.values():
+            if segment.file is not None:
+                segment.file.close()
+                segment.file = None
+            self._compress(segment)
+        self._active.clear()
+        self._write_manifest()
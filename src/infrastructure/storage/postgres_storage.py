@@ -1,5 +1,10 @@
+import uuid
 import psycopg2
-from .storage import StoredItem, Storage
+from psycopg2 import sql, errors
+from psycopg2.extras import Json, execute_batch
+from typing import Iterator
+from .storage import StoredItem, StoredBatch, Storage, RecordBatch
+from .schema import RecordSchema, ColumnType
 
 
 class PostgresStorage(Storage):
@@ -8,20 +13,104 @@ class PostgresStorage(Storage):
     """
     _conn = None
     _total_count = {}
+    _statements: dict[tuple[str, RecordSchema], tuple] = None
 
     def __init__(self, host: str, port: int, database: str, user: str, password: str):
         self._conn = psycopg2.connect(host=host, port=port, database=database, user=user, password=password)
         self._conn.autocommit = True
+        self._statements = {}
 
     def save(self, item: StoredItem):
-        keys = ','.join(item.get_value().keys())
-        values = [f"'{str(x).replace('\'', '\"')}'" for x in item.get_value().values()]
-        values = ','.join(values)
-        self._conn.cursor().execute(f"""
-            insert into {item.get_type()} ({keys})
-            values ({values})
-        """)
-        
+        schema = item.get_schema()
+        if schema is None:
+            value = item.get_value()
+            self._conn.cursor().execute(
+                self._create_insert(item.get_type(), value.keys()),
+                [Json(x) if isinstance(x, (dict, list)) else x for x in value.values()]
+            )
+            return
+        query, json_indexes = self._get_statement(item.get_type(), schema)
+        self._conn.cursor().execute(query, self._wrap_json(item.get_row(), json_indexes))
+
+    def save_batch(self, batch: StoredBatch):
+        """
+        Inserts rows in pages of several statements, so the batch costs few round trips.
+        """
+        if len(batch) == 0:
+            return
+        query, json_indexes = self._get_statement(batch.get_type(), batch.get_schema())
+        execute_batch(
+            self._conn.cursor(),
+            query,
+            [self._wrap_json(x, json_indexes) for x in batch.get_rows()],
+            page_size=1000
+        )
+
+    def _get_statement(self, entity_type: str, schema: RecordSchema) -> tuple:
+        key = (entity_type, schema)
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = (
+                self._create_insert(entity_type, schema.names),
+                [i for i, t in enumerate(schema.types) if t == ColumnType.JSON]
+            )
+            self._statements[key] = statement
+        return statement
+
+    def _wrap_json(self, row: tuple, json_indexes: list[int]) -> tuple:
+        if len(json_indexes) == 0:
+            return row
+        row = list(row)
+        for i in json_indexes:
+            if row[i] is not None:
+                row[i] = Json(row[i])
+        return row
+
+    def _create_insert(self, entity_type: str, columns) -> str:
+        """
+        Creates parametrized insert statement.
+        Table and column names are case-folded as unquoted identifiers.
+        """
+        return sql.SQL('insert into {} ({}) values ({})').format(
+            sql.Identifier(entity_type.lower()),
+            sql.SQL(',').join([sql.Identifier(x.lower()) for x in columns]),
+            sql.SQL(',').join([sql.Placeholder()] * len(columns))
+        ).as_string(self._conn)
 
     def read(self, entity_type: str):
-        return None
\ No newline at end of file
+        return None
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        """
+        Reads table with a server-side cursor, so rows are not loaded into memory at once.
+        Table and column names are case-folded as unquoted identifiers.
+        Values are already typed by the database, so :schema is not used.
+        """
+        query = sql.SQL('select {} from {}').format(
+            sql.SQL('*') if columns is None else sql.SQL(',').join([sql.Identifier(x.lower()) for x in columns]),
+            sql.Identifier(entity_type.lower())
+        )
+        params = []
+        if where:
+            query += sql.SQL(' where ') + sql.SQL(' and ').join([
+                sql.SQL('{} = %s').format(sql.Identifier(k.lower())) for k in where.keys()
+            ])
+            params = list(where.values())
+        # Cursor is declared WITH HOLD because connection works in autocommit mode.
+        with self._conn.cursor(name=f'scan_{uuid.uuid4().hex}', withhold=True) as cursor:
+            cursor.itersize = batch_size
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchmany(batch_size)
+            except errors.UndefinedTable:
+                return
+            names = [x[0] for x in cursor.description]
+            while len(rows) > 0:
+                yield RecordBatch(names, rows)
+                rows = cursor.fetchmany(batch_size)
\ No newline at end of file
@@ -0,0 +1,108 @@
+import math
+import numpy as np
+from array import array
+
+
+class QuantileSketchArray:
+    """
+    Approximate quantiles of non-negative values with bounded relative error for many groups at once.
+
+    Groups are identified by integer slots. Positive values are counted in logarithmic buckets
+    (as in DDSketch): bucket k holds values in (gamma^(k-1), gamma^k], so any quantile is returned
+    with relative error of at most :relative_accuracy. Zeros and negative values have their own bucket.
+    Values above the last of :max_buckets buckets are counted in it.
+
+    Counts of all groups are kept in two flat typed arrays: key slot * max_buckets + bucket and count.
+    New counts are appended and merged by key when the unmerged part outgrows the merged one,
+    so memory grows with the number of distinct buckets in use rather than slots * max_buckets.
+    """
+    _gamma: float = 0
+    _log_gamma: float = 0
+    _max_buckets: int = 2048
+    # Keys and counts. Keys before :_merged_size are unique and sorted.
+    _keys: array = None
+    _counts: array = None
+    _merged_size: int = 0
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        relative_accuracy: float
+            Maximum relative error of returned quantiles.
+        max_buckets: int
+            Number of buckets per group including the bucket of zeros.
+            With 1% accuracy 2048 buckets cover values up to 10^17.
+        """
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._max_buckets = max_buckets
+        self._keys = array('q')
+        self._counts = array('q')
+        self._merged_size = 0
+
+    def add(self, slots: np.ndarray, values: np.ndarray):
+        """
+        Adds each value to the group of its slot.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        buckets = np.zeros(len(values), dtype=np.int64)
+        positive = values > 0
+        buckets[positive] = np.clip(
+            np.ceil(np.log(values[positive]) / self._log_gamma),
+            0,
+            self._max_buckets - 2
+        ).astype(np.int64) + 1
+        keys, counts = np.unique(slots * self._max_buckets + buckets, return_counts=True)
+        self._keys.frombytes(keys.tobytes())
+        self._counts.frombytes(counts.astype(np.int64).tobytes())
+        if len(self._keys) - self._merged_size > max(self._merged_size, 1024):
+            self._merge()
+
+    def _merge(self):
+        if len(self._keys) == self._merged_size:
+            return
+        keys, inverse = np.unique(np.frombuffer(self._keys, dtype=np.int64), return_inverse=True)
+        counts = np.bincount(inverse.reshape(-1), weights=np.frombuffer(self._counts, dtype=np.int64))
+        # New arrays are created, because arrays can not shrink while their buffers are exported.
+        self._keys = array('q', keys.tobytes())
+        self._counts = array('q', counts.astype(np.int64).tobytes())
+        self._merged_size = len(self._keys)
+
+    def quantiles(self, slot: int, qs: list[float]) -> list[float]:
+        """
+        Returns values of quantiles of the group. Values are None if group is empty.
+        """
+        self._merge()
+        keys = np.frombuffer(self._keys, dtype=np.int64)
+        start, end = np.searchsorted(keys, [slot * self._max_buckets, (slot + 1) * self._max_buckets])
+        counts = np.cumsum(np.frombuffer(self._counts, dtype=np.int64)[start:end])
+        if len(counts) == 0:
+            return [None] * len(qs)
+        ranks = np.asarray(qs, dtype=np.float64) * (counts[-1] - 1)
+        positions = np.minimum(np.searchsorted(counts, ranks, side='right'), len(counts) - 1)
+        buckets = keys[start:end][positions] - slot * self._max_buckets
+        # Middle of the bucket in terms of relative error.
+        values = np.where(buckets == 0, 0.0, 2 * self._gamma ** (buckets - 1.0) / (self._gamma + 1))
+        return values.tolist()
+
+    def get_count(self, slot: int) -> int:
+        """
+        Returns the number of values in the group.
+        """
+        self._merge()
+        keys = np.frombuffer(self._keys, dtype=np.int64)
+        start, end = np.searchsorted(keys, [slot * self._max_buckets, (slot + 1) * self._max_buckets])
+        return int(np.frombuffer(self._counts, dtype=np.int64)[start:end].sum())
+
+    def __len__(self):
+        """
+        Returns the number of stored bucket counts.
+        """
+        self._merge()
+        return len(self._keys)
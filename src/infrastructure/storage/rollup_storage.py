@@ -0,0 +1,247 @@
+import uuid
+import numpy as np
+from array import array
+from datetime import datetime, timezone
+from typing import Iterator
+from src.infrastructure.logging import logger
+from .storage import StoredItem, StoredBatch, Storage, RecordBatch
+from .schema import RecordSchema, ColumnType
+from .quantile_sketch import QuantileSketchArray
+from .deduplicating_storage import DeduplicatingStorage
+
+
+class EngagementRollupStorage(Storage):
+    """
+    Aggregates engagement of messages by channel and day while they are saved into the wrapped storage.
+
+    For each channel and UTC day of publication the number of messages is kept and,
+    for each metric, the number of known values, their sum and percentiles.
+    Counters are kept in typed arrays indexed by a slot of the channel and day,
+    and percentiles in one QuantileSketchArray per metric shared by all slots.
+
+    Every item passed to this storage is counted. To skip duplicates, including messages
+    downloaded again by a later run, wrap this storage into DeduplicatingStorage:
+    DeduplicatingStorage(EngagementRollupStorage(storage)). The opposite order counts
+    duplicates before they are dropped, so it is rejected.
+
+    Rollups are saved as :rollup_entity on flush: every :flush_every messages and on close.
+    Only channel days changed since the previous flush are saved. Row is cumulative for
+    the run, so the latest row of a channel day within a run (same run_id) supersedes the previous ones,
+    while counts and sums of different runs add up.
+    """
+    PERCENTILES = (50, 90, 99)
+    DEFAULT_METRICS = {
+        'views': 'views_count',
+        'forwards': 'forwards_count',
+        'replies': 'replies_count',
+        'reactions': 'reactions',
+    }
+
+    _storage: Storage = None
+    _entity_types: tuple[str] = None
+    _rollup_entity: str = None
+    _channel_column: str = None
+    _datetime_column: str = None
+    # Column by metric name.
+    _metrics: dict[str, str] = None
+    _flush_every: int = 100000
+    _relative_accuracy: float = 0.01
+    _run_id: str = None
+    _schema: RecordSchema = None
+    # Slot by (channel_id, day).
+    _slots: dict[tuple[str, str], int] = None
+    _keys: list[tuple[str, str]] = None
+    _message_counts: array = None
+    # Number of known values, their sum and sketch of values by metric and slot.
+    _value_counts: dict[str, array] = None
+    _sums: dict[str, array] = None
+    _sketches: dict[str, QuantileSketchArray] = None
+    # Slots changed since the last flush.
+    _dirty: set[int] = None
+    _pending_count: int = 0
+
+    def __init__(self,
+                 storage: Storage,
+                 entity_types: tuple[str] = ('message',),
+                 rollup_entity: str = 'channel_daily_engagement',
+                 channel_column: str = 'channel_id',
+                 datetime_column: str = 'publish_datetime',
+                 metrics: dict[str, str] = None,
+                 flush_every: int = 100000,
+                 relative_accuracy: float = 0.01
+                ):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        storage: Storage
+            Storage which receives all items and rollups.
+        entity_types: tuple[str]
+            Types of message entities to be aggregated. Items of all types are saved as is.
+        rollup_entity: str
+            Type of the saved rollups.
+        channel_column: str
+            Name of the column with channel identifier.
+        datetime_column: str
+            Name of the column with publication time.
+        metrics: dict[str, str]
+            Columns of metrics by metric name. Values are integers or None if unknown.
+            Reactions column holds dicts of counts by reaction or lists of such dicts, they are summed.
+            Defaults are columns of messages saved by ChannelMessagesSearch.
+        flush_every: int
+            Rollups are saved after this number of aggregated messages. If None, only on close.
+        relative_accuracy: float
+            Relative error of percentiles.
+        """
+        if isinstance(storage, DeduplicatingStorage):
+            raise Exception(
+                'Rollups would count duplicates dropped by DeduplicatingStorage. '
+                'Wrap EngagementRollupStorage into DeduplicatingStorage instead.'
+            )
+        self._storage = storage
+        self._entity_types = tuple(entity_types)
+        self._rollup_entity = rollup_entity
+        self._channel_column = channel_column
+        self._datetime_column = datetime_column
+        self._metrics = dict(metrics or self.DEFAULT_METRICS)
+        self._flush_every = flush_every
+        self._relative_accuracy = relative_accuracy
+        self._run_id = uuid.uuid4().hex
+        columns = [
+            ('run_id', ColumnType.STR),
+            ('channel_id', ColumnType.STR),
+            ('day', ColumnType.STR),
+            ('message_count', ColumnType.INT),
+        ]
+        for metric in self._metrics:
+            columns += [(f'{metric}_count', ColumnType.INT), (f'{metric}_sum', ColumnType.INT)]
+            columns += [(f'{metric}_p{x}', ColumnType.FLOAT) for x in self.PERCENTILES]
+        columns.append(('flushed_at', ColumnType.DATETIME))
+        self._schema = RecordSchema(columns)
+        self._slots = {}
+        self._keys = []
+        self._message_counts = array('q')
+        self._value_counts = {x: array('q') for x in self._metrics}
+        self._sums = {x: array('q') for x in self._metrics}
+        self._sketches = {x: QuantileSketchArray(relative_accuracy) for x in self._metrics}
+        self._dirty = set()
+        self._pending_count = 0
+
+    def get_schema(self) -> RecordSchema:
+        """
+        Returns schema of saved rollups.
+        """
+        return self._schema
+
+    def save(self, item: StoredItem):
+        self._storage.save(item)
+        if item.get_type() in self._entity_types:
+            value = item.get_value()
+            self._accumulate(
+                [value.get(self._channel_column)],
+                [value.get(self._datetime_column)],
+                {x: [value.get(y)] for x, y in self._metrics.items()}
+            )
+
+    def save_batch(self, batch: StoredBatch):
+        self._storage.save_batch(batch)
+        if batch.get_type() in self._entity_types and len(batch) > 0:
+            names = batch.get_schema().names
+            self._accumulate(
+                batch.get_column(self._channel_column),
+                batch.get_column(self._datetime_column),
+                {x: batch.get_column(y) if y in names else [None] * len(batch) for x, y in self._metrics.items()}
+            )
+
+    def _accumulate(self, channel_ids: list, datetimes: list, metrics: dict[str, list]):
+        slots = np.array([self._get_slot(x, y) for x, y in zip(channel_ids, datetimes)], dtype=np.int64)
+        known = slots >= 0
+        if not known.any():
+            return
+        slots = slots[known]
+        # Views are released on return, because arrays can not grow while their buffers are exported.
+        np.add.at(np.frombuffer(self._message_counts, dtype=np.int64), slots, 1)
+        for metric, values in metrics.items():
+            if metric == 'reactions':
+                values = [self._count_reactions(x) for x in values]
+            values = np.array([np.nan if x is None else x for x in values], dtype=np.float64)[known]
+            valid = ~np.isnan(values)
+            metric_slots = slots[valid]
+            values = values[valid]
+            np.add.at(np.frombuffer(self._value_counts[metric], dtype=np.int64), metric_slots, 1)
+            np.add.at(np.frombuffer(self._sums[metric], dtype=np.int64), metric_slots, np.rint(values).astype(np.int64))
+            self._sketches[metric].add(metric_slots, values)
+        self._dirty.update(np.unique(slots).tolist())
+        self._pending_count += len(slots)
+        if self._flush_every is not None and self._pending_count >= self._flush_every:
+            self.flush()
+
+    def _get_slot(self, channel_id, message_datetime) -> int:
+        """
+        Returns slot of the channel day or -1 if channel or time is unknown.
+        """
+        if channel_id is None or message_datetime is None:
+            return -1
+        if message_datetime.tzinfo is not None:
+            message_datetime = message_datetime.astimezone(timezone.utc)
+        key = (str(channel_id), message_datetime.strftime('%Y-%m-%d'))
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            self._slots[key] = slot
+            self._keys.append(key)
+            self._message_counts.append(0)
+            for metric in self._metrics:
+                self._value_counts[metric].append(0)
+                self._sums[metric].append(0)
+        return slot
+
+    @staticmethod
+    def _count_reactions(reactions) -> int:
+        if reactions is None:
+            return None
+        if isinstance(reactions, dict):
+            return sum(reactions.values())
+        return sum(sum(x.values()) for x in reactions)
+
+    def flush(self):
+        """
+        Saves rollups of channel days changed since the previous flush.
+        """
+        if len(self._dirty) == 0:
+            return
+        slots = sorted(self._dirty)
+        flushed_at = datetime.now()
+        columns = [
+            [self._run_id] * len(slots),
+            [self._keys[x][0] for x in slots],
+            [self._keys[x][1] for x in slots],
+            [self._message_counts[x] for x in slots],
+        ]
+        for metric in self._metrics:
+            columns.append([self._value_counts[metric][x] for x in slots])
+            columns.append([self._sums[metric][x] for x in slots])
+            quantiles = [self._sketches[metric].quantiles(x, [y / 100 for y in self.PERCENTILES]) for x in slots]
+            columns += [list(x) for x in zip(*quantiles)]
+        columns.append([flushed_at] * len(slots))
+        self._storage.save_batch(StoredBatch(self._rollup_entity, self._schema, columns))
+        logger.info(f'Flushed engagement rollups of {len(slots)} channel days.')
+        self._dirty = set()
+        self._pending_count = 0
+
+    def read(self, entity_type: str) -> str:
+        return self._storage.read(entity_type)
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        return self._storage.scan(entity_type, columns, where, batch_size, schema)
+
+    def close(self):
+        self.flush()
+        self._storage.close()
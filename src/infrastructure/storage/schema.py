@@ -0,0 +1,43 @@
+from enum import Enum
+
+
+class ColumnType(Enum):
+    INT = 0
+    FLOAT = 1
+    STR = 2
+    DATETIME = 3
+    JSON = 4
+
+
+class RecordSchema:
+    """
+    Fixed structure of a stored entity: ordered column names and their types.
+
+    Storages compile a serializer once per schema,
+    so schemas are expected to be created once and reused.
+    """
+    names: tuple[str] = None
+    types: tuple[ColumnType] = None
+
+    def __init__(self, columns: list[tuple[str, ColumnType]]):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        columns: list[tuple[str, ColumnType]]
+            Pairs of column name and column type in the order they are stored.
+        """
+        self.names = tuple(name for name, _ in columns)
+        self.types = tuple(column_type for _, column_type in columns)
+
+    def get_type(self, name: str) -> ColumnType:
+        """
+        Returns type of the column or None if schema has no such column.
+        """
+        if name not in self.names:
+            return None
+        return self.types[self.names.index(name)]
+
+    def __len__(self):
+        return len(self.names)
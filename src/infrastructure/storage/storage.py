@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+from .schema import RecordSchema
 
 
 class StoredItem(ABC):
@@ -17,7 +20,6 @@ class StoredItem(ABC):
         """
         pass
 
-    @abstractmethod
     def get_value(self) -> dict[str, str]:
         """
         Returns
@@ -25,8 +27,140 @@ class StoredItem(ABC):
         dict[str, str]
             Returns entity is a dict.
             If your entity is a complex object, you can use database normalization rules.
+            Items without schema must override this method.
         """
-        pass
+        return dict(zip(self.get_schema().names, self.get_row()))
+
+    def get_schema(self) -> RecordSchema:
+        """
+        Returns
+        -------
+        RecordSchema
+            Returns the structure of the entity.
+            Storages encode items with schema in one pass without building dicts.
+        None
+            Returns None if item has no schema. Then :get_value is used.
+        """
+        return None
+
+    def get_row(self) -> tuple:
+        """
+        Returns
+        -------
+        tuple
+            Returns values ordered as columns of the schema.
+        """
+        return tuple(self.get_value().values())
+
+
+class StoredBatch:
+    """
+    Several entities of the same type stored by columns.
+    Storages save the whole batch at once, see Storage.save_batch.
+    """
+    _entity_type: str = None
+    _schema: RecordSchema = None
+    _columns: list[Sequence] = None
+
+    def __init__(self, entity_type: str, schema: RecordSchema, columns: list[Sequence]):
+        """
+        Constructor.
+
+        Parameters
+        ----------
+        entity_type: str
+            Type of the entities.
+        schema: RecordSchema
+            Structure of the entities.
+        columns: list[Sequence]
+            Values of each column of the schema. All columns have the same length.
+        """
+        if len(columns) != len(schema):
+            raise Exception(f'Batch has {len(columns)} columns, but schema has {len(schema)}.')
+        self._entity_type = entity_type
+        self._schema = schema
+        self._columns = columns
+
+    def get_type(self) -> str:
+        return self._entity_type
+
+    def get_schema(self) -> RecordSchema:
+        return self._schema
+
+    def get_column(self, name: str) -> Sequence:
+        """
+        Returns all values of the column.
+        """
+        return self._columns[self._schema.names.index(name)]
+
+    def get_rows(self) -> list[tuple]:
+        """
+        Returns values of each entity ordered as columns of the schema.
+        """
+        return list(zip(*self._columns))
+
+    def get_items(self) -> list[StoredItem]:
+        """
+        Returns entities as stored items.
+        """
+        return [_BatchItem(self._entity_type, self._schema, x) for x in self.get_rows()]
+
+    def take(self, indexes: list[int]) -> 'StoredBatch':
+        """
+        Returns batch of entities at the given positions.
+        """
+        return StoredBatch(
+            self._entity_type,
+            self._schema,
+            [[column[i] for i in indexes] for column in self._columns]
+        )
+
+    def __len__(self):
+        return len(self._columns[0]) if len(self._columns) > 0 else 0
+
+
+class _BatchItem(StoredItem):
+    """
+    Single entity of a batch.
+    """
+
+    def __init__(self, entity_type: str, schema: RecordSchema, row: tuple):
+        self._entity_type = entity_type
+        self._schema = schema
+        self._row = row
+
+    def get_type(self) -> str:
+        return self._entity_type
+
+    def get_schema(self) -> RecordSchema:
+        return self._schema
+
+    def get_row(self) -> tuple:
+        return self._row
+
+
+@dataclass
+class RecordBatch:
+    # Names of the columns.
+    columns: list[str]
+    # Rows. Values inside a row are ordered as columns.
+    rows: list[tuple]
+
+    def column(self, name: str) -> list:
+        """
+        Returns all values of the column.
+        """
+        index = self.columns.index(name)
+        return [x[index] for x in self.rows]
+
+    def to_dicts(self) -> list[dict]:
+        """
+        Returns rows as dicts.
+        """
+        return [dict(zip(self.columns, x)) for x in self.rows]
+
+    def __len__(self):
+        return len(self.rows)
 
 
 class Storage(ABC):
@@ -50,5 +184,68 @@ class Storage(ABC):
         """
         pass
 
+    def save_batch(self, batch: StoredBatch):
+        """
+        Saves several entities of the same type.
+        By default entities are saved one by one.
+
+        Parameters
+        ----------
+        batch: StoredBatch
+            Entities to be stored.
+
+        Returns
+        -------
+        None
+            Returns nothing.
+        """
+        for item in batch.get_items():
+            self.save(item)
+
     def read(self, entity_type: str) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        """
+        Lazily reads stored entities batch by batch.
+
+        Parameters
+        ----------
+        entity_type: str
+            Type of the entities to be read.
+        columns: list[str]
+            Columns to be returned. All columns are returned if None.
+        where: dict[str, object]
+            Only rows where each column is equal to the given value are returned.
+        batch_size: int
+            Maximum number of rows in one batch.
+        schema: RecordSchema
+            Schema of the entities. 
+            Storages which keep values as text use it to convert values to column types.
+
+        Returns
+        -------
+        Iterator[RecordBatch]
+            Returns batches of rows. 
+            Nothing is returned if storage does not support reading 
+            or there are no entities of given type.
+        """
+        return iter(())
+
+    def close(self):
+        """
+        Flushes buffered data and releases resources.
+        Storage should not be used after it is closed.
+
+        Returns
+        -------
+        None
+            Returns nothing.
+        """
+        pass
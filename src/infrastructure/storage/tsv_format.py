@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import mmap
+from datetime import datetime
+from typing import Callable, Iterator
+from src.infrastructure.logging import logger
+from .storage import StoredItem, StoredBatch, RecordBatch
+from .schema import RecordSchema, ColumnType
+
+# Marker of the missing value. The same marker is used by Postgres COPY.
+NULL = r'\N'
+
+_ESCAPE = str.maketrans({
+    '\\': r'\\',
+    '\t': r'\t',
+    '\n': r'\n',
+    '\r': r'\r'
+})
+_UNESCAPE_PATTERN = re.compile(r'\\(.)')
+_UNESCAPE = {
+    '\\': '\\',
+    't': '\t',
+    'n': '\n',
+    'r': '\r'
+}
+
+
+def _escape(value) -> str:
+    return str(value).translate(_ESCAPE)
+
+
+def _unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return _UNESCAPE_PATTERN.sub(lambda m: _UNESCAPE.get(m.group(1), m.group(1)), value)
+
+
+def _encode_json(value) -> str:
+    return _escape(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _decode_json(value: str):
+    value = _unescape(value)
+    try:
+        return json.loads(value)
+    except ValueError:
+        # Files written before schemas were introduced contain python repr.
+        return value
+
+
+_ENCODERS = {
+    ColumnType.INT: str,
+    ColumnType.FLOAT: str,
+    ColumnType.STR: _escape,
+    ColumnType.DATETIME: str,
+    ColumnType.JSON: _encode_json
+}
+
+_DECODERS = {
+    ColumnType.INT: int,
+    ColumnType.FLOAT: float,
+    ColumnType.STR: _unescape,
+    ColumnType.DATETIME: datetime.fromisoformat,
+    ColumnType.JSON: _decode_json
+}
+
+
+def compile_serializer(schema: RecordSchema) -> Callable[[tuple], str]:
+    """
+    Creates a function which encodes a row of given schema into a TSV line.
+    """
+    encoders = tuple(_ENCODERS[x] for x in schema.types)
+
+    def serialize(row: tuple) -> str:
+        return '\t'.join([NULL if v is None else e(v) for e, v in zip(encoders, row)])
+
+    return serialize
+
+
+class TsvSerializer:
+    """
+    Encodes stored items into TSV lines.
+    Serializer is compiled once per schema and reused.
+    """
+    _serializers: dict[RecordSchema, Callable[[tuple], str]] = None
+
+    def __init__(self):
+        self._serializers = {}
+
+    def get_header(self, item: StoredItem) -> str:
+        schema = item.get_schema()
+        names = item.get_value().keys() if schema is None else schema.names
+        return '\t'.join([str(x) for x in names])
+
+    def get_line(self, item: StoredItem) -> str:
+        schema = item.get_schema()
+        if schema is None:
+            return '\t'.join([NULL if x is None else _escape(x) for x in item.get_value().values()])
+        return self._get_serializer(schema)(item.get_row())
+
+    def get_batch_header(self, batch: StoredBatch) -> str:
+        return '\t'.join(batch.get_schema().names)
+
+    def get_batch_lines(self, batch: StoredBatch) -> list[str]:
+        serializer = self._get_serializer(batch.get_schema())
+        return [serializer(x) for x in batch.get_rows()]
+
+    def _get_serializer(self, schema: RecordSchema) -> Callable[[tuple], str]:
+        serializer = self._serializers.get(schema)
+        if serializer is None:
+            serializer = compile_serializer(schema)
+            self._serializers[schema] = serializer
+        return serializer
+
+
+def decode_value(value: str, column_type: ColumnType = None):
+    """
+    Decodes a TSV value. Value is unescaped and converted to the column type if it is given.
+    'None' is treated as missing value to read files written before NULL marker was introduced,
+    except in STR columns, where it is a valid text.
+    """
+    if value == NULL:
+        return None
+    if value == 'None' and column_type != ColumnType.STR:
+        return None
+    if column_type is None:
+        return _unescape(value)
+    return _DECODERS[column_type](value)
+
+
+def read_lines(filename: str) -> Iterator[str]:
+    """
+    Reads file line by line using memory mapping.
+    Line endings are stripped.
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            for line in iter(m.readline, b''):
+                yield line.decode('utf-8').rstrip('\r\n')
+
+
+def read_batches(lines: Iterator[str],
+                 columns: list[str] = None,
+                 where: dict[str, object] = None,
+                 batch_size: int = 10000,
+                 schema: RecordSchema = None
+                ) -> Iterator[RecordBatch]:
+    """
+    Splits TSV lines into batches of records.
+
+    Parameters
+    ----------
+    lines: Iterator[str]
+        Lines of TSV file. The first line is a header.
+    columns: list[str]
+        Columns to be returned. All columns are returned if None.
+    where: dict[str, object]
+        Only rows where each column is equal to the given value are returned.
+    batch_size: int
+        Maximum number of rows in one batch.
+    schema: RecordSchema
+        If given, values are converted to column types.
+        Columns which are missing in schema are returned as strings.
+
+    Returns
+    -------
+    Iterator[RecordBatch]
+        Returns batches of rows. Rows whose number of values differs from the header
+        are skipped and their count is logged.
+    """
+    lines = iter(lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
+    header = first_line.split('\t')
+    if columns is None:
+        columns = header
+    for column in list(columns) + list((where or {}).keys()):
+        if column not in header:
+            raise Exception(f'Unknown column: {column}')
+    indexes = [header.index(x) for x in columns]
+    types = [None if schema is None else schema.get_type(x) for x in columns]
+    conditions = [(header.index(k), _escape(v)) for k, v in (where or {}).items()]
+    rows = []
+    malformed_count = 0
+    for line in lines:
+        values = line.split('\t')
+        if len(values) != len(header):
+            malformed_count += 1
+            continue
+        if any(values[i] != v for i, v in conditions):
+            continue
+        rows.append(tuple(decode_value(values[i], t) for i, t in zip(indexes, types)))
+        if len(rows) >= batch_size:
+            yield RecordBatch(list(columns), rows)
+            rows = []
+    if len(rows) > 0:
+        yield RecordBatch(list(columns), rows)
+    if malformed_count > 0:
+        logger.warning(f'Skipped {malformed_count} rows whose number of values differs from the header.')
@@ -1,5 +1,8 @@
 import os
-from .storage import StoredItem, Storage
+from typing import Iterator
+from .storage import StoredItem, StoredBatch, Storage, RecordBatch
+from .schema import RecordSchema
+from .tsv_format import TsvSerializer, read_lines, read_batches
 
 
 class TsvStorage(Storage):
@@ -8,6 +11,7 @@ class TsvStorage(Storage):
     """
     _out_dir = None
     _total_count = {}
+    _serializer: TsvSerializer = None
 
     def __init__(self, out_dir: str):
         """
@@ -19,6 +23,7 @@ class TsvStorage(Storage):
             Directory where TSV files will be stored.
         """
         self._out_dir = out_dir
+        self._serializer = TsvSerializer()
         if not os.path.exists(out_dir):
             os.makedirs(out_dir)
         # if len(os.listdir(out_dir)) > 0:
@@ -29,14 +34,23 @@ class TsvStorage(Storage):
         filename = self._get_filename(item.get_type())
         if not os.path.exists(filename):
             with open(filename, 'a') as f:
-                header = '\t'.join([str(x) for x in item.get_value().keys()])
-                f.write(header)
+                f.write(self._serializer.get_header(item))
                 f.write('\r\n')
         with open(filename, 'a') as f:
-                row = '\t'.join([str(x).replace('\n', r'\n') for x in item.get_value().values()])
-                f.write(row)
+                f.write(self._serializer.get_line(item))
                 f.write('\r\n')
 
+    def save_batch(self, batch: StoredBatch):
+        if len(batch) == 0:
+            return
+        filename = self._get_filename(batch.get_type())
+        lines = self._serializer.get_batch_lines(batch)
+        if not os.path.exists(filename):
+            lines.insert(0, self._serializer.get_batch_header(batch))
+        with open(filename, 'a') as f:
+            f.write('\r\n'.join(lines))
+            f.write('\r\n')
+
     def _get_filename(self, entity_type: str):
         return os.path.join(self._out_dir, entity_type) + '.tsv'
 
@@ -45,4 +59,16 @@ class TsvStorage(Storage):
         if not os.path.exists(filename):
             return None
         with open(filename, 'r') as f:
-            return f.read()
\ No newline at end of file
+            return f.read()
+
+    def scan(self,
+             entity_type: str,
+             columns: list[str] = None,
+             where: dict[str, object] = None,
+             batch_size: int = 10000,
+             schema: RecordSchema = None
+            ) -> Iterator[RecordBatch]:
+        filename = self._get_filename(entity_type)
+        if not os.path.exists(filename):
+            return iter(())
+        return read_batches(read_lines(filename), columns, where, batch_size, schema)
@@ -1,3 +1,4 @@
 from .api import TelegramApi
 from .telethon import TelethonTelegramApi
-from .model import ChannelResponse, MessageResponse
\ No newline at end of file
+from .model import ChannelResponse, MessageResponse, MessageBatch
+from .errors import FloodWaitError
\ No newline at end of file
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from .model import ChannelResponse, MessageResponse
+from datetime import datetime
+from .model import ChannelResponse, MessageResponse, MessageBatch
 
 
 class TelegramApi(ABC):
@@ -39,21 +40,65 @@ class TelegramApi(ABC):
         pass
 
     @abstractmethod
-    async def get_messages(self, channel_id: str, count: int) -> list[MessageResponse]:
+    async def get_messages(self, 
+                           channel_id: str, 
+                           limit: int, 
+                           offset_id: int = None, 
+                           add_offset: int = None,
+                           offset_date: datetime = None,
+                           min_id: int = None,
+                           search: str = None
+                          ) -> list[MessageResponse]:
         """
-        Get messages from the channel.
+        Get messages from the channel. Messages are ordered from the newest to the oldest.
 
         Parameters
         ----------
         channel_id: str
             Channel identifier. 
             For example, if channel link is t.me/ali_baba, than :channel_id is ali_baba.
-        count: int
+        limit: int
             Count of messages to be retrieved.
+        offset_id: int
+            Only messages older than this message are retrieved.
+        add_offset: int
+            Number of messages to be skipped after :offset_id.
+        offset_date: datetime
+            Only messages published before this date are retrieved.
+        min_id: int
+            Only messages with greater id are retrieved.
+        search: str
+            If given, only messages found by Telegram search for this query are retrieved.
         
         Returns
         -------
         list[Message]
             Returns list of messages from the channel.
+
+        Raises
+        ------
+        FloodWaitError
+            If requests are too frequent.
+        """
+        pass
+
+    async def get_message_batch(self,
+                                channel_id: str,
+                                limit: int,
+                                offset_id: int = None,
+                                add_offset: int = None,
+                                offset_date: datetime = None,
+                                min_id: int = None,
+                                search: str = None
+                               ) -> MessageBatch:
+        """
+        Same as :get_messages, but messages are returned by columns.
+        By default messages are requested with :get_messages and converted.
+
+        Returns
+        -------
+        MessageBatch
+            Returns messages from the channel ordered from the newest to the oldest.
         """
-        pass
\ No newline at end of file
+        messages = await self.get_messages(channel_id, limit, offset_id, add_offset, offset_date, min_id, search)
+        return MessageBatch.from_messages(messages)
@@ -0,0 +1,10 @@
+class FloodWaitError(Exception):
+    """
+    Telegram refused the request because requests are too frequent.
+    """
+    # Number of seconds to wait before the next request.
+    seconds: int = 0
+
+    def __init__(self, seconds: int):
+        super().__init__(f'A wait of {seconds} seconds is required.')
+        self.seconds = seconds
@@ -1,4 +1,6 @@
+import numpy as np
 from dataclasses import dataclass
+from datetime import datetime, timezone
 
 @dataclass
 class ChannelResponse:
@@ -26,4 +28,171 @@ class MessageResponse:
     # Reactions [{'good': count_good}, {'bad': count_bad}].
     reactions: list[dict[str, int]]
     # Number of comments
-    replies_count: int
\ No newline at end of file
+    replies_count: int
+
+# Value of numeric column when it is unknown.
+MISSING = -1
+
+
+@dataclass
+class MessageBatch:
+    """
+    Page of messages stored by columns.
+    Numeric columns are numpy arrays, so whole page can be filtered at once.
+    """
+    # Unique message identifiers.
+    message_ids: np.ndarray
+    # Message texts.
+    texts: list[str]
+    # Channels where messages are posted.
+    channel_ids: list[str]
+    # Channels where messages were forwarded from. None if message is not forwarded.
+    channel_fwd_from_ids: list[str]
+    # Number of views. MISSING if unknown.
+    views: np.ndarray
+    # Number of forwards. MISSING if unknown.
+    forwards: np.ndarray
+    # Publication datetimes in UTC. NaT if unknown.
+    datetimes: np.ndarray
+    # Reactions of each message.
+    reactions: list[list[dict[str, int]]]
+    # Number of comments. MISSING if unknown.
+    replies_counts: np.ndarray
+    # Duration of the request to Telegram in seconds, without waiting for the client.
+    # None if the API does not measure it.
+    request_seconds: float = None
+
+    @staticmethod
+    def from_columns(message_ids: list[int],
+                     texts: list[str],
+                     channel_ids: list[str],
+                     channel_fwd_from_ids: list[str],
+                     views: list[int],
+                     forwards: list[int],
+                     datetimes: list[datetime],
+                     reactions: list[list[dict[str, int]]],
+                     replies_counts: list[int]
+                    ) -> 'MessageBatch':
+        """
+        Creates batch from lists of values. Missing numbers and dates are given as None.
+        """
+        return MessageBatch(
+            message_ids=np.array(message_ids, dtype=np.int64),
+            texts=texts,
+            channel_ids=channel_ids,
+            channel_fwd_from_ids=channel_fwd_from_ids,
+            views=_to_int_array(views),
+            forwards=_to_int_array(forwards),
+            datetimes=to_datetime64(datetimes),
+            reactions=reactions,
+            replies_counts=_to_int_array(replies_counts)
+        )
+
+    @staticmethod
+    def from_messages(messages: list[MessageResponse]) -> 'MessageBatch':
+        """
+        Creates batch from messages.
+        """
+        return MessageBatch.from_columns(
+            message_ids=[m.message_id for m in messages],
+            texts=[m.text for m in messages],
+            channel_ids=[m.channel_id for m in messages],
+            channel_fwd_from_ids=[m.channel_fwd_from_id for m in messages],
+            views=[m.views for m in messages],
+            forwards=[m.forwards for m in messages],
+            datetimes=[m.datetime for m in messages],
+            reactions=[m.reactions for m in messages],
+            replies_counts=[m.replies_count for m in messages]
+        )
+
+    def to_columns(self) -> dict[str, list]:
+        """
+        Returns columns as lists of python values.
+        Missing numbers and dates are None, datetimes are in UTC.
+        """
+        return {
+            'message_ids': self.message_ids.tolist(),
+            'texts': self.texts,
+            'channel_ids': self.channel_ids,
+            'channel_fwd_from_ids': self.channel_fwd_from_ids,
+            'views': _from_int_array(self.views),
+            'forwards': _from_int_array(self.forwards),
+            'datetimes': [
+                None if x is None else x.replace(tzinfo=timezone.utc)
+                for x in self.datetimes.astype(object)
+            ],
+            'reactions': self.reactions,
+            'replies_counts': _from_int_array(self.replies_counts)
+        }
+
+    def to_messages(self) -> list[MessageResponse]:
+        """
+        Converts batch back to messages.
+        """
+        columns = self.to_columns()
+        return [
+            MessageResponse(*x)
+            for x in zip(
+                columns['message_ids'],
+                columns['texts'],
+                columns['channel_ids'],
+                columns['channel_fwd_from_ids'],
+                columns['views'],
+                columns['forwards'],
+                columns['datetimes'],
+                columns['reactions'],
+                columns['replies_counts']
+            )
+        ]
+
+    def take(self, indexes: np.ndarray) -> 'MessageBatch':
+        """
+        Returns batch of selected messages.
+
+        Parameters
+        ----------
+        indexes: np.ndarray
+            Boolean mask or positions of messages.
+        """
+        indexes = np.asarray(indexes)
+        if indexes.dtype == bool:
+            indexes = np.flatnonzero(indexes)
+        return MessageBatch(
+            message_ids=self.message_ids[indexes],
+            texts=[self.texts[i] for i in indexes],
+            channel_ids=[self.channel_ids[i] for i in indexes],
+            channel_fwd_from_ids=[self.channel_fwd_from_ids[i] for i in indexes],
+            views=self.views[indexes],
+            forwards=self.forwards[indexes],
+            datetimes=self.datetimes[indexes],
+            reactions=[self.reactions[i] for i in indexes],
+            replies_counts=self.replies_counts[indexes],
+            request_seconds=self.request_seconds
+        )
+
+    def __len__(self):
+        return len(self.message_ids)
+
+
+def to_datetime64(values: list[datetime]) -> np.ndarray:
+    """
+    Converts datetimes to numpy array of UTC datetimes. Naive datetimes are treated as UTC.
+    """
+    return np.array(
+        [None if x is None else _to_naive_utc(x) for x in values],
+        dtype='datetime64[us]'
+    )
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _to_int_array(values: list[int]) -> np.ndarray:
+    return np.array([MISSING if x is None else x for x in values], dtype=np.int64)
+
+
+def _from_int_array(values: np.ndarray) -> list[int]:
+    return [None if x == MISSING else x for x in values.tolist()]
@@ -1,10 +1,12 @@
 import time
+import asyncio
 from datetime import datetime
-from telethon import TelegramClient
+from telethon import TelegramClient, errors
 from telethon.types import PeerChannel
 from .api import TelegramApi
 from ..cache import Cache
-from .model import ChannelResponse, MessageResponse
+from .model import ChannelResponse, MessageResponse, MessageBatch
+from .errors import FloodWaitError
 from src.infrastructure.logging import logger
 
 
@@ -19,6 +21,7 @@ class TelethonTelegramApi(TelegramApi):
     _cache: Cache
     _client: None
     _client_name: str
+    _lock: asyncio.Lock
     _PEER_ID_CACHE_TYPE: str = 'peer_id'
     _PEER_ID_TTL_SECONDS: int = 60*60*24 # 1 day
     _CHANNEL_BY_PEER_ID_CACHE_TYPE: str = 'channel_by_peer_id'
@@ -43,6 +46,8 @@ class TelethonTelegramApi(TelegramApi):
         self._client = get_client_factory()(client_name, api_id, api_hash)
         self._cache = cache
         self._client_name = client_name
+        # Calls of one client are serialized, so it can be shared by concurrent searches.
+        self._lock = asyncio.Lock()
 
     async def authorize(self):
         await self._client.start()
@@ -55,8 +60,8 @@ class TelethonTelegramApi(TelegramApi):
         cached_value = self._cache.get(self._CHANNEL_BY_PEER_ID_CACHE_TYPE, peer_id.channel_id)
         if cached_value is not None:
             return cached_value
-        async with self._client:
-            time.sleep(1)
+        async with self._lock, self._client:
+            await asyncio.sleep(1)
             logger.info(f'[{self._client_name}] GET_ENTITY_BY_PEER_ID: {peer_id.channel_id}')
             channel = await self._client.get_entity(peer_id)
         channel = ChannelResponse(self._get_username(channel), channel.title)
@@ -76,19 +81,11 @@ class TelethonTelegramApi(TelegramApi):
                            limit: int, 
                            offset_id: int = None, 
                            add_offset: int = None,
-                           offset_date: datetime = None
+                           offset_date: datetime = None,
+                           min_id: int = None,
+                           search: str = None
                           ) -> list[MessageResponse]:
-        peer_id = await self._get_peer_id(channel_id)
-        async with self._client:
-            time.sleep(1)
-            logger.info(f'[{self._client_name}] GET_MESSAGES: {channel_id} limit={limit} offset_id={offset_id} add_offset-{add_offset}')
-            messages = await self._client.get_messages(
-                entity=peer_id, 
-                limit=limit,
-                offset_id=offset_id,
-                add_offset=add_offset,
-                offset_date=offset_date
-            )
+        messages, _ = await self._request_messages(channel_id, limit, offset_id, add_offset, offset_date, min_id, search)
         return [
             MessageResponse(
                 message_id=x.id, 
@@ -104,6 +101,61 @@ class TelethonTelegramApi(TelegramApi):
             for x in messages
         ]
 
+    async def get_message_batch(self,
+                                channel_id: str,
+                                limit: int,
+                                offset_id: int = None,
+                                add_offset: int = None,
+                                offset_date: datetime = None,
+                                min_id: int = None,
+                                search: str = None
+                               ) -> MessageBatch:
+        messages, request_seconds = await self._request_messages(
+            channel_id, limit, offset_id, add_offset, offset_date, min_id, search
+        )
+        # All messages are posted in the requested channel.
+        channel = None
+        if len(messages) > 0:
+            channel = (await self._get_channel_by_peer_id(messages[0].peer_id)).channel_id
+        batch = MessageBatch.from_columns(
+            message_ids=[x.id for x in messages],
+            texts=[x.text for x in messages],
+            channel_ids=[channel] * len(messages),
+            channel_fwd_from_ids=[await self._get_channel_from_id(x) for x in messages],
+            views=[x.views for x in messages],
+            forwards=[x.forwards for x in messages],
+            datetimes=[x.date for x in messages],
+            reactions=[self._get_reactions(x) for x in messages],
+            replies_counts=[self._get_replies(x) for x in messages]
+        )
+        batch.request_seconds = request_seconds
+        return batch
+
+    async def _request_messages(self, channel_id, limit, offset_id, add_offset, offset_date, min_id, search):
+        """
+        Returns messages and duration of the request in seconds.
+        Waiting for the lock, the connection and the pause between requests is not counted.
+        """
+        peer_id = await self._get_peer_id(channel_id)
+        async with self._lock, self._client:
+            await asyncio.sleep(1)
+            logger.info(f'[{self._client_name}] GET_MESSAGES: {channel_id} limit={limit} offset_id={offset_id} add_offset-{add_offset} min_id={min_id} search={search}')
+            start_time = time.monotonic()
+            try:
+                messages = await self._client.get_messages(
+                    entity=peer_id, 
+                    limit=limit,
+                    offset_id=offset_id,
+                    add_offset=add_offset,
+                    offset_date=offset_date,
+                    min_id=min_id or 0,
+                    search=search
+                )
+                return messages, time.monotonic() - start_time
+            except errors.FloodWaitError as e:
+                # Short waits are slept by Telethon itself, longer ones are reported to the caller.
+                raise FloodWaitError(e.seconds) from e
+
     def _get_replies(self, msg):
         if msg.replies is None:
             return None
@@ -140,8 +192,8 @@ class TelethonTelegramApi(TelegramApi):
         cached_value = self._cache.get(self._PEER_ID_CACHE_TYPE, channel_id)
         if cached_value is not None:
             return cached_value
-        async with self._client:
-            time.sleep(1)
+        async with self._lock, self._client:
+            await asyncio.sleep(1)
             logger.info(f'[{self._client_name}] GET_PEER_ID: {channel_id}')
             peer_id = await self._client.get_peer_id(channel_id)
             self._cache.store(
@@ -0,0 +1,49 @@
+import unittest
+from src.application.analytics import KeywordMatcher
+from src.application.search import KeywordMessageFilter
+from test.utils import HistoryTelegramApiMock
+
+
+class TestKeywordMatcher(unittest.TestCase):
+
+    def test_find_all(self):
+        matcher = KeywordMatcher(['цифров', 'устойчив', 'he', 'she', 'hers'])
+        self.assertEqual(matcher.find_all('Цифровая устойчивость'), {0, 1})
+        self.assertEqual(matcher.find_all('ushers'), {2, 3, 4})
+        self.assertEqual(matcher.find_all('nothing'), set())
+        self.assertEqual(matcher.find_all(None), set())
+
+    def test_overlapping_keywords(self):
+        matcher = KeywordMatcher(['abcd', 'bc', 'c', 'bcx'])
+        self.assertEqual(matcher.find_all('abcx'), {1, 2, 3})
+        self.assertEqual(matcher.find_all('abcd'), {0, 1, 2})
+
+    def test_same_result_as_substring_search(self):
+        keywords = ['ab', 'aab', 'ba', 'bab', 'abba', 'b']
+        matcher = KeywordMatcher(keywords)
+        for text in ['', 'a', 'aaab', 'babba', 'abababa', 'aabba']:
+            expected = {i for i, x in enumerate(keywords) if x in text}
+            self.assertEqual(matcher.find_all(text), expected, text)
+            self.assertEqual(matcher.match_any(text), len(expected) > 0, text)
+
+    def test_case_and_yo(self):
+        self.assertEqual(KeywordMatcher(['Ёлка']).find_all('ёлка'), {0})
+        self.assertEqual(KeywordMatcher(['ёлка']).find_all('Елка'), set())
+        self.assertEqual(KeywordMatcher(['ёлка'], normalize_yo=True).find_all('ЕЛКА'), {0})
+        self.assertEqual(KeywordMatcher(['Елка'], ignore_case=False).find_all('елка'), set())
+
+    def test_empty_keyword(self):
+        with self.assertRaises(Exception):
+            KeywordMatcher(['a', ''])
+
+    def test_message_filter(self):
+        filter = KeywordMessageFilter(['Цифров', 'устойчив'])
+        self.assertTrue(filter.match(HistoryTelegramApiMock.message('channel_1', 1, 'цифровой мир')))
+        self.assertFalse(filter.match(HistoryTelegramApiMock.message('channel_1', 2, 'другое')))
+        self.assertIsNone(filter.get_search_queries())
+        filter = KeywordMessageFilter(['Цифров', 'устойчив'], server_search=True)
+        self.assertEqual(filter.get_search_queries(), ['цифров', 'устойчив'])
+
+
+if __name__ == '__main__':
+    unittest.main()
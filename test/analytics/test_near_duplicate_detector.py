@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+from src.application.analytics import MinHashSimilarityEstimator, LshIndex, NearDuplicateDetector
+
+ORIGINAL = 'Центробанк повысил ключевую ставку до 16% годовых, сообщает пресс-служба регулятора'
+EDITED = 'Центробанк повысил ключевую ставку до 16 % годовых — сообщает пресс-служба регулятора!'
+OTHER = 'Погода в Москве: завтра ожидается дождь и сильный ветер'
+
+
+class TestMinHashSimilarityEstimator(unittest.TestCase):
+
+    def test_similarity_estimates_jaccard_of_shingles(self):
+        estimator = MinHashSimilarityEstimator(num_perm=256)
+        first, second = estimator.get_shingles(ORIGINAL), estimator.get_shingles(EDITED)
+        jaccard = len(np.intersect1d(first, second)) / len(np.union1d(first, second))
+        self.assertAlmostEqual(estimator.get_similarity(ORIGINAL, EDITED), jaccard, delta=0.1)
+        self.assertLess(estimator.get_similarity(ORIGINAL, OTHER), 0.1)
+
+    def test_case_and_whitespace_are_ignored(self):
+        estimator = MinHashSimilarityEstimator()
+        self.assertEqual(estimator.get_similarity('Hello   World', 'hello world'), 1)
+        self.assertEqual(estimator.get_similarity('', None), 0)
+        self.assertIsNone(estimator.get_signature('  '))
+        self.assertEqual(len(estimator.get_shingles('abc')), 1)
+
+    def test_signatures_are_rows(self):
+        estimator = MinHashSimilarityEstimator(num_perm=64)
+        signatures = estimator.get_signatures([ORIGINAL, OTHER, ORIGINAL])
+        self.assertEqual(signatures.shape, (3, 64))
+        self.assertEqual(estimator.compare(signatures[0], signatures).tolist()[::2], [1, 1])
+
+    def test_empty_rows_are_not_similar(self):
+        estimator = MinHashSimilarityEstimator(num_perm=64)
+        signatures = estimator.get_signatures([ORIGINAL, '', None])
+        self.assertEqual(estimator.compare(signatures[1], signatures).tolist(), [0, 0, 0])
+        self.assertEqual(estimator.compare(signatures[0], signatures).tolist(), [1, 0, 0])
+
+
+class TestLshIndex(unittest.TestCase):
+
+    def test_similar_signatures_are_candidates(self):
+        estimator = MinHashSimilarityEstimator()
+        index = LshIndex(bands=32)
+        index.add('original', estimator.get_signature(ORIGINAL))
+        index.add('other', estimator.get_signature(OTHER))
+        self.assertEqual(index.query(estimator.get_signature(EDITED)), {'original'})
+        self.assertEqual(len(index), 2)
+
+    def test_bands_must_divide_signature(self):
+        with self.assertRaises(Exception):
+            LshIndex(num_perm=128, bands=5)
+
+
+class TestNearDuplicateDetector(unittest.TestCase):
+
+    def test_reposts_join_cluster_of_first_message(self):
+        detector = NearDuplicateDetector(threshold=0.5, bands=32)
+        self.assertEqual(detector.add(1, ORIGINAL), 1)
+        self.assertEqual(detector.add(2, OTHER), 2)
+        self.assertEqual(detector.add(3, EDITED), 1)
+        self.assertEqual(detector.add(4, ORIGINAL.upper()), 1)
+        self.assertEqual(detector.add(3, OTHER), 1)
+        self.assertEqual(detector.get_cluster(4), 1)
+        self.assertIsNone(detector.get_cluster(5))
+        self.assertEqual((detector.get_cluster_size(1), detector.get_cluster_size(2)), (3, 1))
+        self.assertEqual(len(detector), 4)
+
+    def test_empty_messages_are_not_clustered(self):
+        detector = NearDuplicateDetector()
+        self.assertEqual([detector.add(i, x) for i, x in enumerate(['', None, ' ', ''])], [0, 1, 2, 3])
+        self.assertEqual(detector.add(4, ORIGINAL), 4)
+        self.assertEqual(detector.get_cluster_size(0), 1)
+        self.assertEqual(detector.get_cluster(3), 3)
+
+    def test_many_distinct_messages_stay_apart(self):
+        detector = NearDuplicateDetector()
+        clusters = [detector.add(i, f'Сообщение номер {i} о событии {i * 7919 % 1000}') for i in range(200)]
+        copies = [detector.add(1000 + i, f'Сообщение номер {i} о событии {i * 7919 % 1000}') for i in range(200)]
+        self.assertEqual(clusters, list(range(200)))
+        self.assertEqual(copies, list(range(200)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import unittest
+import tempfile
+from datetime import datetime, timedelta, timezone
+from src.application.analytics import ChannelRelevanceEstimator, PersistentChannelRelevanceEstimator, \
+    KeywordChannelRelevanceEstimator
+from src.application.client import ClientPool, Client
+from src.infrastructure.scores import SqliteRelevanceScoreStore, RelevanceScore
+from test.utils import HistoryTelegramApiMock, async_test
+
+
+class CountingRelevanceEstimator(ChannelRelevanceEstimator):
+
+    def __init__(self, key='counting', fail=False, sample_size=10):
+        self.key = key
+        self.fail = fail
+        self.sample_size = sample_size
+        self.requests = []
+
+    def get_key(self):
+        return self.key
+
+    async def get_scored_relevance(self, channel_id: str):
+        self.requests.append(channel_id)
+        if self.fail:
+            raise Exception('Estimation failed')
+        return len(channel_id), self.sample_size
+
+
+class TestPersistentChannelRelevanceEstimator(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = SqliteRelevanceScoreStore(os.path.join(self.dir.name, 'scores.db'))
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    @async_test
+    async def test_scores_are_reused_by_next_runs(self):
+        first = CountingRelevanceEstimator()
+        await PersistentChannelRelevanceEstimator(first, self.store).get_relevance('abc')
+        second = CountingRelevanceEstimator()
+        estimator = PersistentChannelRelevanceEstimator(second, self.store)
+        self.assertEqual(await estimator.get_relevance('abc'), 3)
+        self.assertEqual(await estimator.get_scored_relevance('de'), (2, 10))
+        self.assertEqual(second.requests, ['de'])
+        self.assertEqual((estimator.get_hit_count(), estimator.get_miss_count()), (1, 1))
+
+    @async_test
+    async def test_stale_scores_and_other_estimators_are_estimated_again(self):
+        self.store.put(RelevanceScore('a', 'counting', 5, 10, datetime.now(timezone.utc) - timedelta(days=8)))
+        self.store.put(RelevanceScore('b', 'other', 5, 10, datetime.now(timezone.utc)))
+        inner = CountingRelevanceEstimator()
+        estimator = PersistentChannelRelevanceEstimator(inner, self.store, max_age=timedelta(days=7))
+        self.assertEqual(await estimator.get_relevance('a'), 1)
+        self.assertEqual(await estimator.get_relevance('b'), 1)
+        self.assertEqual(inner.requests, ['a', 'b'])
+        self.assertEqual(self.store.get('a', 'counting').relevance, 1)
+
+    @async_test
+    async def test_scores_are_reused_after_store_is_reopened(self):
+        await PersistentChannelRelevanceEstimator(CountingRelevanceEstimator(), self.store).get_relevance('abc')
+        self.store.close()
+        self.store = SqliteRelevanceScoreStore(os.path.join(self.dir.name, 'scores.db'))
+        inner = CountingRelevanceEstimator()
+        estimator = PersistentChannelRelevanceEstimator(inner, self.store)
+        self.assertEqual(await estimator.get_scored_relevance('abc'), (3, 10))
+        self.assertEqual(inner.requests, [])
+
+    @async_test
+    async def test_scores_within_max_age_are_reused(self):
+        now = datetime.now(timezone.utc)
+        self.store.put(RelevanceScore('a', 'counting', 5, 10, now - timedelta(days=6)))
+        self.store.put(RelevanceScore('b', 'counting', 5, 10, now - timedelta(days=365)))
+        inner = CountingRelevanceEstimator()
+        estimator = PersistentChannelRelevanceEstimator(inner, self.store, max_age=timedelta(days=7))
+        self.assertEqual(await estimator.get_relevance('a'), 5)
+        self.assertEqual(await estimator.get_relevance('b'), 1)
+        # Scores never become stale without max age.
+        estimator = PersistentChannelRelevanceEstimator(inner, self.store, max_age=None)
+        self.store.put(RelevanceScore('c', 'counting', 5, 10, now - timedelta(days=365)))
+        self.assertEqual(await estimator.get_relevance('c'), 5)
+        self.assertEqual(inner.requests, ['b'])
+
+    @async_test
+    async def test_failed_estimations_are_not_saved(self):
+        estimator = PersistentChannelRelevanceEstimator(CountingRelevanceEstimator(fail=True), self.store)
+        with self.assertLogs('main_logger', level='ERROR'):
+            self.assertEqual(await estimator.get_scored_relevance('a'), (0, 0))
+        self.assertEqual(await estimator.get_relevance('a'), 0)
+        self.assertIsNone(self.store.get('a', 'counting'))
+        # Scores based on no messages are estimated again.
+        inner = CountingRelevanceEstimator(sample_size=0)
+        estimator = PersistentChannelRelevanceEstimator(inner, self.store)
+        await estimator.get_relevance('a')
+        await estimator.get_relevance('a')
+        self.assertEqual(inner.requests, ['a', 'a'])
+
+    @async_test
+    async def test_keyword_estimator_errors_give_zero_relevance(self):
+        client_pool = ClientPool()
+        client_pool.add_client(Client('client_0', HistoryTelegramApiMock({'a': 5})))
+        await client_pool.activate_clients()
+        estimator = KeywordChannelRelevanceEstimator(client_pool, {'message': 2})
+        self.assertEqual(await estimator.get_scored_relevance('a'), (10, 5))
+        with self.assertLogs('main_logger', level='ERROR'):
+            self.assertEqual(await estimator.get_scored_relevance('unknown'), (0, 0))
+            self.assertEqual(await estimator.get_relevance('unknown'), 0)
+
+    def test_keyword_estimator_key_depends_on_keywords(self):
+        first = KeywordChannelRelevanceEstimator(ClientPool(), {'a': 1, 'b': 2})
+        same = KeywordChannelRelevanceEstimator(ClientPool(), {'b': 2, 'a': 1})
+        other = KeywordChannelRelevanceEstimator(ClientPool(), {'a': 1, 'b': 3})
+        self.assertEqual(first.get_key(), same.get_key())
+        self.assertNotEqual(first.get_key(), other.get_key())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from src.application.analytics import SamplingChannelRelevanceEstimator, wilson_interval
+from src.application.client import ClientPool, Client
+from test.utils import HistoryTelegramApiMock, async_test
+
+
+class TestSamplingChannelRelevanceEstimator(unittest.TestCase):
+
+    async def create_estimator(self, tg_api, **kwargs):
+        client_pool = ClientPool()
+        client_pool.add_client(Client('client_0', tg_api))
+        await client_pool.activate_clients()
+        return SamplingChannelRelevanceEstimator(client_pool, ['economy'], **kwargs)
+
+    def test_wilson_interval(self):
+        lower, upper = wilson_interval(5, 10)
+        self.assertAlmostEqual(lower, 0.2366, places=4)
+        self.assertAlmostEqual(upper, 0.7634, places=4)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+    @async_test
+    async def test_obviously_relevant_channel_stops_early(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, texts={i: 'Economy news' for i in range(1, 1001)})
+        estimator = await self.create_estimator(tg_api)
+        estimate = await estimator.get_estimate('channel_1')
+        self.assertEqual(len(tg_api.requests), 2)
+        self.assertEqual(estimate.rate, 1)
+        self.assertEqual(estimate.sample_size, 20)
+        self.assertTrue(estimate.is_relevant)
+        self.assertGreater(estimate.lower, 0.1)
+
+    @async_test
+    async def test_irrelevant_channel_stops_when_upper_bound_is_below_threshold(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000})
+        estimator = await self.create_estimator(tg_api)
+        estimate = await estimator.get_estimate('channel_1')
+        self.assertEqual(len(tg_api.requests), 4)
+        self.assertFalse(estimate.is_relevant)
+        self.assertLess(estimate.upper, 0.1)
+        self.assertEqual(await estimator.get_relevance('channel_1'), 0)
+
+    @async_test
+    async def test_pages_are_spread_over_history(self):
+        texts = {i: 'economy' for i in range(1, 1001) if i % 10 == 0}
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, texts=texts)
+        estimator = await self.create_estimator(tg_api)
+        estimate = await estimator.get_estimate('channel_1')
+        # Rate equals the threshold, so sampling does not stop early.
+        self.assertIsNone(estimate.is_relevant)
+        self.assertEqual(estimate.sample_size, 100)
+        self.assertEqual(estimate.rate, 0.1)
+        offsets = [x[2] for x in tg_api.requests]
+        self.assertEqual(sorted(offsets), [0, 101, 201, 301, 401, 501, 601, 701, 801, 901])
+        # Each prefix of pages covers the history evenly.
+        self.assertEqual(offsets[:5], [0, 201, 601, 801, 401])
+
+    @async_test
+    async def test_bursty_channel_is_not_judged_by_latest_messages(self):
+        texts = {i: 'economy' for i in range(1, 500)}
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, texts=texts)
+        estimator = await self.create_estimator(tg_api)
+        estimate = await estimator.get_estimate('channel_1')
+        self.assertTrue(estimate.is_relevant)
+        self.assertGreater(estimate.rate, 0.1)
+
+    @async_test
+    async def test_short_channel_is_fetched_once(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 5}, texts={1: 'economy'})
+        estimator = await self.create_estimator(tg_api)
+        estimate = await estimator.get_estimate('channel_1')
+        self.assertEqual(len(tg_api.requests), 1)
+        self.assertEqual(estimate.rate, 0.2)
+        self.assertEqual(estimate.sample_size, 5)
+        self.assertIsNone(estimate.is_relevant)
+
+    @async_test
+    async def test_sampling_does_not_stop_before_min_messages(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, texts={i: 'Economy news' for i in range(1, 1001)})
+        estimator = await self.create_estimator(tg_api, min_messages=50)
+        estimate = await estimator.get_estimate('channel_1')
+        # Ten relevant messages already put the interval above the threshold.
+        self.assertGreater(wilson_interval(10, 10)[0], 0.1)
+        self.assertEqual(estimate.sample_size, 50)
+        self.assertTrue(estimate.is_relevant)
+
+    @async_test
+    async def test_sampling_stops_at_max_messages(self):
+        texts = {i: 'economy' for i in range(1, 1001) if i % 10 == 0}
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, texts=texts)
+        estimator = await self.create_estimator(tg_api, max_messages=40)
+        estimate = await estimator.get_estimate('channel_1')
+        self.assertEqual(len(tg_api.requests), 4)
+        self.assertEqual(estimate.sample_size, 40)
+        self.assertIsNone(estimate.is_relevant)
+        lower, upper = wilson_interval(4, 40)
+        self.assertEqual((estimate.lower, estimate.upper), (lower, upper))
+
+    def test_strata_order(self):
+        self.assertEqual(SamplingChannelRelevanceEstimator._get_strata_order(8), [4, 2, 6, 1, 5, 3, 7])
+        self.assertEqual(SamplingChannelRelevanceEstimator._get_strata_order(1), [])
+        # Every prefix of the order keeps the strata apart.
+        order = SamplingChannelRelevanceEstimator._get_strata_order(16)
+        self.assertEqual(sorted(order[:3]), [4, 8, 12])
+
+    @async_test
+    async def test_failed_channel_has_zero_relevance(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, fail_requests={1})
+        estimator = await self.create_estimator(tg_api)
+        with self.assertLogs('main_logger', level='ERROR'):
+            self.assertEqual(await estimator.get_scored_relevance('channel_1'), (0, 0))
+        self.assertEqual(await estimator.get_relevance('unknown'), 0)
+        with self.assertRaises(Exception):
+            await estimator.get_estimate('unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
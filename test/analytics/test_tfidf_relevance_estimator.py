@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+from src.application.analytics import TfidfChannelRelevanceEstimator
+from src.application.client import ClientPool, Client
+from test.utils import HistoryTelegramApiMock, async_test
+
+
+class ConcurrencyTelegramApiMock(HistoryTelegramApiMock):
+    """
+    Counts requests which are in progress at the same time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_progress = 0
+        self.max_in_progress = 0
+
+    async def get_messages(self, *args, **kwargs):
+        self.in_progress += 1
+        self.max_in_progress = max(self.max_in_progress, self.in_progress)
+        try:
+            await asyncio.sleep(0.001)
+            return await super().get_messages(*args, **kwargs)
+        finally:
+            self.in_progress -= 1
+
+
+class TestTfidfChannelRelevanceEstimator(unittest.TestCase):
+
+    async def create_estimator(self, tg_api, query, client_count=1):
+        client_pool = ClientPool()
+        for i in range(client_count):
+            client_pool.add_client(Client(f'client_{i}', tg_api))
+        await client_pool.activate_clients()
+        return TfidfChannelRelevanceEstimator(client_pool, query, message_count=10)
+
+    def test_query_terms_match_token_prefixes(self):
+        estimator = TfidfChannelRelevanceEstimator(ClientPool(), {'Эконом': 1, 'ёлк': 1}, normalize_yo=True)
+        scores = estimator.score_documents([['Экономика и экономисты'], ['Елка'], ['Погода'], []])
+        self.assertGreater(scores[0], 0)
+        self.assertGreater(scores[1], 0)
+        self.assertEqual(scores[2:], [0, 0])
+
+    def test_score_is_cosine_with_query(self):
+        estimator = TfidfChannelRelevanceEstimator(ClientPool(), {'economy': 1})
+        # Single term document has unit vector of this term.
+        self.assertAlmostEqual(estimator.score_documents([['economy economy']])[0], 1)
+        # Two terms with equal weights in a new corpus.
+        estimator = TfidfChannelRelevanceEstimator(ClientPool(), {'economy': 1})
+        self.assertAlmostEqual(estimator.score_documents([['economy', 'weather']])[0], 2 ** -0.5)
+
+    def test_common_terms_weigh_less(self):
+        estimator = TfidfChannelRelevanceEstimator(ClientPool(), {'economy': 1, 'crypto': 1})
+        estimator.add_documents({'a': ['economy news'], 'b': ['economy today'], 'c': ['economy again']})
+        common, rare = estimator.score_documents([['economy', 'market'], ['crypto', 'market']])
+        self.assertLess(common, rare)
+
+    @async_test
+    async def test_many_channels_are_scored_at_once(self):
+        texts = {i: 'Экономика растет' for i in range(1, 4)}
+        tg_api = HistoryTelegramApiMock({'a': 3, 'b': 20, 'c': 0}, texts=texts)
+        estimator = await self.create_estimator(tg_api, {'эконом': 2})
+        scores = await estimator.get_relevance_many(['b', 'a', 'c'])
+        self.assertEqual([x[0] for x in tg_api.requests], ['b', 'a', 'c'])
+        self.assertEqual([x[1] for x in tg_api.requests], [10, 10, 10])
+        self.assertEqual(scores[2], 0)
+        self.assertGreater(scores[1], scores[0])
+        self.assertEqual(await estimator.get_relevance('c'), 0)
+        self.assertEqual((await estimator.get_scored_relevance('a'))[1], 3)
+
+    @async_test
+    async def test_channels_are_added_to_corpus_once(self):
+        texts = {1: 'Экономика растет', 2: 'Погода'}
+        tg_api = HistoryTelegramApiMock({'a': 2, 'b': 1, 'c': 1}, texts=texts)
+        estimator = await self.create_estimator(tg_api, {'эконом': 1})
+        await estimator.fit(['b', 'c'])
+        self.assertEqual(estimator.get_corpus_size(), 2)
+        first = await estimator.get_relevance('a')
+        self.assertEqual(await estimator.get_relevance('a'), first)
+        self.assertEqual(await estimator.get_relevance_many(['a', 'b']), [first, await estimator.get_relevance('b')])
+        self.assertEqual(estimator.get_corpus_size(), 3)
+
+    @async_test
+    async def test_concurrent_requests_are_limited_by_clients(self):
+        tg_api = ConcurrencyTelegramApiMock({f'channel_{i}': 3 for i in range(20)})
+        estimator = await self.create_estimator(tg_api, {'message': 1}, client_count=3)
+        scores = await estimator.get_relevance_many([f'channel_{i}' for i in range(20)])
+        self.assertEqual(len(scores), 20)
+        self.assertEqual(len(tg_api.requests), 20)
+        self.assertEqual(tg_api.max_in_progress, 3)
+
+    @async_test
+    async def test_failed_channels_have_zero_relevance(self):
+        texts = {1: 'Экономика растет'}
+        tg_api = HistoryTelegramApiMock({'a': 1}, texts=texts)
+        estimator = await self.create_estimator(tg_api, {'эконом': 1})
+        with self.assertLogs('main_logger', level='ERROR'):
+            scores = await estimator.get_relevance_many(['unknown', 'a'])
+        self.assertEqual(scores[0], 0)
+        self.assertGreater(scores[1], 0)
+        self.assertEqual(estimator.get_corpus_size(), 1)
+        with self.assertLogs('main_logger', level='ERROR'):
+            self.assertEqual(await estimator.get_scored_relevance('unknown'), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
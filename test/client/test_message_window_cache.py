@@ -0,0 +1,51 @@
+import unittest
+from src.application.client import ClientPool, Client, MessageWindowCache
+from test.utils import HistoryTelegramApiMock, async_test
+
+
+class TestMessageWindowCache(unittest.TestCase):
+
+    async def create_cache(self, tg_api, max_messages=1000):
+        client_pool = ClientPool()
+        client_pool.add_client(Client('client_0', tg_api))
+        await client_pool.activate_clients()
+        return MessageWindowCache(client_pool, max_messages)
+
+    @async_test
+    async def test_only_missing_messages_are_fetched(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 300})
+        cache = await self.create_cache(tg_api)
+        first = await cache.get_latest_messages('channel_1', 100)
+        second = await cache.get_latest_messages('channel_1', 250)
+        third = await cache.get_latest_messages('channel_1', 50)
+        self.assertEqual([x.message_id for x in first], list(range(300, 200, -1)))
+        self.assertEqual([x.message_id for x in second], list(range(300, 50, -1)))
+        self.assertEqual([x.message_id for x in third], list(range(300, 250, -1)))
+        self.assertEqual([(x[1], x[2]) for x in tg_api.requests], [(100, 0), (150, 201)])
+        self.assertEqual(cache.get_hit_count(), 1)
+
+    @async_test
+    async def test_short_channel_is_not_fetched_again(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 30})
+        cache = await self.create_cache(tg_api)
+        await cache.get_latest_messages('channel_1', 100)
+        messages = await cache.get_latest_messages('channel_1', 1000)
+        self.assertEqual(len(messages), 30)
+        self.assertEqual(len(tg_api.requests), 1)
+
+    @async_test
+    async def test_least_recently_used_channels_are_evicted(self):
+        tg_api = HistoryTelegramApiMock({'channel_1': 100, 'channel_2': 100, 'channel_3': 100})
+        cache = await self.create_cache(tg_api, max_messages=150)
+        await cache.get_latest_messages('channel_1', 50)
+        await cache.get_latest_messages('channel_2', 50)
+        await cache.get_latest_messages('channel_1', 10)
+        await cache.get_latest_messages('channel_3', 60)
+        self.assertEqual(cache.get_message_count(), 110)
+        await cache.get_latest_messages('channel_1', 10)
+        await cache.get_latest_messages('channel_2', 10)
+        self.assertEqual([x[0] for x in tg_api.requests], ['channel_1', 'channel_2', 'channel_3', 'channel_2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
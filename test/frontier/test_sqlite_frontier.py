@@ -0,0 +1,75 @@
+import os
+import unittest
+import tempfile
+from src.infrastructure.frontier import SqliteSharedFrontier, FrontierStatus
+
+
+class TestSqliteSharedFrontier(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'frontier.db')
+        self.frontier = SqliteSharedFrontier(self.path)
+
+    def tearDown(self):
+        self.frontier.close()
+        self.dir.cleanup()
+
+    def test_add_ignores_known_channels(self):
+        self.assertEqual(self.frontier.add(['a', 'b']), ['a', 'b'])
+        self.assertEqual(self.frontier.add(['b', 'c']), ['c'])
+        self.assertEqual(self.frontier.get_counts(), {FrontierStatus.NEW: 3})
+        self.assertEqual(self.frontier.get_size(), 3)
+
+    def test_new_channels_are_claimed_first_then_most_relevant(self):
+        self.frontier.add(['a', 'b', 'c', 'd'])
+        for channel_id, relevance in [('a', 1), ('b', 3), ('c', 2)]:
+            self.frontier.claim('w', 1, 60)
+            self.frontier.complete('w', channel_id, FrontierStatus.QUEUED, relevance)
+        tasks = self.frontier.claim('w', 10, 60)
+        self.assertEqual([(x.channel_id, x.status) for x in tasks], [
+            ('d', FrontierStatus.NEW),
+            ('b', FrontierStatus.QUEUED),
+            ('c', FrontierStatus.QUEUED),
+            ('a', FrontierStatus.QUEUED),
+        ])
+        self.assertEqual(tasks[1].relevance, 3)
+
+    def test_relevant_queued_channels_are_not_starved_by_new_ones(self):
+        self.frontier.add(['a'])
+        self.frontier.claim('w', 1, 60)
+        self.frontier.complete('w', 'a', FrontierStatus.QUEUED, 2)
+        self.frontier.add(['b', 'c'], priority=1)
+        self.frontier.add(['d'], priority=3)
+        tasks = self.frontier.claim('w', 10, 60)
+        # New channels take the relevance of the channel where they were found.
+        self.assertEqual([(x.channel_id, x.status) for x in tasks], [
+            ('d', FrontierStatus.NEW),
+            ('a', FrontierStatus.QUEUED),
+            ('b', FrontierStatus.NEW),
+            ('c', FrontierStatus.NEW),
+        ])
+
+    def test_claimed_channels_are_not_given_to_other_workers(self):
+        other = SqliteSharedFrontier(self.path)
+        self.frontier.add(['a', 'b'])
+        self.assertEqual([x.channel_id for x in self.frontier.claim('w1', 1, 60)], ['a'])
+        self.assertEqual([x.channel_id for x in other.claim('w2', 5, 60)], ['b'])
+        self.assertEqual(other.claim('w2', 5, 60), [])
+        self.assertFalse(other.is_done())
+        other.close()
+
+    def test_expired_lease_is_reclaimed_and_old_result_is_rejected(self):
+        self.frontier.add(['a'])
+        self.frontier.claim('crashed', 1, -1)
+        self.assertEqual(self.frontier.renew('w', ['a'], 60), [])
+        self.assertEqual([x.channel_id for x in self.frontier.claim('w', 1, 60)], ['a'])
+        self.assertFalse(self.frontier.complete('crashed', 'a', FrontierStatus.ERROR))
+        self.assertEqual(self.frontier.renew('w', ['a'], 60), ['a'])
+        self.assertTrue(self.frontier.complete('w', 'a', FrontierStatus.FINISHED))
+        self.assertEqual(self.frontier.get_counts(), {FrontierStatus.FINISHED: 1})
+        self.assertTrue(self.frontier.is_done())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import unittest
+import tempfile
+from datetime import datetime, timezone
+from src.infrastructure.scores import SqliteRelevanceScoreStore, RelevanceScore
+
+
+class TestSqliteRelevanceScoreStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'scores.db')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_store_keeps_latest_score(self):
+        store = SqliteRelevanceScoreStore(self.path)
+        scored_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        store.put(RelevanceScore('a', 'key', 1.5, 10, scored_at))
+        store.put(RelevanceScore('a', 'key', 2.5, None, scored_at))
+        self.assertEqual(store.get('a', 'key'), RelevanceScore('a', 'key', 2.5, None, scored_at))
+        self.assertIsNone(store.get('a', 'other'))
+        self.assertIsNone(store.get('b', 'key'))
+        store.close()
+
+    def test_scores_are_kept_between_connections(self):
+        scored_at = datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)
+        store = SqliteRelevanceScoreStore(self.path)
+        store.put(RelevanceScore('a', 'key', 0.5, 20, scored_at))
+        store.put(RelevanceScore('a', 'other', 1, 30, scored_at))
+        store.close()
+        store = SqliteRelevanceScoreStore(self.path)
+        score = store.get('a', 'key')
+        self.assertEqual(score, RelevanceScore('a', 'key', 0.5, 20, scored_at))
+        self.assertEqual(score.scored_at.tzinfo, timezone.utc)
+        self.assertEqual(store.get('a', 'other').relevance, 1)
+        store.close()
+
+    def test_stores_share_database_file(self):
+        first = SqliteRelevanceScoreStore(self.path)
+        second = SqliteRelevanceScoreStore(self.path)
+        first.put(RelevanceScore('a', 'key', 1, 10, datetime.now(timezone.utc)))
+        self.assertEqual(second.get('a', 'key').relevance, 1)
+        first.close()
+        second.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+import unittest
+import asyncio
+import tempfile
+from src.infrastructure.storage import TsvStorage
+from src.application.search import ChannelMessagesSearch, KeywordMessageFilter, AllMessageFilter
+from src.application.client import ClientPool, Client, RateController
+from test.utils import HistoryTelegramApiMock, async_test, MemoryStorage
+
+
+class QueuedTelegramApiMock(HistoryTelegramApiMock):
+    """
+    Waits for the client before each request and reports a fast request.
+    """
+
+    async def get_message_batch(self, *args, **kwargs):
+        await asyncio.sleep(0.02)
+        batch = await super().get_message_batch(*args, **kwargs)
+        batch.request_seconds = 0.001
+        return batch
+
+
+class TestChannelMessagesPipeline(unittest.TestCase):
+
+    async def create_search(self, tg_api, storage, client_count=3, limit=1000, batch_size=10,
+                            min_date='2024-01-01', max_date='2025-01-01', partitions=None,
+                            filter=AllMessageFilter(), server_search=False, adaptive_batch_size=False):
+        client_pool = ClientPool()
+        for i in range(client_count):
+            client_pool.add_client(Client(f'client_{i}', tg_api))
+        await client_pool.activate_clients()
+        self.client_pool = client_pool
+        return ChannelMessagesSearch(
+            client_pool=client_pool,
+            storage=storage,
+            channel_id='channel_1',
+            max_message_count=limit,
+            message_batch_size=batch_size,
+            min_date=min_date,
+            max_date=max_date,
+            partitions=partitions,
+            filter=filter,
+            server_search=server_search,
+            adaptive_batch_size=adaptive_batch_size
+        )
+
+    @async_test
+    async def test_all_messages_are_saved_once(self):
+        storage = MemoryStorage()
+        search = await self.create_search(HistoryTelegramApiMock({'channel_1': 95}), storage)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), list(range(1, 96)))
+        self.assertEqual(search.get_message_count(), 95)
+
+    @async_test
+    async def test_failed_pages_are_retried(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 95}, fail_requests={1, 4, 5})
+        search = await self.create_search(tg_api, storage)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), list(range(1, 96)))
+        self.assertEqual(len([x for x in storage.items if x.get_type() == 'save_message_error']), 3)
+
+    @async_test
+    async def test_limit_is_equal_to_message_count(self):
+        storage = MemoryStorage()
+        search = await self.create_search(HistoryTelegramApiMock({'channel_1': 5}), storage, limit=5, batch_size=5)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), [1, 2, 3, 4, 5])
+
+    @async_test
+    async def test_limit_is_less_than_message_count(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 5})
+        search = await self.create_search(tg_api, storage, client_count=1, limit=3, batch_size=3)
+        await search.start()
+        # The newest messages are downloaded first.
+        self.assertEqual(sorted(storage.get_message_ids()), [3, 4, 5])
+        self.assertEqual(len(tg_api.requests), 1)
+
+    @async_test
+    async def test_limit_is_more_than_message_count(self):
+        storage = MemoryStorage()
+        search = await self.create_search(HistoryTelegramApiMock({'channel_1': 5}), storage, limit=6, batch_size=6)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), [1, 2, 3, 4, 5])
+        self.assertEqual(search.get_message_count(), 5)
+
+    @async_test
+    async def test_batch_size_is_used(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 5})
+        search = await self.create_search(tg_api, storage, client_count=1, limit=5, batch_size=2)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), [1, 2, 3, 4, 5])
+        self.assertEqual([x[1] for x in tg_api.requests], [2, 2, 2])
+
+    @async_test
+    async def test_do_not_fall_on_api_exception(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 5}, fail_requests={0, 1, 2})
+        search = await self.create_search(tg_api, storage, client_count=1, limit=6, batch_size=6)
+        await search.start()
+        # Page is skipped after the last attempt, each error is saved.
+        errors = [x.get_row() for x in storage.items if x.get_type() == 'save_message_error']
+        self.assertEqual(errors, [('channel_1', 6, 0, 0, 'GET_MESSAGES error')] * 3)
+        self.assertEqual(storage.get_message_ids(), [])
+
+    @async_test
+    async def test_pages_are_requested_relative_to_completed_prefix(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 100})
+        search = await self.create_search(tg_api, storage, client_count=2)
+        await search.start()
+        add_offsets = [x[3] for x in tg_api.requests]
+        self.assertLessEqual(max(add_offsets), 20)
+
+    @async_test
+    async def test_min_date_and_limit(self):
+        storage = MemoryStorage()
+        search = await self.create_search(
+            HistoryTelegramApiMock({'channel_1': 95}),
+            storage,
+            min_date='2024-01-03'
+        )
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), list(range(48, 96)))
+
+        storage = MemoryStorage()
+        search = await self.create_search(HistoryTelegramApiMock({'channel_1': 95}), storage, limit=30)
+        await search.start()
+        self.assertGreaterEqual(len(storage.get_message_ids()), 30)
+        self.assertLess(len(storage.get_message_ids()), 95)
+
+    @async_test
+    async def test_id_range_partitions(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 95})
+        search = await self.create_search(
+            tg_api,
+            storage,
+            partitions=4,
+            min_date='2024-01-02',
+            max_date='2024-01-04'
+        )
+        await search.start()
+        # Messages published from 2024-01-02 to 2024-01-04 have ids from 24 to 71.
+        self.assertEqual(sorted(storage.get_message_ids()), list(range(24, 72)))
+        min_ids = {x[5] for x in tg_api.requests[2:]}
+        self.assertEqual(len(min_ids), 4)
+
+    @async_test
+    async def test_keywords_are_searched_by_server(self):
+        storage = MemoryStorage()
+        # Keyword inside a word of message 70 is matched by the filter, but not found by server search.
+        texts = {5: 'Цифровой мир', 17: 'Устойчивое цифровое развитие', 40: 'Другое', 60: 'устойчиво',
+                 70: 'Нецифровой мир'}
+        tg_api = HistoryTelegramApiMock({'channel_1': 95}, texts=texts)
+        search = await self.create_search(
+            tg_api, storage, batch_size=2, partitions=2,
+            filter=KeywordMessageFilter(['цифров', 'устойчив'], server_search=True), server_search=True
+        )
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), [5, 17, 60])
+        self.assertEqual(search.get_message_count(), 3)
+        history_requests = [x for x in tg_api.requests if x[1] > 1]
+        self.assertTrue(all(x[6] in ('цифров', 'устойчив') for x in history_requests))
+        self.assertLess(len(history_requests), 10)
+
+    @async_test
+    async def test_keywords_are_matched_by_client_unless_filter_allows_server_search(self):
+        storage = MemoryStorage()
+        texts = {5: 'Цифровой мир', 40: 'Другое', 70: 'Нецифровой мир'}
+        tg_api = HistoryTelegramApiMock({'channel_1': 95}, texts=texts)
+        search = await self.create_search(
+            tg_api, storage, filter=KeywordMessageFilter(['цифров']), server_search=True
+        )
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), [5, 70])
+        self.assertTrue(all(x[6] is None for x in tg_api.requests))
+
+
+    @async_test
+    async def test_partitions_are_resumed_from_saved_cursors(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            tg_api = HistoryTelegramApiMock({'channel_1': 95})
+            search = await self.create_search(tg_api, TsvStorage(out_dir), partitions=3, limit=30, batch_size=5)
+            await search.start()
+            first_ids = set(int(x) for b in TsvStorage(out_dir).scan('message', ['message_id']) for x in b.column('message_id'))
+            # Upper segments are partly downloaded, so ids above the oldest saved one are missing.
+            self.assertLess(min(first_ids), 95 - len(first_ids))
+            search = await self.create_search(tg_api, TsvStorage(out_dir), partitions=3, batch_size=5)
+            await search.start()
+            ids = [int(x) for b in TsvStorage(out_dir).scan('message', ['message_id']) for x in b.column('message_id')]
+            self.assertEqual(set(ids), set(range(1, 96)))
+            # Only pages completed after the cursor of the first run can be downloaded twice.
+            self.assertLessEqual(len(ids) - 95, 3 * 3 * 5)
+            # Finished segments are not searched again.
+            tg_api.requests.clear()
+            search = await self.create_search(tg_api, TsvStorage(out_dir), partitions=3, batch_size=5)
+            await search.start()
+            self.assertEqual(tg_api.requests, [])
+
+    @async_test
+    async def test_adaptive_batch_size(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'channel_1': 1000}, flood_requests={2, 3, 4, 5})
+        search = await self.create_search(tg_api, storage, client_count=1, adaptive_batch_size=True)
+        self.client_pool.get().rate_controller = RateController(interval_step=0.001)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), list(range(1, 1001)))
+        # Flood waits are retried without saving errors and cut the size of next pages.
+        # The page which hit a flood wait is split by the reduced size too.
+        self.assertEqual(len([x for x in storage.items if x.get_type() == 'save_message_error']), 0)
+        sizes = [x[1] for x in tg_api.requests]
+        self.assertEqual(sizes[:10], [50, 60, 70, 35, 17, 10, 10, 7, 17, 1])
+        self.assertEqual(max(sizes), 100)
+
+    @async_test
+    async def test_adaptive_batch_size_ignores_waiting_for_client(self):
+        storage = MemoryStorage()
+        tg_api = QueuedTelegramApiMock({'channel_1': 300})
+        search = await self.create_search(tg_api, storage, client_count=1, adaptive_batch_size=True)
+        self.client_pool.get().rate_controller = RateController(target_latency=0.01)
+        await search.start()
+        self.assertEqual(sorted(storage.get_message_ids()), list(range(1, 301)))
+        # Requests wait longer than the target latency, but only the reported request time is counted.
+        self.assertEqual([x[1] for x in tg_api.requests], [50, 60, 70, 80, 90])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import asyncio
+import unittest
+import tempfile
+from src.application.search import DistributedSnowballChannelSearch
+from src.application.client import ClientPool, Client
+from src.infrastructure.frontier import SqliteSharedFrontier, FrontierStatus
+from test.utils import HistoryTelegramApiMock, async_test, MemoryStorage
+from .test_snowball_channel_search import FixedRelevanceEstimator
+
+
+class FlakyFrontier(SqliteSharedFrontier):
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.renew_calls = 0
+
+    def renew(self, worker_id, channel_ids, lease_seconds):
+        self.renew_calls += 1
+        if self.renew_calls == 1:
+            raise Exception('Connection lost')
+        return super().renew(worker_id, channel_ids, lease_seconds)
+
+
+class TestDistributedSnowballChannelSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'frontier.db')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def create_api(self):
+        return HistoryTelegramApiMock(
+            {'a': 5, 'b': 5, 'c': 5, 'd': 5, 'e': 5},
+            forwards={'a': ['b', 'c'], 'b': ['d'], 'c': ['e', 'a'], 'd': [], 'e': []}
+        )
+
+    async def create_search(self, tg_api, storage, worker_id, start_channels, max_channels_count=100,
+                            frontier=None, lease_seconds=300):
+        client_pool = ClientPool()
+        client_pool.add_client(Client(f'client_{worker_id}', tg_api))
+        await client_pool.activate_clients()
+        return DistributedSnowballChannelSearch(
+            client_pool=client_pool,
+            storage=storage,
+            relevance_estimator=FixedRelevanceEstimator({'b': 1, 'c': 2}),
+            frontier=frontier or SqliteSharedFrontier(self.path),
+            start_channels=start_channels,
+            max_channels_count=max_channels_count,
+            number_of_messages_for_ancestor_search=10,
+            worker_id=worker_id,
+            lease_seconds=lease_seconds,
+            poll_interval=0.01
+        )
+
+    @async_test
+    async def test_workers_share_channels(self):
+        tg_api = self.create_api()
+        first_storage, second_storage = MemoryStorage(), MemoryStorage()
+        first = await self.create_search(tg_api, first_storage, 'w1', ['a'])
+        second = await self.create_search(tg_api, second_storage, 'w2', [])
+        await asyncio.gather(first.start(), second.start())
+        # Each channel is searched once by one of the workers.
+        self.assertEqual(sorted(x[0] for x in tg_api.requests), ['a', 'b', 'c', 'd', 'e'])
+        finished = [
+            x.get_value()['channel_id'] for x in first_storage.items + second_storage.items
+            if x.get_type() == 'channel_FINISHED'
+        ]
+        self.assertEqual(sorted(finished), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(SqliteSharedFrontier(self.path).get_counts(), {FrontierStatus.FINISHED: 5})
+
+    @async_test
+    async def test_channels_are_processed_by_relevance(self):
+        storage = MemoryStorage()
+        search = await self.create_search(self.create_api(), storage, 'w', ['a'])
+        await search.start()
+        steps = {'channel_QUEUED_FOR_ANCESTORS_SEARCH': 'estimated', 'channel_FINISHED': 'searched'}
+        processed = [(steps[x.get_type()], x.get_value()['channel_id']) for x in storage.items if x.get_type() in steps]
+        # Ancestors of b are searched before relevance of c, which was found in a less relevant channel.
+        self.assertEqual(processed, [
+            ('estimated', 'a'), ('searched', 'a'), ('estimated', 'b'), ('searched', 'b'), ('estimated', 'd'),
+            ('estimated', 'c'), ('searched', 'c'), ('estimated', 'e'), ('searched', 'd'), ('searched', 'e'),
+        ])
+
+    @async_test
+    async def test_channels_of_crashed_worker_are_reclaimed(self):
+        frontier = SqliteSharedFrontier(self.path)
+        frontier.add(['a'])
+        frontier.claim('crashed', 1, lease_seconds=-1)
+        tg_api = self.create_api()
+        search = await self.create_search(tg_api, MemoryStorage(), 'w', [])
+        channels = await search.start()
+        self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(channels['c'].relevance, 2)
+
+    @async_test
+    async def test_workers_stop_at_max_channels_count(self):
+        tg_api = self.create_api()
+        search = await self.create_search(tg_api, MemoryStorage(), 'w', ['a'], max_channels_count=3)
+        await search.start()
+        self.assertEqual(SqliteSharedFrontier(self.path).get_size(), 3)
+
+    @async_test
+    async def test_leases_are_renewed_after_failed_renewal(self):
+        frontier = FlakyFrontier(self.path)
+        frontier.add(['a'])
+        frontier.claim('w', 1, lease_seconds=0.2)
+        search = await self.create_search(self.create_api(), MemoryStorage(), 'w', [],
+                                          frontier=frontier, lease_seconds=0.2)
+        search._held.add('a')
+        renewal = asyncio.create_task(search._renew_leases())
+        await asyncio.sleep(0.5)
+        renewal.cancel()
+        self.assertGreater(frontier.renew_calls, 2)
+        self.assertEqual(frontier.claim('other', 1, lease_seconds=1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from src.application.search.history_pages import HistoryPageTracker
+
+
+class TestHistoryPageTracker(unittest.TestCase):
+
+    def test_pages_are_claimed_in_order(self):
+        tracker = HistoryPageTracker(offset_id=100)
+        pages = [tracker.claim(10) for _ in range(3)]
+        self.assertEqual([x.start for x in pages], [0, 10, 20])
+        self.assertEqual([x.add_offset for x in pages], [0, 10, 20])
+        tracker.complete(pages[0], count=10, last_message_id=90, is_last=False)
+        self.assertEqual(tracker.get_offset_id(), 90)
+        # Next pages are requested relative to the completed prefix.
+        self.assertEqual((tracker.claim(10).offset_id, tracker.claim(10).add_offset), (90, 30))
+
+    def test_failed_page_is_split_by_max_size(self):
+        tracker = HistoryPageTracker(offset_id=100)
+        page = tracker.claim(10)
+        tracker.fail(page, is_attempt=False, max_size=4)
+        self.assertEqual([(x.start, x.size) for x in [tracker.claim(10) for _ in range(3)]], [(0, 4), (4, 4), (8, 2)])
+        self.assertEqual(tracker.claim(10).start, 10)
+
+    def test_pages_failed_after_stop_are_not_claimed(self):
+        tracker = HistoryPageTracker(offset_id=100)
+        first, second, third = [tracker.claim(10) for _ in range(3)]
+        # The first page reaches the end of the history range.
+        tracker.complete(first, count=5, last_message_id=95, is_last=True)
+        tracker.fail(third)
+        tracker.fail(second, max_size=5)
+        self.assertIsNone(tracker.claim(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+from datetime import datetime, timezone
+from src.infrastructure.telegram import MessageBatch, MessageResponse
+from src.application.search import MessageFilter, AllMessageFilter, KeywordMessageFilter, \
+    DateRangeMessageFilter, NumericMessageFilter, ForwardedMessageFilter, AndMessageFilter
+
+
+def message(message_id, text='text', views=10, forwards=None, fwd_from=None, day=1):
+    return MessageResponse(
+        message_id=message_id,
+        text=text,
+        channel_id='channel_1',
+        channel_fwd_from_id=fwd_from,
+        views=views,
+        forwards=forwards,
+        datetime=datetime(2024, 1, day, 12, tzinfo=timezone.utc),
+        reactions=[],
+        replies_count=0
+    )
+
+
+class CountingFilter(MessageFilter):
+
+    def __init__(self):
+        self.count = 0
+
+    def match(self, message):
+        self.count += 1
+        return True
+
+
+class TestMessageFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = [
+            message(1, 'цифровой мир', views=100, day=1),
+            message(2, 'другое', views=None, fwd_from='channel_2', day=2),
+            message(3, 'Цифровое', views=5, forwards=3, day=3),
+            message(4, None, views=500, fwd_from='channel_3', day=4),
+        ]
+        self.batch = MessageBatch.from_messages(self.messages)
+
+    def test_batch_round_trip(self):
+        self.assertEqual(self.batch.to_messages(), self.messages)
+        self.assertEqual(self.batch.take(np.array([False, True, False, True])).to_messages(),
+                         [self.messages[1], self.messages[3]])
+
+    def test_predicates(self):
+        date_filter = DateRangeMessageFilter(
+            datetime(2024, 1, 2, tzinfo=timezone.utc),
+            datetime(2024, 1, 3, 23, tzinfo=timezone.utc)
+        )
+        self.assertEqual(date_filter.match_batch(self.batch).tolist(), [False, True, True, False])
+        self.assertEqual(NumericMessageFilter('views', min_value=50).match_batch(self.batch).tolist(),
+                         [True, False, False, True])
+        self.assertEqual(NumericMessageFilter('views', max_value=100).match_batch(self.batch).tolist(),
+                         [True, False, True, False])
+        self.assertEqual(ForwardedMessageFilter().match_batch(self.batch).tolist(), [False, True, False, True])
+        self.assertEqual(ForwardedMessageFilter(False).match_batch(self.batch).tolist(), [True, False, True, False])
+        self.assertEqual(KeywordMessageFilter(['цифров']).match_batch(self.batch).tolist(), [True, False, True, False])
+        self.assertEqual(AllMessageFilter().match_batch(self.batch).tolist(), [True] * 4)
+
+    def test_single_message_matches_as_batch(self):
+        filter = NumericMessageFilter('views', min_value=50)
+        self.assertEqual([filter.match(x) for x in self.messages], [True, False, False, True])
+
+    def test_unknown_column(self):
+        with self.assertRaises(Exception):
+            NumericMessageFilter('likes', min_value=1)
+
+    def test_and_evaluates_cheap_filters_first(self):
+        counting = CountingFilter()
+        filter = AndMessageFilter([counting, NumericMessageFilter('views', min_value=50)])
+        self.assertEqual(filter.match_batch(self.batch).tolist(), [True, False, False, True])
+        self.assertEqual(counting.count, 2)
+
+    def test_and_search_queries(self):
+        filter = AndMessageFilter([KeywordMessageFilter(['Цифров'], server_search=True), ForwardedMessageFilter()])
+        self.assertEqual(filter.get_search_queries(), ['цифров'])
+        self.assertIsNone(AndMessageFilter([ForwardedMessageFilter()]).get_search_queries())
+
+
+if __name__ == '__main__':
+    unittest.main()
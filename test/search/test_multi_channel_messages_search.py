@@ -0,0 +1,101 @@
+import unittest
+from src.application.search import MultiChannelMessagesSearch
+from src.application.client import ClientPool, Client
+from test.utils import HistoryTelegramApiMock, async_test, MemoryStorage
+
+
+class TestMultiChannelMessagesSearch(unittest.TestCase):
+
+    async def create_search(self, tg_api, storage, channel_ids, client_count=2, **kwargs):
+        client_pool = ClientPool()
+        for i in range(client_count):
+            client_pool.add_client(Client(f'client_{i}', tg_api))
+        await client_pool.activate_clients()
+        return MultiChannelMessagesSearch(
+            client_pool=client_pool,
+            storage=storage,
+            channel_ids=channel_ids,
+            max_message_count=1000,
+            message_batch_size=10,
+            min_date='2024-01-01',
+            max_date='2025-01-01',
+            **kwargs
+        )
+
+    @staticmethod
+    def get_progress(storage):
+        return [x.get_row()[:3] for x in storage.items if x.get_type() == 'channel_progress']
+
+    @staticmethod
+    def get_max_in_progress(progress):
+        in_progress = set()
+        result = 0
+        for channel_id, status, _ in progress:
+            if status == 'STARTED':
+                in_progress.add(channel_id)
+            else:
+                in_progress.discard(channel_id)
+            result = max(result, len(in_progress))
+        return result
+
+    @async_test
+    async def test_channels_are_downloaded_concurrently(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({f'channel_{i}': 30 for i in range(5)})
+        search = await self.create_search(tg_api, storage, [f'channel_{i}' for i in range(5)], client_count=3)
+        await search.start()
+        self.assertEqual(len(storage.get_message_ids()), 150)
+        # By default one channel per client is in progress.
+        self.assertEqual(self.get_max_in_progress(self.get_progress(storage)), 3)
+
+    @async_test
+    async def test_max_concurrent_channels(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({f'channel_{i}': 30 for i in range(5)})
+        search = await self.create_search(
+            tg_api, storage, [f'channel_{i}' for i in range(5)], client_count=3, max_concurrent_channels=2
+        )
+        await search.start()
+        self.assertEqual(len(storage.get_message_ids()), 150)
+        self.assertEqual(self.get_max_in_progress(self.get_progress(storage)), 2)
+
+    @async_test
+    async def test_channels_are_ordered_by_priority_then_size(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'a': 10, 'b': 50, 'c': 20, 'd': 5})
+        search = await self.create_search(
+            tg_api, storage, ['a', 'b', 'c', 'd'],
+            max_concurrent_channels=1, priorities={'d': 1}, largest_first=True
+        )
+        await search.start()
+        started = [x[0] for x in self.get_progress(storage) if x[1] == 'STARTED']
+        self.assertEqual(started, ['d', 'b', 'c', 'a'])
+
+    @async_test
+    async def test_channels_keep_given_order_by_default(self):
+        storage = MemoryStorage()
+        tg_api = HistoryTelegramApiMock({'a': 10, 'b': 50, 'c': 20})
+        search = await self.create_search(tg_api, storage, ['c', 'a', 'b'], max_concurrent_channels=1)
+        await search.start()
+        started = [x[0] for x in self.get_progress(storage) if x[1] == 'STARTED']
+        self.assertEqual(started, ['c', 'a', 'b'])
+        # Sizes are not requested.
+        self.assertTrue(all(x[1] > 1 for x in tg_api.requests))
+
+    @async_test
+    async def test_progress_is_saved(self):
+        storage = MemoryStorage()
+        # Unknown channel fails when its id range is probed.
+        tg_api = HistoryTelegramApiMock({'a': 15})
+        search = await self.create_search(tg_api, storage, ['a', 'unknown'], max_concurrent_channels=1, partitions=2)
+        await search.start()
+        self.assertEqual(self.get_progress(storage), [
+            ('a', 'STARTED', 0),
+            ('a', 'FINISHED', 15),
+            ('unknown', 'STARTED', 0),
+            ('unknown', 'ERROR', 0),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
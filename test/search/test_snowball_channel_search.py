@@ -0,0 +1,340 @@
+import asyncio
+import unittest
+import tempfile
+import numpy as np
+from src.infrastructure.storage import Storage, StoredItem, TsvStorage
+from src.application.analytics import ChannelRelevanceEstimator, KeywordChannelRelevanceEstimator
+from src.application.search import SnowballChannelSearch, PageRankChannelPrioritizer
+from src.application.search.channel_frontier import ChannelFrontier
+from src.application.search.channel_graph import ChannelGraph, ChannelItem, ChannelItemStatus
+from src.application.client import ClientPool, Client
+from test.utils import HistoryTelegramApiMock, async_test, MemoryStorage
+
+
+class FixedRelevanceEstimator(ChannelRelevanceEstimator):
+
+    def __init__(self, relevance: dict[str, int]):
+        self.relevance = relevance
+        self.requests = []
+
+    async def get_relevance(self, channel_id: str):
+        self.requests.append(channel_id)
+        return self.relevance.get(channel_id, 0)
+
+
+class FailingRelevanceEstimator(ChannelRelevanceEstimator):
+
+    async def get_relevance(self, channel_id: str):
+        await asyncio.sleep(0)
+        if channel_id != 'a':
+            raise Exception('Estimation failed')
+        return 1
+
+
+class WaitingRelevanceEstimator(ChannelRelevanceEstimator):
+    """
+    Estimates relevance of one channel only after another channel is searched for ancestors.
+    """
+
+    def __init__(self, tg_api, channel_id, searched_channel_id):
+        self.tg_api = tg_api
+        self.channel_id = channel_id
+        self.searched_channel_id = searched_channel_id
+
+    async def get_relevance(self, channel_id: str):
+        if channel_id != self.channel_id:
+            return 0
+        for _ in range(1000):
+            if self.searched_channel_id in [x[0] for x in self.tg_api.requests]:
+                return 1
+            await asyncio.sleep(0)
+        return 0
+
+
+class TestChannelFrontier(unittest.TestCase):
+
+    def test_pop_most_relevant(self):
+        frontier = ChannelFrontier()
+        for channel, relevance in [(0, 1), (1, 5), (2, 3), (3, 5)]:
+            frontier.push(channel, relevance)
+        self.assertEqual(frontier.pop_many(3), [3, 1, 2])
+        self.assertEqual(len(frontier), 1)
+
+    def test_removed_and_updated_channels_are_skipped(self):
+        frontier = ChannelFrontier()
+        frontier.push(0, 1)
+        frontier.push(1, 2)
+        frontier.push(2, 3)
+        frontier.remove(2)
+        frontier.push(0, 10)
+        self.assertEqual(frontier.pop_many(5), [0, 1])
+        self.assertIsNone(frontier.pop())
+
+
+class TestChannelGraph(unittest.TestCase):
+
+    def test_channels_are_interned(self):
+        graph = ChannelGraph()
+        a = graph.add_channel('a')
+        b = graph.add_channel('b', ChannelItemStatus.FINISHED)
+        self.assertEqual(graph.add_channel('a'), a)
+        self.assertEqual((a, b), (0, 1))
+        self.assertEqual(graph.get_channel_id(b), 'b')
+        self.assertIsNone(graph.get_index('c'))
+        self.assertIn('b', graph)
+        self.assertEqual(len(graph), 2)
+
+    def test_status_and_relevance(self):
+        graph = ChannelGraph()
+        a = graph.add_channel('a')
+        b = graph.add_channel('b')
+        c = graph.add_channel('c')
+        self.assertIsNone(graph.get_relevance(a))
+        graph.set_relevance(a, 0.5)
+        graph.set_status(c, ChannelItemStatus.FINISHED)
+        graph.set_status(a, ChannelItemStatus.FINISHED)
+        self.assertEqual(graph.get_relevance(a), 0.5)
+        self.assertEqual(graph.get_channels(ChannelItemStatus.FINISHED), [c, a])
+        self.assertEqual(graph.count(ChannelItemStatus.QUEUED_FOR_LOADING), 1)
+        self.assertEqual(graph.get_item(a), ChannelItem('a', 0.5, ChannelItemStatus.FINISHED))
+        self.assertEqual(graph.get_item(b), ChannelItem('b', None, ChannelItemStatus.QUEUED_FOR_LOADING))
+
+    def test_links_are_stored_in_csr_layout(self):
+        graph = ChannelGraph()
+        a, b, c = [graph.add_channel(x) for x in 'abc']
+        graph.set_links(b, {c: 1})
+        graph.set_links(a, {b: 3, c: 2})
+        self.assertEqual(graph.get_links(a), [(b, 3), (c, 2)])
+        self.assertEqual(graph.get_links(c), [])
+        starts, lengths, targets, counts = graph.get_link_arrays()
+        self.assertEqual(starts.tolist(), [1, 0, -1])
+        self.assertEqual(lengths.tolist(), [2, 1, 0])
+        self.assertEqual(targets.tolist(), [c, b, c])
+        self.assertEqual(counts.tolist(), [1, 3, 2])
+        with self.assertRaises(Exception):
+            graph.set_links(a, {})
+
+
+class TestPageRankChannelPrioritizer(unittest.TestCase):
+
+    def create_graph(self):
+        graph = ChannelGraph()
+        a, b, c, hub, leaf = [graph.add_channel(x) for x in ['a', 'b', 'c', 'hub', 'leaf']]
+        graph.set_links(a, {hub: 1, leaf: 1})
+        graph.set_links(b, {hub: 2})
+        graph.set_links(c, {hub: 1, a: 1})
+        return graph
+
+    def get_dense_ranks(self, graph, damping=0.85):
+        n = len(graph)
+        matrix = np.zeros((n, n))
+        for source in range(n):
+            links = graph.get_links(source)
+            total = sum(x for _, x in links)
+            for target, count in links:
+                matrix[target, source] = count / total
+            if total == 0:
+                matrix[:, source] = 1 / n
+        ranks = np.full(n, 1 / n)
+        for _ in range(200):
+            ranks = (1 - damping) / n + damping * matrix @ ranks
+        return ranks
+
+    def test_ranks_match_dense_power_iteration(self):
+        graph = self.create_graph()
+        prioritizer = PageRankChannelPrioritizer(tolerance=1e-12)
+        self.assertTrue(prioritizer.update(graph))
+        ranks = [prioritizer.get_rank(i) for i in range(len(graph))]
+        np.testing.assert_allclose(ranks, self.get_dense_ranks(graph), atol=1e-9)
+        self.assertEqual(int(np.argmax(ranks)), graph.get_index('hub'))
+
+    def test_ranks_are_updated_incrementally(self):
+        graph = self.create_graph()
+        prioritizer = PageRankChannelPrioritizer(tolerance=1e-12, update_every=2)
+        prioritizer.update(graph)
+        d = graph.add_channel('d')
+        graph.set_links(graph.get_index('leaf'), {d: 1})
+        self.assertFalse(prioritizer.update(graph))
+        graph.set_links(d, {graph.get_index('a'): 1})
+        self.assertTrue(prioritizer.update(graph))
+        ranks = [prioritizer.get_rank(i) for i in range(len(graph))]
+        np.testing.assert_allclose(ranks, self.get_dense_ranks(graph), atol=1e-9)
+
+    def test_priority_blends_relevance_and_rank(self):
+        graph = self.create_graph()
+        graph.set_relevance(graph.get_index('leaf'), 4)
+        graph.set_relevance(graph.get_index('hub'), 1)
+        by_relevance = PageRankChannelPrioritizer(weight=0)
+        by_rank = PageRankChannelPrioritizer(weight=1)
+        for prioritizer in [by_relevance, by_rank]:
+            prioritizer.update(graph)
+        hub, leaf = graph.get_index('hub'), graph.get_index('leaf')
+        self.assertEqual(by_relevance.get_priority(graph, leaf), 1)
+        self.assertEqual(by_relevance.get_priority(graph, hub), 0.25)
+        self.assertEqual(by_rank.get_priority(graph, hub), 1)
+        self.assertLess(by_rank.get_priority(graph, leaf), 1)
+
+    def test_updates_are_batched_and_report_changed_channels(self):
+        graph = self.create_graph()
+        prioritizer = PageRankChannelPrioritizer(weight=1, update_every=2, update_share=0.5)
+        self.assertEqual(prioritizer.update(graph), list(range(5)))
+        d, e, f = [graph.add_channel(x) for x in ['d', 'e', 'f']]
+        graph.set_links(d, {e: 1, f: 1})
+        # 2 new links are less than half of 5 links known at the last update.
+        self.assertEqual(prioritizer.update(graph), [])
+        self.assertEqual(prioritizer.get_rank(f), 0)
+        graph.set_links(e, {f: 1})
+        self.assertIn(f, prioritizer.update(graph))
+        self.assertGreater(prioritizer.get_rank(f), 0)
+
+    def test_small_priority_changes_are_not_reported(self):
+        graph = self.create_graph()
+        prioritizer = PageRankChannelPrioritizer(weight=1, update_every=1, priority_tolerance=0.2)
+        self.assertEqual(prioritizer.update(graph), list(range(5)))
+        b = graph.get_index('b')
+        graph.set_links(graph.get_index('leaf'), {b: 1})
+        # Only b gains enough rank, priorities of the others move less than the tolerance.
+        self.assertEqual(prioritizer.update(graph), [b])
+
+
+class TestSnowballChannelSearch(unittest.TestCase):
+
+    async def create_search(self, tg_api, storage, relevance, start_channels, max_channels_count=100, resume=False,
+                            prioritizer=None, clients_count=2):
+        client_pool = ClientPool()
+        for i in range(clients_count):
+            client_pool.add_client(Client(f'client_{i}', tg_api))
+        await client_pool.activate_clients()
+        return SnowballChannelSearch(
+            client_pool=client_pool,
+            storage=storage,
+            relevance_estimator=FixedRelevanceEstimator(relevance),
+            start_channels=start_channels,
+            max_channels_count=max_channels_count,
+            number_of_messages_for_ancestor_search=10,
+            resume=resume,
+            prioritizer=prioritizer
+        )
+
+    def create_api(self):
+        return HistoryTelegramApiMock(
+            {'a': 5, 'b': 5, 'c': 5, 'd': 5, 'e': 5},
+            forwards={'a': ['b', 'c'], 'b': ['d'], 'c': ['e', 'a'], 'd': [], 'e': []}
+        )
+
+    @async_test
+    async def test_all_reachable_channels_are_found(self):
+        storage = MemoryStorage()
+        search = await self.create_search(self.create_api(), storage, {}, ['a'])
+        channels = await search.start()
+        self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c', 'd', 'e'])
+        finished = [x.get_value()['channel_id'] for x in storage.items if x.get_type() == 'channel_FINISHED']
+        self.assertEqual(sorted(finished), ['a', 'b', 'c', 'd', 'e'])
+        links = [x.get_row()[:2] for x in storage.items if x.get_type() == 'channel_link']
+        self.assertEqual(sorted(links), [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'a'), ('c', 'e')])
+
+    @async_test
+    async def test_most_relevant_channels_are_searched_first(self):
+        storage = MemoryStorage()
+        tg_api = self.create_api()
+        search = await self.create_search(tg_api, storage, {'b': 1, 'c': 2}, ['a'])
+        await search.start()
+        order = [x[0] for x in tg_api.requests]
+        self.assertEqual(order[:3], ['a', 'c', 'b'])
+
+    @async_test
+    async def test_search_stops_at_max_channels_count(self):
+        storage = MemoryStorage()
+        search = await self.create_search(self.create_api(), storage, {}, ['a'], max_channels_count=3)
+        channels = await search.start()
+        self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c'])
+
+    @async_test
+    async def test_instances_do_not_share_channels(self):
+        first = await self.create_search(self.create_api(), MemoryStorage(), {}, ['a'])
+        second = await self.create_search(self.create_api(), MemoryStorage(), {}, ['d'])
+        self.assertEqual(sorted((await second.start()).keys()), ['d'])
+        self.assertEqual(sorted((await first.start()).keys()), ['a', 'b', 'c', 'd', 'e'])
+
+    @async_test
+    async def test_ancestors_are_searched_while_relevance_is_estimated(self):
+        storage = MemoryStorage()
+        tg_api = self.create_api()
+        search = await self.create_search(tg_api, storage, {}, ['a'])
+        search._relevance_estimator = WaitingRelevanceEstimator(tg_api, 'b', 'c')
+        channels = await search.start()
+        self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(channels['b'].relevance, 1)
+
+    @async_test
+    async def test_failed_estimations_do_not_stop_search(self):
+        storage = MemoryStorage()
+        search = await self.create_search(self.create_api(), storage, {}, ['a'])
+        search._relevance_estimator = FailingRelevanceEstimator()
+        channels = await search.start()
+        self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c'])
+        errors = [x.get_value()['channel_id'] for x in storage.items if x.get_type() == 'channel_ERROR']
+        self.assertEqual(sorted(errors), ['b', 'c'])
+
+    @async_test
+    async def test_estimator_messages_are_reused_by_ancestor_search(self):
+        storage = MemoryStorage()
+        tg_api = self.create_api()
+        search = await self.create_search(tg_api, storage, {}, ['a'])
+        search._relevance_estimator = KeywordChannelRelevanceEstimator(search._client_pool, {'message': 2})
+        channels = await search.start()
+        self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(sorted(x[0] for x in tg_api.requests), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(channels['b'].relevance, 10)
+
+    @async_test
+    async def test_links_are_kept_in_graph(self):
+        tg_api = HistoryTelegramApiMock(
+            {'a': 5, 'b': 5, 'c': 5},
+            forwards={'a': ['b', 'c', 'b'], 'b': [], 'c': ['a']}
+        )
+        search = await self.create_search(tg_api, MemoryStorage(), {}, ['a'])
+        await search.start()
+        graph = search.get_graph()
+        links = {
+            graph.get_channel_id(i): sorted((graph.get_channel_id(x), y) for x, y in graph.get_links(i))
+            for i in range(len(graph))
+        }
+        self.assertEqual(links, {'a': [('b', 2), ('c', 1)], 'b': [], 'c': [('a', 1)]})
+        self.assertEqual(graph.get_link_count(), 3)
+
+    @async_test
+    async def test_prioritizer_prefers_most_forwarded_channels(self):
+        forwards = {'a': ['hub', 'leaf', 'hub', 'hub'], 'hub': [], 'leaf': []}
+        relevance = {'leaf': 5, 'hub': 1}
+        orders = []
+        for prioritizer in [None, PageRankChannelPrioritizer(weight=0.9, update_every=1)]:
+            tg_api = HistoryTelegramApiMock({x: 5 for x in forwards}, forwards=forwards)
+            search = await self.create_search(tg_api, MemoryStorage(), relevance, ['a'],
+                                              prioritizer=prioritizer, clients_count=1)
+            await search.start()
+            orders.append([x[0] for x in tg_api.requests if x[0] in ('hub', 'leaf')])
+        self.assertEqual(orders, [['leaf', 'hub'], ['hub', 'leaf']])
+
+    @async_test
+    async def test_resume_from_storage(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            search = await self.create_search(self.create_api(), TsvStorage(out_dir), {'b': 3, 'c': 2}, ['a'],
+                                              max_channels_count=3)
+            await search.start()
+            tg_api = self.create_api()
+            search = await self.create_search(tg_api, TsvStorage(out_dir), {}, ['a'], resume=True)
+            channels = await search.start()
+            self.assertEqual(sorted(channels.keys()), ['a', 'b', 'c', 'd', 'e'])
+            self.assertEqual(channels['b'].relevance, 3)
+            # Channel a was finished by the first run.
+            self.assertEqual(sorted(x[0] for x in tg_api.requests), ['b', 'c', 'd', 'e'])
+            self.assertEqual([x[0] for x in tg_api.requests][:2], ['b', 'c'])
+            graph = search.get_graph()
+            a = graph.get_index('a')
+            self.assertEqual(sorted(graph.get_channel_id(x) for x, _ in graph.get_links(a)), ['b', 'c'])
+            self.assertEqual(graph.get_link_count(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import unittest
+import tempfile
+from src.infrastructure.storage import DeduplicatingStorage, TsvStorage, Storage, StoredItem, StoredBatch, RecordSchema, ColumnType
+from src.infrastructure.storage.id_range_set import IdRangeSet
+
+
+class Item(StoredItem):
+
+    def __init__(self, entity_type, channel_id, message_id):
+        self._type = entity_type
+        self._value = {
+            'message_id': message_id,
+            'channel_id': channel_id,
+            'text': f'Message {message_id}'
+        }
+
+    def get_type(self) -> str:
+        return self._type
+
+    def get_value(self) -> dict[str, str]:
+        return self._value
+
+
+class FlakyStorage(Storage):
+
+    def __init__(self):
+        self.is_failing = True
+        self.saved = []
+
+    def save(self, item: StoredItem):
+        if self.is_failing:
+            raise Exception('Connection lost')
+        self.saved.append(item)
+
+    def save_batch(self, batch: StoredBatch):
+        if self.is_failing:
+            raise Exception('Connection lost')
+        self.saved.extend(batch.get_items())
+
+
+class TestIdRangeSet(unittest.TestCase):
+
+    def test_add_new_and_existing(self):
+        ids = IdRangeSet()
+        self.assertTrue(ids.add(5))
+        self.assertFalse(ids.add(5))
+        self.assertIn(5, ids)
+        self.assertNotIn(4, ids)
+        self.assertEqual(len(ids), 1)
+
+    def test_consecutive_ids_are_merged(self):
+        ids = IdRangeSet()
+        for x in [1, 3, 5, 2, 4]:
+            ids.add(x)
+        self.assertEqual(ids.get_range_count(), 1)
+        self.assertEqual(len(ids), 5)
+
+    def test_gaps_are_kept(self):
+        ids = IdRangeSet()
+        for x in [10, 1, 2, 20, 11]:
+            ids.add(x)
+        self.assertEqual(ids.get_range_count(), 3)
+        self.assertNotIn(15, ids)
+
+
+class TestDeduplicatingStorage(unittest.TestCase):
+
+    def test_duplicates_are_skipped(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = DeduplicatingStorage(TsvStorage(out_dir))
+            storage.save(Item('message', 'channel_1', 1))
+            storage.save(Item('message', 'channel_1', 1))
+            storage.save(Item('message', 'channel_2', 1))
+            rows = storage.read('message').split('\n')[1:-1]
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(storage.get_skipped_count(), 1)
+
+    def test_other_types_are_not_deduplicated(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = DeduplicatingStorage(TsvStorage(out_dir))
+            storage.save(Item('channel_link', 'channel_1', 1))
+            storage.save(Item('channel_link', 'channel_1', 1))
+            rows = storage.read('channel_link').split('\n')[1:-1]
+            self.assertEqual(len(rows), 2)
+
+    def test_index_is_rebuilt_from_storage(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = DeduplicatingStorage(TsvStorage(out_dir))
+            storage.save(Item('message', 'channel_1', 1))
+            storage.save(Item('message', 'channel_1', 2))
+            storage = DeduplicatingStorage(TsvStorage(out_dir))
+            storage.save(Item('message', 'channel_1', 2))
+            storage.save(Item('message', 'channel_1', 3))
+            rows = storage.read('message').split('\n')[1:-1]
+            self.assertEqual(len(rows), 3)
+            self.assertEqual(storage.get_skipped_count(), 1)
+
+    def test_duplicates_are_removed_from_batch(self):
+        schema = RecordSchema([('channel_id', ColumnType.STR), ('message_id', ColumnType.INT)])
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = DeduplicatingStorage(TsvStorage(out_dir))
+            storage.save_batch(StoredBatch('message', schema, [['channel_1'], [1]]))
+            storage.save_batch(StoredBatch('message', schema, [['channel_1'] * 3, [1, 2, 2]]))
+            storage.save_batch(StoredBatch('message', schema, [['channel_1'], [1]]))
+            rows = storage.read('message').split('\n')[1:-1]
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(storage.get_skipped_count(), 3)
+
+    def test_files_without_key_columns_are_not_indexed(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            with open(os.path.join(out_dir, 'message.tsv'), 'w') as f:
+                f.write('id\ttext\n1\tMessage 1\n')
+            storage = DeduplicatingStorage(TsvStorage(out_dir))
+            storage.save(Item('message', 'channel_1', 1))
+            self.assertEqual(storage.get_skipped_count(), 0)
+
+    def test_failed_saves_are_not_remembered(self):
+        schema = RecordSchema([('channel_id', ColumnType.STR), ('message_id', ColumnType.INT)])
+        inner = FlakyStorage()
+        storage = DeduplicatingStorage(inner)
+        with self.assertRaises(Exception):
+            storage.save(Item('message', 'channel_1', 1))
+        with self.assertRaises(Exception):
+            storage.save_batch(StoredBatch('message', schema, [['channel_1'] * 2, [2, 3]]))
+        inner.is_failing = False
+        storage.save(Item('message', 'channel_1', 1))
+        storage.save_batch(StoredBatch('message', schema, [['channel_1'] * 3, [2, 3, 3]]))
+        storage.save(Item('message', 'channel_1', 1))
+        self.assertEqual(len(inner.saved), 3)
+        self.assertEqual(storage.get_skipped_count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import unittest
+import tempfile
+from src.infrastructure.storage import MultiStorage, TsvStorage, Storage, StoredItem
+
+
+class Item(StoredItem):
+
+    def __init__(self, message_id):
+        self._value = {
+            'message_id': message_id
+        }
+
+    def get_type(self) -> str:
+        return 'message'
+
+    def get_value(self) -> dict[str, str]:
+        return self._value
+
+
+class FailingStorage(Storage):
+
+    def save(self, item: StoredItem):
+        raise Exception('Connection lost')
+
+
+class SlowStorage(Storage):
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.saved = 0
+        self.items = []
+
+    def save(self, item: StoredItem):
+        self.released.wait()
+        self.saved += 1
+        self.items.append(item)
+
+
+class TestMultiStorage(unittest.TestCase):
+
+    def test_items_are_saved_into_each_storage(self):
+        with tempfile.TemporaryDirectory() as dir_1, tempfile.TemporaryDirectory() as dir_2:
+            storage = MultiStorage({'tsv_1': TsvStorage(dir_1), 'tsv_2': TsvStorage(dir_2)})
+            for i in range(10):
+                storage.save(Item(i))
+            storage.close()
+            for out_dir in [dir_1, dir_2]:
+                self.assertEqual(len(TsvStorage(out_dir).read('message').split('\n')), 12)
+            self.assertEqual([x.saved for x in storage.get_sink_stats()], [10, 10])
+
+    def test_failing_storage_does_not_affect_others(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = MultiStorage({'tsv': TsvStorage(out_dir), 'failing': FailingStorage()})
+            for i in range(3):
+                storage.save(Item(i))
+            storage.close()
+            tsv_stats, failing_stats = storage.get_sink_stats()
+            self.assertEqual(tsv_stats.saved, 3)
+            self.assertEqual(failing_stats.failed, 3)
+            self.assertEqual(failing_stats.last_error, 'Connection lost')
+
+    def test_slow_storage_does_not_block_others(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            slow_storage = SlowStorage()
+            storage = MultiStorage({'tsv': TsvStorage(out_dir), 'slow': slow_storage})
+            for i in range(5):
+                storage.save(Item(i))
+            storage.flush()
+            self.assertEqual(len(list(storage.scan('message'))[0]), 5)
+            self.assertEqual(slow_storage.saved, 0)
+            slow_storage.released.set()
+            storage.close()
+            self.assertEqual(slow_storage.saved, 5)
+
+    def test_items_are_spilled_when_queue_is_full(self):
+        slow_storage = SlowStorage()
+        storage = MultiStorage({'slow': slow_storage}, queue_size=2)
+
+        async def save():
+            for i in range(10):
+                storage.save(Item(i))
+
+        # Save does not wait for the slow storage even inside the event loop.
+        asyncio.run(asyncio.wait_for(save(), 1))
+        stats = storage.get_sink_stats()[0]
+        self.assertGreaterEqual(stats.spilled, 7)
+        slow_storage.released.set()
+        storage.close()
+        stats = storage.get_sink_stats()[0]
+        self.assertEqual((stats.saved, stats.queued), (10, 0))
+        self.assertEqual([x.get_value()['message_id'] for x in slow_storage.items], list(range(10)))
+
+    def test_flush_waits_for_spilled_items(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = MultiStorage({'tsv': TsvStorage(out_dir)}, queue_size=1)
+            for i in range(20):
+                storage.save(Item(i))
+            storage.flush()
+            self.assertEqual(len(list(storage.scan('message'))[0]), 20)
+            storage.close()
+
+    def test_reading_uses_chosen_storage(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = MultiStorage(
+                {'failing': FailingStorage(), 'tsv': TsvStorage(out_dir)},
+                read_from='tsv'
+            )
+            storage.save(Item(1))
+            storage.flush()
+            self.assertEqual(len(list(storage.scan('message'))[0]), 1)
+            storage.close()
+        with self.assertRaises(Exception):
+            MultiStorage({'tsv': FailingStorage()}, read_from='postgres')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import os
+import json
+import unittest
+import tempfile
+from datetime import datetime
+from src.infrastructure.storage import PartitionedFileStorage, StoredItem, StoredBatch, RecordSchema, ColumnType
+
+
+class Item(StoredItem):
+
+    def __init__(self, entity_type, channel_id, message_id, date):
+        self._type = entity_type
+        self._value = {
+            'message_id': message_id,
+            'channel_id': channel_id,
+            'publish_datetime': date,
+            'text': f'Line 1\nLine 2 of {message_id}'
+        }
+
+    def get_type(self) -> str:
+        return self._type
+
+    def get_value(self) -> dict[str, str]:
+        return self._value
+
+
+class TestPartitionedFileStorage(unittest.TestCase):
+
+    def test_partitions_by_channel_and_date(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, compression='gzip')
+            storage.save(Item('message', 'channel_1', 1, '2024-01-01 10:00:00'))
+            storage.save(Item('message', 'channel_1', 2, '2024-01-02 10:00:00'))
+            storage.save(Item('message', 'channel_2', 3, '2024-01-01 10:00:00'))
+            storage.close()
+            paths = sorted([x['path'] for x in storage.get_segments('message')])
+            self.assertEqual(paths, [
+                os.path.join('message', 'channel=channel_1', 'date=2024-01-01', 'part-00000.tsv.gz'),
+                os.path.join('message', 'channel=channel_1', 'date=2024-01-02', 'part-00000.tsv.gz'),
+                os.path.join('message', 'channel=channel_2', 'date=2024-01-01', 'part-00000.tsv.gz'),
+            ])
+            for path in paths:
+                self.assertTrue(os.path.exists(os.path.join(out_dir, path)))
+
+    def test_rotates_by_row_count(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, partition_by=(), max_rows_per_file=2, compression='gzip')
+            for i in range(5):
+                storage.save(Item('message', 'channel_1', i, '2024-01-01'))
+            storage.close()
+            segments = storage.get_segments('message')
+            self.assertEqual([x['rows'] for x in segments], [2, 2, 1])
+            self.assertTrue(all(x['finished'] for x in segments))
+
+    def test_read_returns_all_segments_with_one_header(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, partition_by=(), max_rows_per_file=2, compression='gzip')
+            for i in range(3):
+                storage.save(Item('message', 'channel_1', i, '2024-01-01'))
+            lines = storage.read('message').split('\n')
+            self.assertEqual(lines[0], 'message_id\tchannel_id\tpublish_datetime\ttext')
+            self.assertEqual([x.split('\t')[0] for x in lines[1:-1]], ['0', '1', '2'])
+            storage.close()
+
+    def test_journal_is_written_and_unfinished_segments_are_recovered(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, partition_by=('channel',), compression='gzip')
+            storage.save(Item('message', 'channel_1', 1, '2024-01-01'))
+            storage.save(Item('message', 'channel_1', 2, '2024-01-01'))
+            with open(os.path.join(out_dir, 'manifest.log')) as f:
+                entries = [json.loads(x) for x in f]
+            self.assertEqual([(x['index'], x['finished']) for x in entries], [(0, False)])
+            self.assertFalse(os.path.exists(os.path.join(out_dir, 'manifest.json')))
+            # Simulate crash: storage is not closed.
+            storage._active['message', (('channel', 'channel_1'),)].file.close()
+            storage = PartitionedFileStorage(out_dir, partition_by=('channel',), compression='gzip')
+            segments = storage.get_segments('message')
+            self.assertTrue(segments[0]['finished'])
+            self.assertEqual(segments[0]['rows'], 2)
+            self.assertEqual(len(storage.read('message').split('\n')), 4)
+            with open(os.path.join(out_dir, 'manifest.json')) as f:
+                self.assertEqual(len(json.load(f)['segments']), 1)
+            self.assertFalse(os.path.exists(os.path.join(out_dir, 'manifest.log')))
+
+    def test_rotated_segments_are_recovered_with_row_counts(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, partition_by=(), max_rows_per_file=2, compression='gzip')
+            for i in range(5):
+                storage.save(Item('message', 'channel_1', i, '2024-01-01'))
+            # Simulate crash: storage is not closed.
+            storage._active['message', ()].file.close()
+            storage = PartitionedFileStorage(out_dir, partition_by=(), max_rows_per_file=2, compression='gzip')
+            segments = storage.get_segments('message')
+            self.assertEqual([x['rows'] for x in segments], [2, 2, 1])
+            self.assertTrue(all(x['finished'] for x in segments))
+            storage.save(Item('message', 'channel_1', 5, '2024-01-01'))
+            storage.close()
+            self.assertTrue(storage.get_segments('message')[-1]['path'].endswith('part-00003.tsv.gz'))
+
+    def test_journal_entries_are_reconciled_with_missing_files(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, partition_by=(), max_rows_per_file=2, compression='gzip')
+            for i in range(5):
+                storage.save(Item('message', 'channel_1', i, '2024-01-01'))
+            # Simulate crash after the active segment is compressed, but before it is journaled.
+            active = storage._active['message', ()]
+            active.file.close()
+            storage._compress(active)
+            # And a finished segment whose file is lost.
+            os.remove(os.path.join(out_dir, storage.get_segments('message')[0]['path']))
+            with self.assertLogs('main_logger', level='WARNING'):
+                storage = PartitionedFileStorage(out_dir, partition_by=(), max_rows_per_file=2, compression='gzip')
+            segments = storage.get_segments('message')
+            self.assertEqual([(x['path'], x['rows']) for x in segments], [
+                (os.path.join('message', 'part-00001.tsv.gz'), 2),
+                (os.path.join('message', 'part-00002.tsv.gz'), 1),
+            ])
+            self.assertEqual(len(storage.read('message').split('\n')), 5)
+            # Numbers of existing files are not reused.
+            storage.save(Item('message', 'channel_1', 5, '2024-01-01'))
+            storage.close()
+            self.assertEqual(storage.get_segments('message')[-1]['path'], os.path.join('message', 'part-00003.tsv.gz'))
+
+    def test_batch_rows_are_split_by_partition(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, compression='gzip')
+            schema = RecordSchema([
+                ('message_id', ColumnType.INT),
+                ('channel_id', ColumnType.STR),
+                ('publish_datetime', ColumnType.DATETIME),
+            ])
+            storage.save_batch(StoredBatch('message', schema, [
+                [1, 2, 3, 4],
+                ['channel_1', 'channel_2', 'channel_1', None],
+                [datetime(2024, 1, 1, 10), datetime(2024, 1, 1, 11), datetime(2024, 1, 1, 12), None],
+            ]))
+            storage.close()
+            segments = {
+                tuple(x['partition'].values()): x['rows']
+                for x in storage.get_segments('message')
+            }
+            self.assertEqual(segments, {
+                ('channel_1', '2024-01-01'): 2,
+                ('channel_2', '2024-01-01'): 1,
+                ('unknown', 'unknown'): 1,
+            })
+            batches = storage.scan('message', columns=['message_id'], where={'channel_id': 'channel_1'})
+            self.assertEqual([row for batch in batches for row in batch.rows], [('1',), ('3',)])
+
+    def test_scan_skips_other_channel_partitions(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = PartitionedFileStorage(out_dir, compression='gzip')
+            storage.save(Item('message', 'channel_1', 1, '2024-01-01'))
+            storage.save(Item('message', 'channel_2', 2, '2024-01-01'))
+            storage.save(Item('message', 'channel_1', 3, '2024-01-02'))
+            storage.close()
+            batches = storage.scan('message', columns=['message_id', 'text'], where={'channel_id': 'channel_1'})
+            rows = [row for batch in batches for row in batch.rows]
+            self.assertEqual(rows, [('1', 'Line 1\nLine 2 of 1'), ('3', 'Line 1\nLine 2 of 3')])
+
+
+if __name__ == '__main__':
+    unittest.main()
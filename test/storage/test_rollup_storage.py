@@ -0,0 +1,114 @@
+import unittest
+import numpy as np
+from datetime import datetime, timedelta
+import pytz
+import tempfile
+from src.infrastructure.storage import EngagementRollupStorage, QuantileSketchArray, DeduplicatingStorage, TsvStorage
+from src.infrastructure.telegram import MessageBatch
+from src.application.search.channel_messages_search import StoredMessage
+from test.utils import HistoryTelegramApiMock, MemoryStorage
+
+
+def create_message(channel_id, message_id, hours, views, reactions=None):
+    message = HistoryTelegramApiMock.message(channel_id, message_id)
+    message.datetime = datetime(2024, 1, 1, tzinfo=pytz.UTC) + timedelta(hours=hours)
+    message.views = views
+    message.forwards = 1
+    message.reactions = reactions
+    return message
+
+
+class TestQuantileSketchArray(unittest.TestCase):
+
+    def test_quantiles_have_bounded_relative_error(self):
+        sketches = QuantileSketchArray(relative_accuracy=0.01)
+        values = np.arange(1, 10001)
+        sketches.add(np.zeros(len(values)), values)
+        for value, expected in zip(sketches.quantiles(0, [0.5, 0.9, 0.99]), [5000, 9000, 9900]):
+            self.assertAlmostEqual(value, expected, delta=expected * 0.011)
+        self.assertLess(len(sketches), 1000)
+
+    def test_slots_are_independent(self):
+        sketches = QuantileSketchArray()
+        sketches.add([0, 1, 0, 1, 3], [0, 1000, 0, 1000, 100])
+        sketches.add([3, 3], [100, 100])
+        self.assertEqual(sketches.quantiles(0, [0.5, 1]), [0, 0])
+        self.assertAlmostEqual(sketches.quantiles(1, [0.5])[0], 1000, delta=10)
+        self.assertEqual(sketches.quantiles(2, [0.5]), [None])
+        self.assertEqual([sketches.get_count(x) for x in range(4)], [2, 2, 0, 3])
+        # Equal buckets of a slot are merged.
+        self.assertEqual(len(sketches), 3)
+
+    def test_values_above_the_last_bucket_are_kept_in_it(self):
+        sketches = QuantileSketchArray(max_buckets=10)
+        sketches.add(np.zeros(30), 1.02 ** np.arange(30))
+        self.assertEqual(len(sketches), 9)
+        self.assertEqual(sketches.get_count(0), 30)
+        low, high = sketches.quantiles(0, [0, 1])
+        self.assertAlmostEqual(low, 1, delta=0.01)
+        self.assertAlmostEqual(high, 1.02 ** 7, delta=0.02)
+
+
+class TestEngagementRollupStorage(unittest.TestCase):
+
+    def get_rollups(self, storage):
+        return [x.get_value() for x in storage.items if x.get_type() == 'channel_daily_engagement']
+
+    def test_messages_are_aggregated_by_channel_and_day(self):
+        inner = MemoryStorage()
+        storage = EngagementRollupStorage(inner)
+        messages = [
+            create_message('a', 1, 1, 10, {'👍': 2, '🔥': 1}),
+            create_message('a', 2, 2, 30),
+            create_message('a', 3, 25, 5, {'👍': 4}),
+            create_message('b', 1, 3, None),
+        ]
+        storage.save_batch(StoredMessage.create_batch(MessageBatch.from_messages(messages[:3])))
+        storage.save(StoredMessage(messages[3]))
+        self.assertEqual(len(inner.items), 4)
+        self.assertEqual(self.get_rollups(inner), [])
+        storage.close()
+        rollups = {(x['channel_id'], x['day']): x for x in self.get_rollups(inner)}
+        self.assertEqual(sorted(rollups), [('a', '2024-01-01'), ('a', '2024-01-02'), ('b', '2024-01-01')])
+        first = rollups[('a', '2024-01-01')]
+        self.assertEqual(first['message_count'], 2)
+        self.assertEqual((first['views_count'], first['views_sum']), (2, 40))
+        self.assertAlmostEqual(first['views_p50'], 10, delta=0.1)
+        self.assertAlmostEqual(first['views_p99'], 10, delta=0.1)
+        self.assertEqual((first['reactions_count'], first['reactions_sum']), (1, 3))
+        self.assertEqual(first['forwards_sum'], 2)
+        missing = rollups[('b', '2024-01-01')]
+        self.assertEqual((missing['message_count'], missing['views_count'], missing['views_sum']), (1, 0, 0))
+        self.assertIsNone(missing['views_p50'])
+
+    def test_only_changed_days_are_flushed_with_cumulative_values(self):
+        inner = MemoryStorage()
+        storage = EngagementRollupStorage(inner, flush_every=2)
+        storage.save_batch(StoredMessage.create_batch(MessageBatch.from_messages([
+            create_message('a', 1, 1, 10),
+            create_message('a', 2, 25, 20),
+        ])))
+        storage.save(StoredMessage(create_message('a', 3, 2, 30)))
+        storage.save(StoredMessage(create_message('a', 4, 3, 40)))
+        rollups = [(x['day'], x['message_count'], x['views_sum']) for x in self.get_rollups(inner)]
+        self.assertEqual(rollups, [('2024-01-01', 1, 10), ('2024-01-02', 1, 20), ('2024-01-01', 3, 80)])
+        self.assertEqual(len({x['run_id'] for x in self.get_rollups(inner)}), 1)
+
+    def test_duplicates_are_not_counted_across_runs(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            messages = [create_message('a', 1, 1, 10), create_message('a', 2, 2, 30)]
+            for run in range(2):
+                storage = DeduplicatingStorage(EngagementRollupStorage(TsvStorage(out_dir)))
+                storage.save_batch(StoredMessage.create_batch(MessageBatch.from_messages(messages)))
+                storage.save(StoredMessage(messages[0]))
+                storage.close()
+            batches = TsvStorage(out_dir).scan('channel_daily_engagement', columns=['message_count', 'views_sum'])
+            self.assertEqual([x for batch in batches for x in batch.rows], [('2', '40')])
+
+    def test_rollup_outside_deduplication_is_rejected(self):
+        with self.assertRaises(Exception):
+            EngagementRollupStorage(DeduplicatingStorage(MemoryStorage()))
+
+
+if __name__ == '__main__':
+    unittest.main()
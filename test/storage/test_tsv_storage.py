@@ -0,0 +1,123 @@
+import os
+import unittest
+import tempfile
+from datetime import datetime, timezone
+from src.infrastructure.storage import TsvStorage, StoredItem, StoredBatch, RecordSchema, ColumnType
+
+
+class Item(StoredItem):
+
+    def __init__(self, channel_id, message_id, text):
+        self._value = {
+            'message_id': message_id,
+            'channel_id': channel_id,
+            'text': text
+        }
+
+    def get_type(self) -> str:
+        return 'message'
+
+    def get_value(self) -> dict[str, str]:
+        return self._value
+
+
+class SchemaItem(StoredItem):
+
+    _SCHEMA = RecordSchema([
+        ('message_id', ColumnType.INT),
+        ('publish_datetime', ColumnType.DATETIME),
+        ('reactions', ColumnType.JSON),
+        ('views_count', ColumnType.INT),
+        ('text', ColumnType.STR),
+    ])
+
+    def __init__(self, *row):
+        self._row = row
+
+    def get_type(self) -> str:
+        return 'message'
+
+    def get_schema(self) -> RecordSchema:
+        return self._SCHEMA
+
+    def get_row(self) -> tuple:
+        return self._row
+
+
+class TestTsvStorage(unittest.TestCase):
+
+    def test_scan_missing_entity_type(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = TsvStorage(out_dir)
+            self.assertEqual(list(storage.scan('message')), [])
+
+    def test_scan_in_batches(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = TsvStorage(out_dir)
+            for i in range(5):
+                storage.save(Item('channel_1', i, f'Message\n{i}'))
+            batches = list(storage.scan('message', batch_size=2))
+            self.assertEqual([len(x) for x in batches], [2, 2, 1])
+            self.assertEqual(batches[0].columns, ['message_id', 'channel_id', 'text'])
+            self.assertEqual(batches[0].rows[1], ('1', 'channel_1', 'Message\n1'))
+
+    def test_scan_columns_and_where(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = TsvStorage(out_dir)
+            storage.save(Item('channel_1', 1, 'a'))
+            storage.save(Item('channel_2', 2, 'b'))
+            storage.save(Item('channel_1', 3, None))
+            batches = list(storage.scan('message', columns=['message_id', 'text'], where={'channel_id': 'channel_1'}))
+            self.assertEqual(len(batches), 1)
+            self.assertEqual(batches[0].to_dicts(), [
+                {'message_id': '1', 'text': 'a'},
+                {'message_id': '3', 'text': None}
+            ])
+
+    def test_schema_values_are_escaped_once_and_typed_on_scan(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = TsvStorage(out_dir)
+            date = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+            text = 'Tab\there\nnew line and \\n backslash'
+            storage.save(SchemaItem(1, date, {'👍': 5}, None, text))
+            lines = storage.read('message').split('\n')
+            self.assertEqual(lines[0], 'message_id\tpublish_datetime\treactions\tviews_count\ttext')
+            self.assertEqual(len(lines[1].split('\t')), 5)
+            batches = list(storage.scan('message', schema=SchemaItem._SCHEMA))
+            self.assertEqual(batches[0].rows, [(1, date, {'👍': 5}, None, text)])
+
+    def test_batch_is_saved_as_items(self):
+        date = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        rows = [(1, date, {'👍': 5}, None, 'a\tb'), (2, None, None, 7, 'c')]
+        with tempfile.TemporaryDirectory() as items_dir, tempfile.TemporaryDirectory() as batch_dir:
+            items = TsvStorage(items_dir)
+            for row in rows:
+                items.save(SchemaItem(*row))
+            batch = TsvStorage(batch_dir)
+            batch.save_batch(StoredBatch('message', SchemaItem._SCHEMA, [list(x) for x in zip(*rows)]))
+            self.assertEqual(batch.read('message'), items.read('message'))
+
+    def test_none_text_is_not_missing_value(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = TsvStorage(out_dir)
+            storage.save(SchemaItem(1, None, None, None, 'None'))
+            # Files written before NULL marker contain 'None' for missing values.
+            with open(os.path.join(out_dir, 'message.tsv'), 'a') as f:
+                f.write('2\tNone\tNone\tNone\tNone\r\n')
+            rows = list(storage.scan('message', schema=SchemaItem._SCHEMA))[0].rows
+            self.assertEqual(rows, [(1, None, None, None, 'None'), (2, None, None, None, 'None')])
+
+    def test_malformed_rows_are_logged(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            storage = TsvStorage(out_dir)
+            storage.save(Item('channel_1', 1, 'text'))
+            with open(os.path.join(out_dir, 'message.tsv'), 'a') as f:
+                f.write('2\tchannel_1\r\n')
+            with self.assertLogs('main_logger', level='WARNING') as logs:
+                batches = list(storage.scan('message'))
+            self.assertEqual(len(batches[0]), 1)
+            self.assertIn('Skipped 1 rows', logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,15 +5,7 @@ from telethon.types import PeerChannel
 import src.infrastructure.telegram.telethon as tg_telethon
 from src.infrastructure.telegram import TelethonTelegramApi, ChannelResponse, MessageResponse
 from src.infrastructure.cache import MemoryCache
-
-def async_test(coro):
-    def wrapper(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        try:
-            return loop.run_until_complete(coro(*args, **kwargs))
-        finally:
-            loop.close()
-    return wrapper
+from test.utils import async_test
 
 
 class TestTelethonTelegramApi(unittest.TestCase):
@@ -1 +1,3 @@
-from .telegram_mock import TelegramApiMock
\ No newline at end of file
+from .history_mock import HistoryTelegramApiMock
+from .async_test import async_test
+from .memory_storage import MemoryStorage
@@ -0,0 +1,87 @@
+import re
+import asyncio
+from datetime import datetime, timedelta
+import pytz
+from src.infrastructure.telegram import TelegramApi, ChannelResponse, MessageResponse, FloodWaitError
+
+
+class HistoryTelegramApiMock(TelegramApi):
+    """
+    Serves generated channel history with the paging semantics of Telegram.
+    """
+
+    def __init__(self, channels: dict[str, int], fail_requests: set[int] = None, texts: dict[int, str] = None,
+                 flood_requests: set[int] = None, forwards: dict[str, list[str]] = None):
+        """
+        Parameters
+        ----------
+        channels: dict[str, int]
+            Number of messages by channel id. Message i is published on 2024-01-01 + i hours.
+        fail_requests: set[int]
+            Numbers of requests (starting from 0) which raise an exception.
+        texts: dict[int, str]
+            Texts of messages by message id. Other messages have text 'Message <id>'.
+        flood_requests: set[int]
+            Numbers of requests (starting from 0) which raise FloodWaitError.
+        forwards: dict[str, list[str]]
+            Channels which the newest messages of the channel are forwarded from, one message per channel.
+        """
+        self.requests = []
+        self._fail_requests = fail_requests or set()
+        self._flood_requests = flood_requests or set()
+        self._messages = {
+            channel_id: [self.message(channel_id, i, (texts or {}).get(i)) for i in range(count, 0, -1)]
+            for channel_id, count in channels.items()
+        }
+        for channel_id, sources in (forwards or {}).items():
+            for message, source in zip(self._messages[channel_id], sources):
+                message.channel_fwd_from_id = source
+
+    @staticmethod
+    def message(channel_id: str, message_id: int, text: str = None) -> MessageResponse:
+        return MessageResponse(
+            message_id=message_id,
+            text=text or f'Message {message_id}',
+            channel_id=channel_id,
+            channel_fwd_from_id=None,
+            views=message_id,
+            forwards=0,
+            datetime=datetime(2024, 1, 1, tzinfo=pytz.UTC) + timedelta(hours=message_id),
+            reactions=None,
+            replies_count=None
+        )
+
+    async def authorize(self):
+        return None
+
+    @staticmethod
+    def _match_search(search: str, text: str) -> bool:
+        """
+        Matches as Telegram search does: each word of the query must be a prefix of a word of the text.
+        """
+        words = re.findall(r'\w+', (text or '').lower())
+        return all(any(x.startswith(y) for x in words) for y in re.findall(r'\w+', search.lower()))
+
+    async def get_channel(self, channel_id: str) -> ChannelResponse:
+        return ChannelResponse(channel_id, channel_id)
+
+    async def get_messages(self, channel_id, limit, offset_id=None, add_offset=None, offset_date=None, min_id=None,
+                           search=None):
+        request_number = len(self.requests)
+        self.requests.append((channel_id, limit, offset_id, add_offset, offset_date, min_id, search))
+        await asyncio.sleep(0)
+        if request_number in self._fail_requests:
+            raise Exception('GET_MESSAGES error')
+        if request_number in self._flood_requests:
+            raise FloodWaitError(0)
+        messages = self._messages[channel_id]
+        if offset_id:
+            messages = [m for m in messages if m.message_id < offset_id]
+        elif offset_date is not None:
+            messages = [m for m in messages if m.datetime < offset_date]
+        if min_id:
+            messages = [m for m in messages if m.message_id > min_id]
+        if search:
+            messages = [m for m in messages if self._match_search(search, m.text)]
+        add_offset = add_offset or 0
+        return messages[add_offset:add_offset + limit]
@@ -0,0 +1,13 @@
+from src.infrastructure.storage import Storage, StoredItem
+
+
+class MemoryStorage(Storage):
+
+    def __init__(self):
+        self.items = []
+
+    def save(self, item: StoredItem):
+        self.items.append(item)
+
+    def get_message_ids(self):
+        return [x.get_value()['message_id'] for x in self.items if x.get_type() == 'message']